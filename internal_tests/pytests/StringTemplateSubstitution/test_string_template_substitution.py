@@ -6,6 +6,8 @@ from string_template_substitution import StringExtract
 from string_template_substitution import get_tags
 from string_template_substitution import format_one_time_item
 from string_template_substitution import format_hms
+from string_template_substitution import compile_template
+from string_template_substitution import compile_extract_template
 import logging
 import datetime
 
@@ -655,3 +657,40 @@ def test_underscore_in_time_fmt():
     expected_filename = "20170604_010203"
     filename = StringSub(logger, templ, valid=valid_string).do_string_sub()
     assert(filename == expected_filename)
+
+def test_compile_template():
+    templ = "{init?fmt=%Y%m%d}/file_{lead?fmt=%3H}.nc"
+    compiled = compile_template(templ)
+    # template is only parsed once
+    assert(compile_template(templ) is compiled)
+    assert([tag.key for tag in compiled.tags] == ['init', 'lead'])
+    assert(compiled.segments[1] == '/file_')
+    assert(compiled.segments[3] == '.nc')
+
+@pytest.mark.parametrize(
+    'template, filepath', [
+        ('{init?fmt=%Y%m%d%H}/f{lead?fmt=%HHH}.nc', '2019020100/f006.nc'),
+        ('{init?fmt=%Y%m%d%H}/f{lead?fmt=%HHH}.nc', '2019020100/f06.nc'),
+        ('{valid?fmt=%Y%m%d_%H%M%S}.grb', '20190201_120000.grb'),
+        ('{init?fmt=%Y%m%d}/{init?fmt=%Y%m%d%H}_f{lead?fmt=%H}.nc', '20190201/2019020100_f12.nc'),
+        ('{init?fmt=%Y%m%d}/{init?fmt=%Y%m%d%H}_f{lead?fmt=%H}.nc', '20190201/2019020200_f12.nc'),
+        ('{valid?fmt=%Y%j%H}.nc', '2019032.nc'),
+        ('{valid?fmt=%Y%m%d%H?shift=-3H}', '2019020100'),
+        ('{da_init?fmt=%Y%m%d%H}_{lead?fmt=%3H}', '2019020100_006'),
+        ('a_{valid?fmt=%Y%m%d%H%M}.txt', 'b_201902011230.txt'),
+    ]
+)
+def test_extract_compiled_matches_by_character(template, filepath):
+    logger = logging.getLogger("testing")
+    assert(compile_extract_template(template) is not None)
+    se = StringExtract(logger, template, filepath)
+    assert(se.parse_template() == se.parse_template_by_character())
+
+def test_extract_many():
+    logger = logging.getLogger("testing")
+    template = '{init?fmt=%Y%m%d%H}/f{lead?fmt=%3H}.nc'
+    paths = ['2019020100/f006.nc', 'README', '2019020112/f012.nc']
+    out = StringExtract(logger, template).extract_many(paths)
+    assert(out[1] is None)
+    assert(out[0]['valid'] == datetime.datetime(2019, 2, 1, 6))
+    assert(out[2]['valid'] == datetime.datetime(2019, 2, 2, 0))
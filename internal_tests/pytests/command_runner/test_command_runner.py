@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import time
+import datetime
+import pytest
+
+import produtil
+import config_metplus
+import met_util as util
+import resource_usage
+from command_runner import CommandRunner
+
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='CommandRunner',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='CommandRunner')
+        produtil.log.postmsg('command_runner test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        util.get_logger(config)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'command_runner test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+@pytest.mark.parametrize(
+    'max_procs', [
+        1, 3,
+    ]
+)
+def test_submit_cmd_ordered_log(tmpdir, max_procs):
+    config = metplus_config()
+    log_file = str(tmpdir.join('metplus.log'))
+    config.set('config', 'LOG_METPLUS', log_file)
+    config.set('config', 'LOG_MET_OUTPUT_TO_METPLUS', True)
+    config.set('config', 'DO_NOT_RUN_EXE', False)
+    config.set('dir', 'TMP_DIR', str(tmpdir))
+
+    runner = CommandRunner(config, logger=config.logger)
+
+    # first command finishes last when commands run at the same time
+    sleep_times = [0.6, 0.1, 0.3]
+    cmds = [f"sh -c 'sleep {sleep_time}; echo output{index}; exit {index}'"
+            for index, sleep_time in enumerate(sleep_times)]
+    start_time = time.time()
+    for cmd in cmds:
+        runner.submit_cmd(cmd, app_name='test_app', max_procs=max_procs)
+
+    results = runner.wait_for_cmds()
+    run_time = time.time() - start_time
+
+    # return codes are reported in the order commands were submitted
+    assert results == [(index, cmd) for index, cmd in enumerate(cmds)]
+    if max_procs > 1:
+        assert run_time < sum(sleep_times)
+
+    # output is added to the log in the order commands were submitted
+    with open(log_file, 'r') as file_handle:
+        lines = [line.strip() for line in file_handle.readlines()
+                 if line.startswith('output')]
+    assert lines == ['output0', 'output1', 'output2']
+
+    # temporary log files are removed
+    assert not [name for name in os.listdir(str(tmpdir))
+                if name.startswith('test_app_')]
+
+    # results are only returned once
+    assert runner.wait_for_cmds() == []
+
+def test_resource_usage(tmpdir):
+    config = metplus_config()
+    config.set('config', 'LOG_METPLUS', '')
+    config.set('config', 'LOG_RESOURCE_USAGE', True)
+    config.set('config', 'LOG_TIMESTAMP', '')
+    config.set('config', 'DO_NOT_RUN_EXE', False)
+    config.set('dir', 'LOG_DIR', str(tmpdir))
+
+    runner = CommandRunner(config, logger=config.logger)
+    time_info = {'init': datetime.datetime(2019, 2, 1, 0),
+                 'lead_string': '6 hours'}
+    var_info = {'fcst_name': 'TMP', 'fcst_level': 'Z2',
+                'obs_name': 'TMP', 'obs_level': 'Z2'}
+    log_info = resource_usage.get_command_log_info('grid_stat', time_info,
+                                                   var_info)
+    runner.run_cmd("sh -c 'exit 2'", ismetcmd=False, log_info=log_info)
+    runner.run_cmd('true', ismetcmd=False)
+
+    path = resource_usage.get_resource_usage_path(config)
+    assert path == os.path.join(str(tmpdir), 'resource_usage.jsonl')
+    records = resource_usage.read_resource_usage(path)
+    assert len(records) == 2
+    assert records[0]['wrapper'] == 'grid_stat'
+    assert records[0]['init'] == '20190201000000'
+    assert records[0]['lead'] == '6 hours'
+    assert records[0]['field'] == 'TMP Z2'
+    assert records[0]['return_code'] == 2
+    assert records[1]['command'] == 'true'
+    for record in records:
+        for key in ['wall_seconds', 'user_seconds', 'sys_seconds',
+                    'max_rss_kb']:
+            assert record[key] >= 0
+
+    # summary should not fail
+    resource_usage.log_resource_usage_summary(config)
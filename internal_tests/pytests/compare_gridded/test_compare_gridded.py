@@ -3,6 +3,8 @@
 import os
 import sys
 import re
+import gzip
+import time
 import logging
 from collections import namedtuple
 import produtil
@@ -299,3 +301,64 @@ def test_handle_window_once(win, app_win, file_win, app_file_win, win_value, fil
     cgw.handle_window_once(c_dict, 'FCST', 'BEGIN', 'APP_NAME')
     assert(c_dict['FCST_WINDOW_BEGIN'] == win_value and \
            c_dict['FCST_FILE_WINDOW_BEGIN'] == file_win_value)
+
+def test_climo_file_found_once(tmpdir, monkeypatch):
+    cgw = compare_gridded_wrapper()
+    calls = []
+    def fake_preprocess_file(filename, data_type, config):
+        calls.append(filename)
+        return filename
+    monkeypatch.setattr(util, 'preprocess_file', fake_preprocess_file)
+    monkeypatch.setattr(os.path, 'exists', lambda path: True)
+
+    cgw.c_dict['CLIMO_MEAN_INPUT_DIR'] = str(tmpdir)
+    cgw.c_dict['CLIMO_MEAN_INPUT_TEMPLATE'] = 'climo_{valid?fmt=%m}.nc'
+
+    climo_files = []
+    for valid in ['2019020100', '2019020112', '2019030100']:
+        time_info = time_util.ti_calculate({
+            'valid': datetime.datetime.strptime(valid, '%Y%m%d%H'),
+            'lead': 0,
+        })
+        cgw.handle_climo(time_info)
+        climo_files.append(cgw.c_dict['CLIMO_MEAN_FILE'])
+
+    # climatology file is only searched for once per month
+    assert calls == [os.path.join(str(tmpdir), 'climo_02.nc'),
+                     os.path.join(str(tmpdir), 'climo_03.nc')]
+    assert climo_files == [calls[0], calls[0], calls[1]]
+
+def test_climo_file_cache_staged(tmpdir):
+    cgw = compare_gridded_wrapper()
+    stage_dir = str(tmpdir.join('stage'))
+    cgw.config.set('dir', 'STAGING_DIR', stage_dir)
+
+    climo_dir = tmpdir.mkdir('climo')
+    climo_path = os.path.join(str(climo_dir), 'climo_02.nc')
+    def write_climo(text):
+        with gzip.open(climo_path + '.gz', 'wt') as file_handle:
+            file_handle.write(text)
+
+    write_climo('first')
+    cgw.c_dict['CLIMO_MEAN_INPUT_DIR'] = str(climo_dir)
+    cgw.c_dict['CLIMO_MEAN_INPUT_TEMPLATE'] = 'climo_{valid?fmt=%m}.nc'
+    time_info = time_util.ti_calculate({
+        'valid': datetime.datetime(2019, 2, 1),
+        'lead': 0,
+    })
+    cgw.handle_climo(time_info)
+    staged_file = cgw.c_dict['CLIMO_MEAN_FILE']
+    assert staged_file == stage_dir + climo_path
+
+    # reused file is marked in use so the staging cache keeps it
+    info_path = util.get_staging_cache_info_path(stage_dir, climo_path)
+    util.release_staged_files(cgw.config)
+    cgw.handle_climo(time_info)
+    assert os.stat(info_path).st_mtime > time.time()
+
+    # file is staged again if the compressed file changed
+    write_climo('second version')
+    cgw.handle_climo(time_info)
+    with open(cgw.c_dict['CLIMO_MEAN_FILE'], 'r') as file_handle:
+        assert file_handle.read() == 'second version'
+    util.release_staged_files(cgw.config)
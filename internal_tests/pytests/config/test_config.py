@@ -54,3 +54,43 @@ def test_getseconds(key, value):
     conf.set('config', 'TEST_SECONDS', key)
     seconds = conf.getseconds('config', 'TEST_SECONDS')
     assert(seconds == value)
+
+def test_freeze_invalidate_on_set():
+    conf = metplus_config()
+    conf.set('config', 'TEST_BASE', '/some/dir')
+    conf.set('config', 'TEST_PATH', '{TEST_BASE}/file')
+    conf.set('config', 'TEST_INT', 3)
+    assert conf.freeze() > 0
+
+    assert conf.getstr('config', 'TEST_PATH') == '/some/dir/file'
+    assert conf.getraw('config', 'TEST_PATH') == '/some/dir/file'
+    assert conf.getint('config', 'TEST_INT') == 3
+
+    # values that reference a changed item are resolved again
+    conf.set('config', 'TEST_BASE', '/other/dir')
+    conf.set('config', 'TEST_INT', 4)
+    assert conf.getstr('config', 'TEST_PATH') == '/other/dir/file'
+    assert conf.getraw('config', 'TEST_PATH') == '/other/dir/file'
+    assert conf.getint('config', 'TEST_INT') == 4
+
+    # items that were not set are found after they are added
+    assert not conf.has_option('config', 'TEST_NEW')
+    assert conf.getstr('config', 'TEST_NEW', 'default') == 'default'
+    conf.set('config', 'TEST_NEW', 'value')
+    assert conf.getstr('config', 'TEST_NEW') == 'value'
+
+def test_lookup_counts():
+    conf = metplus_config()
+    conf.set('config', 'TEST_BASE', '/some/dir')
+    conf.set('config', 'TEST_PATH', '{TEST_BASE}/file')
+    conf.count_lookups = True
+    with conf.lookup_owner('GridStat'):
+        conf.getstr('config', 'TEST_PATH')
+        conf.getraw('config', 'TEST_PATH')
+        conf.getbool('config', 'TEST_BOOL', False)
+
+    conf.getstr('config', 'TEST_BASE')
+
+    # nested lookups are not counted separately
+    assert conf.lookup_counts['GridStat'][0] == 3
+    assert conf.lookup_counts['METplus'][0] == 1
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import pytest
+import numpy as np
+import netCDF4
+
+import produtil
+import config_metplus
+import met_util as util
+import feature_util
+from regrid_data_plane_wrapper import RegridDataPlaneWrapper
+
+# writes a lat/lon grid like regrid_data_plane where TMP = lat * 1000 + lon
+# and appends each call to calls.txt next to the executable
+FAKE_REGRID_DATA_PLANE = '''#!{python}
+import os
+import sys
+import numpy as np
+import netCDF4
+
+# skip verbosity option inserted by the command runner
+args = [arg for arg in sys.argv[1:] if arg not in ('-v', '2')]
+with open(os.path.join(os.path.dirname(sys.argv[0]), 'calls.txt'),
+          'a') as calls:
+    calls.write(' '.join(args[:3]) + '\\n')
+
+_, nx, ny, lat_ll, lon_ll, dlat, dlon = args[1].split()
+nx, ny = int(nx), int(ny)
+lats = float(lat_ll) + np.arange(ny) * float(dlat)
+lons = float(lon_ll) + np.arange(nx) * float(dlon)
+with netCDF4.Dataset(args[2], 'w') as dataset:
+    dataset.Projection = 'LatLon'
+    dataset.lat_ll = '{{:f}} degrees_north'.format(float(lat_ll))
+    dataset.lon_ll = '{{:f}} degrees_east'.format(float(lon_ll))
+    dataset.Nlat = '{{}} grid_points'.format(ny)
+    dataset.Nlon = '{{}} grid_points'.format(nx)
+    dataset.createDimension('lat', ny)
+    dataset.createDimension('lon', nx)
+    lat_var = dataset.createVariable('lat', 'f4', ('lat', 'lon'))
+    lon_var = dataset.createVariable('lon', 'f4', ('lat', 'lon'))
+    tmp_var = dataset.createVariable('TMP', 'f4', ('lat', 'lon'),
+                                     fill_value=-9999.)
+    tmp_var.units = 'K'
+    lon_grid, lat_grid = np.meshgrid(lons, lats)
+    lat_var[:] = lat_grid
+    lon_var[:] = lon_grid
+    tmp_var[:] = lat_grid * 1000 + lon_grid
+'''
+
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='FeatureUtil',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='FeatureUtil')
+        produtil.log.postmsg('feature_util test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        util.get_logger(config)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'feature_util test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+def test_add_regrid_job():
+    regrid_jobs = {}
+    feature_util.add_regrid_job(regrid_jobs, 'fcst', 'grid1', 'out1')
+    feature_util.add_regrid_job(regrid_jobs, 'anly', 'grid2', 'out2')
+    feature_util.add_regrid_job(regrid_jobs, 'fcst', 'grid3', 'out3')
+    # duplicate tiles are only created once
+    feature_util.add_regrid_job(regrid_jobs, 'fcst', 'grid1', 'out1')
+    assert(regrid_jobs == {'fcst': [('grid1', 'out1'), ('grid3', 'out3')],
+                           'anly': [('grid2', 'out2')]})
+
+@pytest.mark.parametrize(
+    'grid_specs, expected', [
+        # overlapping tiles on the same 0.5 degree grid
+        (['"latlon 4 4 10.0 -80.0 0.5 0.5"',
+          '"latlon 4 4 11.0 -79.5 0.5 0.5"'],
+         '"latlon 5 6 10.0 -80.0 0.5 0.5"'),
+        # tiles are different sizes
+        (['"latlon 4 4 10.0 -80.0 0.5 0.5"',
+          '"latlon 3 4 11.0 -79.5 0.5 0.5"'], None),
+        # grid points do not line up
+        (['"latlon 4 4 10.0 -80.0 0.5 0.5"',
+          '"latlon 4 4 11.0 -79.5 1.0 1.0"'], None),
+        (['"latlon 4 4 10.0 -80.0 1.0 1.0"',
+          '"latlon 4 4 10.5 -80.0 1.0 1.0"'], None),
+        # tiles are far apart
+        (['"latlon 4 4 10.0 -80.0 0.5 0.5"',
+          '"latlon 4 4 30.0 -40.0 0.5 0.5"'], None),
+    ]
+)
+def test_get_union_grid_spec(grid_specs, expected):
+    assert(feature_util.get_union_grid_spec(grid_specs) == expected)
+
+def test_run_regrid_jobs(tmpdir):
+    config = metplus_config()
+    config.set('dir', 'TMP_DIR', str(tmpdir.join('tmp')))
+    config.set('config', 'EXTRACT_TILES_REGRID_PROCESSES', 2)
+
+    exe_dir = tmpdir.mkdir('bin')
+    regrid_data_plane = str(exe_dir.join('regrid_data_plane'))
+    with open(regrid_data_plane, 'w') as exe_file:
+        exe_file.write(FAKE_REGRID_DATA_PLANE.format(python=sys.executable))
+    os.chmod(regrid_data_plane, 0o755)
+
+    tiles = {'fcst': ['"latlon 4 4 10.0 -80.0 0.5 0.5"',
+                      '"latlon 4 4 11.0 -79.5 0.5 0.5"',
+                      '"latlon 4 4 10.5 -81.0 0.5 0.5"'],
+             'anly': ['"latlon 4 4 20.0 -60.0 0.5 0.5"']}
+    regrid_jobs = {}
+    for input_file, grid_specs in tiles.items():
+        for index, grid_spec in enumerate(grid_specs):
+            output_file = str(tmpdir.join(f'{input_file}_{index}.nc'))
+            feature_util.add_regrid_job(regrid_jobs, input_file, grid_spec,
+                                        output_file)
+
+    rdp = RegridDataPlaneWrapper(config, config.logger)
+    feature_util.run_regrid_jobs(regrid_jobs, regrid_data_plane, '', rdp,
+                                 config)
+
+    # each input file is only regridded once
+    with open(str(exe_dir.join('calls.txt'))) as calls:
+        inputs = sorted(line.split()[0] for line in calls)
+    assert(inputs == ['anly', 'fcst'])
+
+    # tiles match the output of regridding directly to the tile
+    for input_file, grid_specs in tiles.items():
+        for index, grid_spec in enumerate(grid_specs):
+            expected_file = str(tmpdir.join('expected.nc'))
+            os.system(f"{regrid_data_plane} {input_file} {grid_spec} "
+                      f"{expected_file}")
+            with netCDF4.Dataset(expected_file) as expected, \
+                 netCDF4.Dataset(str(tmpdir.join(f'{input_file}_{index}.nc'))) as actual:
+                assert(expected.__dict__ == actual.__dict__)
+                for name in ('lat', 'lon', 'TMP'):
+                    assert(np.array_equal(expected.variables[name][:],
+                                          actual.variables[name][:]))
+                assert(actual.variables['TMP'].units == 'K')
+
+    # temporary file covering all tiles is removed
+    assert(os.listdir(str(tmpdir.join('tmp'))) == [])
+
+# writes a few lines of output with the input file name, pausing between
+# lines so output of commands running at the same time would be mixed
+FAKE_REGRID_DATA_PLANE_LOG = '''#!/bin/sh
+# skip verbosity option inserted by the command runner
+shift 2
+for line in 1 2 3 4 5; do
+  echo "regrid $1 $line"
+  sleep 0.05
+done
+'''
+
+def test_run_regrid_jobs_log_order(tmpdir):
+    config = metplus_config()
+    config.set('dir', 'TMP_DIR', str(tmpdir.join('tmp')))
+    config.set('config', 'EXTRACT_TILES_REGRID_PROCESSES', 2)
+    config.set('config', 'LOG_MET_OUTPUT_TO_METPLUS', True)
+    log_file = str(tmpdir.join('metplus.log'))
+    config.set('config', 'LOG_METPLUS', log_file)
+
+    regrid_data_plane = str(tmpdir.join('regrid_data_plane'))
+    with open(regrid_data_plane, 'w') as exe_file:
+        exe_file.write(FAKE_REGRID_DATA_PLANE_LOG)
+    os.chmod(regrid_data_plane, 0o755)
+
+    regrid_jobs = {}
+    for input_file in ['fcst', 'anly']:
+        feature_util.add_regrid_job(regrid_jobs, input_file,
+                                    '"latlon 4 4 10.0 -80.0 0.5 0.5"',
+                                    str(tmpdir.join(f'{input_file}.nc')))
+
+    rdp = RegridDataPlaneWrapper(config, config.logger)
+    feature_util.run_regrid_jobs(regrid_jobs, regrid_data_plane, '', rdp,
+                                 config)
+
+    # output of each command is together and in the order of the inputs
+    with open(log_file) as log_handle:
+        lines = [line.strip() for line in log_handle
+                 if line.startswith('regrid ')]
+    assert(lines == [f'regrid {input_file} {line}'
+                     for input_file in ['fcst', 'anly']
+                     for line in range(1, 6)])
+    assert(os.listdir(str(tmpdir.join('tmp'))) == [])
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import datetime
+import pytest
+
+import file_catalog
+
+TEMPLATE = '{valid?fmt=%Y%m%d}/file_{valid?fmt=%Y%m%d%H}.nc'
+
+def create_files(data_dir, hours):
+    for hour in hours:
+        valid = datetime.datetime(2019, 2, 1) + datetime.timedelta(hours=hour)
+        sub_dir = os.path.join(data_dir, valid.strftime('%Y%m%d'))
+        if not os.path.exists(sub_dir):
+            os.makedirs(sub_dir)
+        open(os.path.join(sub_dir, valid.strftime('file_%Y%m%d%H.nc')), 'w').close()
+
+def get_hours(matches):
+    # files are returned in directory order, so sort by time to compare
+    return sorted((match[0] - datetime.datetime(2019, 2, 1)).total_seconds() / 3600
+                  for match in matches)
+
+@pytest.mark.parametrize(
+    'begin_hour, end_hour, expected_hours', [
+        (0, 48, [0, 6, 12, 18, 24, 30]),
+        (6, 18, [6, 12, 18]),
+        (7, 11, []),
+        (20, 100, [24, 30]),
+    ]
+)
+def test_find_files(tmpdir, begin_hour, end_hour, expected_hours):
+    data_dir = str(tmpdir)
+    create_files(data_dir, [0, 6, 12, 18, 24, 30])
+    # file that does not match template is ignored
+    open(os.path.join(data_dir, 'README'), 'w').close()
+
+    catalog = file_catalog.FileCatalog(data_dir, TEMPLATE)
+    start = datetime.datetime(2019, 2, 1)
+    matches = catalog.find_files(start + datetime.timedelta(hours=begin_hour),
+                                 start + datetime.timedelta(hours=end_hour))
+    assert(get_hours(matches) == expected_hours)
+    for valid, fullpath, time_info in matches:
+        assert(os.path.exists(fullpath))
+        assert(time_info['valid'] == valid)
+
+def test_refresh(tmpdir):
+    data_dir = str(tmpdir)
+    create_files(data_dir, [0, 6])
+    begin = datetime.datetime(2019, 2, 1)
+    end = datetime.datetime(2019, 2, 3)
+
+    catalog = file_catalog.FileCatalog(data_dir, TEMPLATE)
+    assert(get_hours(catalog.find_files(begin, end)) == [0, 6])
+
+    # nothing changed, so index is not rebuilt
+    assert(not catalog.refresh())
+
+    # new files are found in existing and new directories
+    create_files(data_dir, [12, 24])
+    assert(get_hours(catalog.find_files(begin, end)) == [0, 6, 12, 24])
+
+    # removed directories are removed from the index
+    shutil.rmtree(os.path.join(data_dir, '20190202'))
+    assert(get_hours(catalog.find_files(begin, end)) == [0, 6, 12])
+
+def test_get_file_catalog(tmpdir):
+    file_catalog.clear_file_catalogs()
+    data_dir = str(tmpdir)
+    catalog = file_catalog.get_file_catalog(data_dir, TEMPLATE)
+    assert(file_catalog.get_file_catalog(data_dir, TEMPLATE) is catalog)
+    assert(file_catalog.get_file_catalog(data_dir, 'other') is not catalog)
+    file_catalog.clear_file_catalogs()
+    assert(file_catalog.get_file_catalog(data_dir, TEMPLATE) is not catalog)
@@ -185,3 +185,18 @@ def test_window_variables_(conf_dict, out_dict):
 
     assert(good == True)
 
+
+@pytest.mark.parametrize(
+    'output_prefix, lead, expected', [
+        ('', 43200, 'grid_stat_120000L_20050807_120000V'),
+        ('GFS', 43200, 'grid_stat_GFS_120000L_20050807_120000V'),
+        ('GFS', 432000, 'grid_stat_GFS_1200000L_20050807_120000V'),
+    ]
+)
+def test_get_output_file_prefix(output_prefix, lead, expected):
+    gsw = grid_stat_wrapper()
+    gsw.add_env_var('OUTPUT_PREFIX', output_prefix)
+    valid = datetime.datetime(2005, 8, 7, 12)
+    gsw.c_dict['CURRENT_TIME_INFO'] = time_util.ti_calculate({'valid': valid,
+                                                              'lead': lead})
+    assert(gsw.get_output_file_prefix() == expected)
@@ -9,6 +9,9 @@ import produtil
 import os
 import subprocess
 import shutil
+import gzip
+import bz2
+import zipfile
 from dateutil.relativedelta import relativedelta
 import config_metplus
 
@@ -305,6 +308,31 @@ def test_parse_var_list_fcst_and_obs():
            var_list[3]['fcst_level'] == "FLEVELS22" and \
            var_list[3]['obs_level'] == "OLEVELS22")
 
+# field plan read once gives the same result as reading config for each time
+def test_parse_var_list_field_plan():
+    conf = metplus_config()
+    conf.set('config', 'FCST_VAR1_NAME', "FNAME1")
+    conf.set('config', 'FCST_VAR1_LEVELS', "F{custom}1, F{custom}2")
+    conf.set('config', 'FCST_VAR1_OPTIONS', "opt = {custom}")
+    conf.set('config', 'OBS_VAR1_NAME', "ONAME1")
+    conf.set('config', 'OBS_VAR1_LEVELS', "O{custom}1, O{custom}2")
+    conf.set('config', 'BOTH_VAR2_NAME', "NAME2_{custom}")
+    conf.set('config', 'BOTH_VAR2_LEVELS', "L2")
+    conf.set('config', 'BOTH_VAR2_THRESH', "gt1, lt2")
+
+    field_plan = util.get_field_plan(conf)
+    assert len(field_plan) == 2
+    for custom in ['A', 'B']:
+        time_info = {'custom': custom}
+        expected_list = util.parse_var_list(conf, time_info)
+        var_list = util.parse_var_list(conf, time_info, field_plan=field_plan)
+        assert var_list == expected_list
+        assert var_list[0]['fcst_level'] == f"F{custom}1"
+        assert var_list[1]['obs_level'] == f"O{custom}2"
+        assert var_list[0]['fcst_extra'] == f"opt = {custom};"
+        assert var_list[2]['fcst_name'] == f"NAME2_{custom}"
+        assert var_list[2]['obs_thresh'] == ['gt1', 'lt2']
+
 # VAR1 defined by FCST, VAR2 defined by OBS
 def test_parse_var_list_fcst_and_obs_alternate():
     conf = metplus_config()
@@ -647,3 +675,185 @@ def test_get_time_obj(time_from_conf, fmt, is_datetime):
     time_obj = util.get_time_obj(time_from_conf, fmt, clock_time)
 
     assert(isinstance(time_obj, datetime.datetime) == is_datetime)
+
+class FakeTimeWrapper:
+    """!Minimal wrapper that reports an error for each run time listed"""
+    def __init__(self, error_hours):
+        self.errors = 0
+        self.error_hours = error_hours
+        self.c_dict = {}
+
+    def clear(self):
+        pass
+
+    def run_at_time(self, input_dict):
+        if input_dict['init'].hour in self.error_hours:
+            self.errors += 1
+
+    def wait_for_commands(self):
+        return True
+
+@pytest.mark.parametrize(
+    'num_parallel', [
+        1, 2, 8,
+    ]
+)
+def test_run_times_in_parallel(num_parallel):
+    conf = metplus_config()
+    conf.set('config', 'LOOP_BY', 'INIT')
+    run_times = [datetime.datetime(2019, 2, 1, hour) for hour in [0, 6, 12, 18]]
+
+    processes = [FakeTimeWrapper([6, 18]), FakeTimeWrapper([12])]
+    util.run_times_in_parallel(conf, processes, run_times, num_parallel)
+    assert([process.errors for process in processes] == [2, 1])
+
+def create_compressed_file(path, content, ext):
+    if ext == '.gz':
+        with gzip.open(path + ext, 'wb') as file_handle:
+            file_handle.write(content)
+    elif ext == '.bz2':
+        with bz2.open(path + ext, 'wb') as file_handle:
+            file_handle.write(content)
+    elif ext == '.zip':
+        with zipfile.ZipFile(path + ext, 'w') as zip_file:
+            zip_file.writestr(os.path.basename(path), content)
+
+@pytest.mark.parametrize(
+    'ext', [
+        '.gz', '.bz2', '.zip',
+    ]
+)
+def test_preprocess_file_uncompress(tmpdir, ext):
+    conf = metplus_config()
+    stage_dir = str(tmpdir.join('stage'))
+    conf.set('dir', 'STAGING_DIR', stage_dir)
+    input_path = str(tmpdir.join('input.grb2'))
+    create_compressed_file(input_path, b'data' * 1000, ext)
+
+    outpath = util.preprocess_file(input_path, None, conf)
+    assert(outpath == stage_dir + input_path)
+    with open(outpath, 'rb') as file_handle:
+        assert(file_handle.read() == b'data' * 1000)
+
+    # staged file is used if compressed file has not changed
+    assert(util.preprocess_file(input_path + ext, None, conf) == outpath)
+
+def test_preprocess_file_stale(tmpdir):
+    conf = metplus_config()
+    stage_dir = str(tmpdir.join('stage'))
+    conf.set('dir', 'STAGING_DIR', stage_dir)
+    input_path = str(tmpdir.join('input.grb2'))
+    create_compressed_file(input_path, b'old', '.gz')
+    outpath = util.preprocess_file(input_path, None, conf)
+
+    # replace compressed file with different content and modification time
+    create_compressed_file(input_path, b'new data', '.gz')
+    os.utime(input_path + '.gz', (0, 0))
+    assert(util.preprocess_file(input_path, None, conf) == outpath)
+    with open(outpath, 'rb') as file_handle:
+        assert(file_handle.read() == b'new data')
+
+def test_limit_staging_cache(tmpdir):
+    conf = metplus_config()
+    stage_dir = str(tmpdir.join('stage'))
+    conf.set('dir', 'STAGING_DIR', stage_dir)
+    input_paths = [str(tmpdir.join(f'input{index}.grb2')) for index in range(3)]
+    for index, input_path in enumerate(input_paths):
+        create_compressed_file(input_path, b'x' * 1000, '.gz')
+        util.preprocess_file(input_path, None, conf)
+        # mark older files as used less recently
+        info_path = util.get_staging_cache_info_path(stage_dir, input_path)
+        os.utime(info_path, (index, index))
+
+    util.limit_staging_cache(stage_dir, 2000)
+    staged = [os.path.exists(stage_dir + input_path) for input_path in input_paths]
+    assert(staged == [False, True, True])
+
+def test_staged_files_in_use(tmpdir):
+    conf = metplus_config()
+    stage_dir = str(tmpdir.join('stage'))
+    conf.set('dir', 'STAGING_DIR', stage_dir)
+    conf.set('config', 'STAGING_CACHE_MAX_MB', 1)
+    input_paths = [str(tmpdir.join(f'input{index}.grb2')) for index in range(3)]
+    for input_path in input_paths:
+        create_compressed_file(input_path, b'x' * 600000, '.gz')
+
+    # files staged for commands that have not run yet are not removed
+    # even though they are larger than the limit
+    util.preprocess_files(input_paths, None, conf)
+    staged = [os.path.exists(stage_dir + input_path) for input_path in input_paths]
+    assert(staged == [True, True, True])
+
+    # files are removed after the commands have finished
+    util.release_staged_files(conf)
+    staged = [os.path.exists(stage_dir + input_path) for input_path in input_paths]
+    assert(staged.count(True) == 1)
+
+@pytest.mark.parametrize(
+    'in_use', [
+        0, 1, 2,
+    ]
+)
+def test_limit_staging_cache_in_use(tmpdir, in_use):
+    conf = metplus_config()
+    stage_dir = str(tmpdir.join('stage'))
+    conf.set('dir', 'STAGING_DIR', stage_dir)
+    input_paths = [str(tmpdir.join(f'input{index}.grb2')) for index in range(3)]
+    for index, input_path in enumerate(input_paths):
+        create_compressed_file(input_path, b'x' * 1000, '.gz')
+        util.preprocess_file(input_path, None, conf)
+        info_path = util.get_staging_cache_info_path(stage_dir, input_path)
+        os.utime(info_path, (index, index))
+
+    # the in use file is kept and older files that are not in use are
+    # removed first regardless of the order the files are found
+    info_path = util.get_staging_cache_info_path(stage_dir,
+                                                 input_paths[in_use])
+    util.mark_staged_file_in_use(info_path)
+    util.limit_staging_cache(stage_dir, 2000)
+    staged = [os.path.exists(stage_dir + input_path) for input_path in input_paths]
+    expected = [False, True, True] if in_use else [True, False, True]
+    assert(staged == expected)
+
+    # only the in use file is kept if the others must all be removed
+    util.limit_staging_cache(stage_dir, 0)
+    staged = [os.path.exists(stage_dir + input_path) for input_path in input_paths]
+    assert(staged == [index == in_use for index in range(3)])
+
+@pytest.mark.parametrize(
+    'num_threads', [
+        1, 4,
+    ]
+)
+def test_preprocess_files(tmpdir, num_threads):
+    conf = metplus_config()
+    stage_dir = str(tmpdir.join('stage'))
+    conf.set('dir', 'STAGING_DIR', stage_dir)
+    conf.set('config', 'STAGING_PREFETCH_THREADS', num_threads)
+    input_paths = [str(tmpdir.join(f'input{index}.grb2')) for index in range(5)]
+    for index, input_path in enumerate(input_paths):
+        create_compressed_file(input_path, bytes([index]) * 100, '.bz2')
+
+    missing = str(tmpdir.join('missing.grb2'))
+    out = util.preprocess_files(input_paths + [missing], None, conf)
+    assert(out == [stage_dir + input_path for input_path in input_paths] + [None])
+    for index, outpath in enumerate(out[:-1]):
+        with open(outpath, 'rb') as file_handle:
+            assert(file_handle.read() == bytes([index]) * 100)
+
+def test_split_by_storm_id(tmpdir):
+    filter_file = str(tmpdir.join('filter.tcst'))
+    with open(filter_file, 'w') as file_handle:
+        file_handle.write('AMODEL STORM_ID INIT\n')
+        file_handle.write('GFSO AL092019 20190901_00\n')
+        file_handle.write('GFSO AL0920190 20190901_00\n')
+        file_handle.write('AL092019 AL102019 20190901_00\n')
+        file_handle.write('GFSO AL092019 20190901_06\n')
+
+    header, storm_lines = util.split_by_storm_id(filter_file)
+    assert(header == 'AMODEL STORM_ID INIT\n')
+    assert(list(storm_lines.keys()) == ['AL092019', 'AL0920190', 'AL102019'])
+    # only rows with matching STORM_ID column are included
+    assert(storm_lines['AL092019'] == ['GFSO AL092019 20190901_00\n',
+                                       'GFSO AL092019 20190901_06\n'])
+    assert(util.split_by_storm_id(str(tmpdir.join('missing.tcst'))) == ('', {}))
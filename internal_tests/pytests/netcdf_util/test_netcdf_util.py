@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+import os
+import pytest
+import numpy as np
+import netCDF4
+
+import netcdf_util
+
+def create_series_file(path, total, rmse):
+    with netCDF4.Dataset(path, 'w') as dataset:
+        dataset.createDimension('lat', 2)
+        dataset.createDimension('lon', 2)
+        for name, values in [('series_cnt_TOTAL', total),
+                             ('series_cnt_RMSE', rmse),
+                             ('lat', None)]:
+            if values is None:
+                dataset.createVariable(name, 'f4', ('lat',))
+                continue
+            variable = dataset.createVariable(name, 'f4', ('lat', 'lon'),
+                                              fill_value=-9999.)
+            variable[:] = np.array(values, dtype='f4')
+
+def test_get_variable_min_max(tmpdir):
+    netcdf_util.clear_cache()
+    path = str(tmpdir.join('series_F006.nc'))
+    create_series_file(path, [[3, 12], [-9999., 7]], [[-9999., -9999.],
+                                                      [-9999., -9999.]])
+    stats = netcdf_util.get_variable_min_max(path)
+    # fill values are ignored and other variables are not read
+    assert(stats == {'series_cnt_TOTAL': (3.0, 12.0),
+                     'series_cnt_RMSE': (None, None)})
+
+    # file is read again if it changes
+    create_series_file(path, [[1, 2], [3, 4]], [[0.5, 1.5], [1, 1]])
+    os.utime(path, (0, 0))
+    stats = netcdf_util.get_variable_min_max(path)
+    assert(stats['series_cnt_TOTAL'] == (1.0, 4.0))
+    assert(stats['series_cnt_RMSE'] == (0.5, 1.5))
+
+@pytest.mark.parametrize(
+    'value, expected', [
+        (12.0, '12'),
+        (0.5, '0.5'),
+        (None, None),
+    ]
+)
+def test_format_value(value, expected):
+    assert(netcdf_util.format_value(value) == expected)
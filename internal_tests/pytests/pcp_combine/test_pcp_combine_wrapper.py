@@ -10,8 +10,10 @@ import produtil
 import pytest
 import config_metplus
 from pcp_combine_wrapper import PCPCombineWrapper
+from reformat_gridded_wrapper import ReformatGriddedWrapper
 import time_util
 import met_util as util
+import task_scheduler
 
 # --------------------TEST CONFIGURATION and FIXTURE SUPPORT -------------
 #
@@ -280,3 +282,164 @@ def test_setup_subtract_method():
     out_file = pcw.get_output_path()    
     assert(len(in_files) == 2)
 
+
+def test_find_input_path_cache(tmpdir, monkeypatch):
+    pcw = pcp_combine_wrapper('OBS')
+    calls = []
+    preprocess_file = util.preprocess_file
+    def counted_preprocess_file(filename, data_type, config):
+        calls.append(filename)
+        return preprocess_file(filename, data_type, config)
+    monkeypatch.setattr(util, 'preprocess_file', counted_preprocess_file)
+
+    input_file = str(tmpdir.join('file.2016090418.01h'))
+    open(input_file, 'w').close()
+
+    # existing file is only checked once
+    assert pcw.find_input_path(input_file, 'NETCDF') == input_file
+    assert pcw.find_input_path(input_file, 'NETCDF') == input_file
+    assert calls == [input_file]
+
+    # file missing from directory listing is never checked
+    missing_file = str(tmpdir.join('file.2016090417.01h'))
+    assert pcw.find_input_path(missing_file, 'NETCDF') is None
+    assert calls == [input_file]
+
+    # file that was not found is searched again at the next run time
+    open(missing_file, 'w').close()
+    assert pcw.find_input_path(missing_file, 'NETCDF') is None
+    monkeypatch.setattr(ReformatGriddedWrapper, 'run_at_time',
+                        lambda self, input_dict: None)
+    pcw.run_at_time({})
+    assert pcw.find_input_path(missing_file, 'NETCDF') == missing_file
+
+def test_find_input_path_new_file(tmpdir, monkeypatch):
+    pcw = pcp_combine_wrapper('OBS')
+    first_file = str(tmpdir.join('a.nc'))
+    open(first_file, 'w').close()
+    # make directory look like it was last modified long ago
+    os.utime(str(tmpdir), ns=(0, 0))
+    assert pcw.find_input_path(first_file, 'NETCDF') == first_file
+
+    # file written by another wrapper after the directory was read is found
+    second_file = str(tmpdir.join('b.nc'))
+    open(second_file, 'w').close()
+    assert pcw.find_input_path(second_file, 'NETCDF') == second_file
+
+def test_runs_once_per_time():
+    # planning inputs does not make PCPCombine run over all times at once
+    # when LOOP_ORDER is tasks or in stream mode
+    pcw = pcp_combine_wrapper('OBS')
+    pcw.c_dict['PLAN_INPUTS'] = True
+    assert task_scheduler.runs_once_per_time(pcw)
+
+def read_time_config(conf, tmpdir, valid_beg, valid_end, input_template):
+    """!Set run times and OBS filename templates. Values that contain % cannot
+        be set directly, so they are read from a file"""
+    conf_file = str(tmpdir.join('times.conf'))
+    with open(conf_file, 'w') as file_handle:
+        file_handle.write(f"""[config]
+LOOP_BY = VALID
+VALID_TIME_FMT = %Y%m%d%H
+VALID_BEG = {valid_beg}
+VALID_END = {valid_end}
+VALID_INCREMENT = 1H
+[filename_templates]
+OBS_PCP_COMBINE_INPUT_TEMPLATE = {input_template}
+OBS_PCP_COMBINE_OUTPUT_TEMPLATE = {{valid?fmt=%Y%m%d%H}}_A{{level?fmt=%HH}}h.nc
+""")
+    conf.read(conf_file)
+
+def test_plan_inputs(tmpdir, monkeypatch):
+    import gzip
+    conf = metplus_config()
+    conf.set('config', 'FCST_PCP_COMBINE_RUN', False)
+    conf.set('config', 'OBS_PCP_COMBINE_RUN', True)
+    conf.set('config', 'OBS_PCP_COMBINE_OUTPUT_ACCUM', '3')
+    conf.set('config', 'OBS_PCP_COMBINE_OUTPUT_NAME', 'APCP')
+    conf.set('config', 'PCP_COMBINE_PLAN_INPUTS', True)
+    conf.set('config', 'DO_NOT_RUN_EXE', True)
+    conf.set('config', 'LEAD_SEQ', '0')
+    conf.set('dir', 'OBS_PCP_COMBINE_INPUT_DIR', str(tmpdir.mkdir('in')))
+    conf.set('dir', 'OBS_PCP_COMBINE_OUTPUT_DIR', str(tmpdir.join('out')))
+    conf.set('dir', 'STAGING_DIR', str(tmpdir.join('stage')))
+
+    read_time_config(conf, tmpdir, '2016090403', '2016090404',
+                     '{valid?fmt=%Y%m%d%H}.{level?fmt=%HH}h')
+
+    for hour in range(1, 5):
+        with gzip.open(str(tmpdir.join('in', f'201609040{hour}.01h.gz')), 'wb') as file_handle:
+            file_handle.write(b'data')
+
+    calls = []
+    preprocess_file = util.preprocess_file
+    def counted_preprocess_file(filename, data_type, config):
+        calls.append(filename)
+        return preprocess_file(filename, data_type, config)
+    monkeypatch.setattr(util, 'preprocess_file', counted_preprocess_file)
+
+    pcw = PCPCombineWrapper(conf, conf.logger)
+    commands = []
+    monkeypatch.setattr(pcw, 'build',
+                        lambda: commands.append(list(pcw.infiles)) or True)
+    pcw.run_all_times()
+
+    # files shared by both run times are only staged once
+    assert len(calls) == 4
+    stage_dir = str(tmpdir.join('stage')) + str(tmpdir.join('in'))
+    assert commands == [
+        [os.path.join(stage_dir, f'201609040{hour}.01h') for hour in hours]
+        for hours in [(3, 2, 1), (4, 3, 2)]
+    ]
+    assert pcw.errors == 0
+
+def test_in_process_add(tmpdir):
+    import numpy as np
+    import netCDF4
+    conf = metplus_config()
+    conf.set('config', 'FCST_PCP_COMBINE_RUN', False)
+    conf.set('config', 'OBS_PCP_COMBINE_RUN', True)
+    conf.set('config', 'OBS_PCP_COMBINE_OUTPUT_ACCUM', '3')
+    conf.set('config', 'OBS_PCP_COMBINE_OUTPUT_NAME', 'APCP')
+    conf.set('config', 'PCP_COMBINE_IN_PROCESS', True)
+    conf.set('config', 'DO_NOT_RUN_EXE', False)
+    conf.set('config', 'LEAD_SEQ', '0')
+    conf.set('dir', 'OBS_PCP_COMBINE_INPUT_DIR', str(tmpdir.mkdir('in')))
+    conf.set('dir', 'OBS_PCP_COMBINE_OUTPUT_DIR', str(tmpdir.join('out')))
+    read_time_config(conf, tmpdir, '2016090403', '2016090406',
+                     '{valid?fmt=%Y%m%d%H}.nc')
+
+    # hourly files where each value is the hour, with one missing point
+    for hour in range(1, 7):
+        path = str(tmpdir.join('in', f'201609040{hour}.nc'))
+        with netCDF4.Dataset(path, 'w') as dataset:
+            dataset.createDimension('lat', 2)
+            dataset.createDimension('lon', 3)
+            lat = dataset.createVariable('lat', 'f4', ('lat',))
+            lat[:] = [40., 41.]
+            var = dataset.createVariable('P01M_NONE', 'f4', ('lat', 'lon'),
+                                         fill_value=-9999.)
+            var.units = 'kg/m^2'
+            values = np.full((2, 3), float(hour), dtype=np.float32)
+            if hour == 5:
+                values[0, 0] = -9999.
+            var[:] = values
+
+    pcw = PCPCombineWrapper(conf, conf.logger)
+    pcw.run_all_times()
+    assert pcw.errors == 0
+
+    # each input file is only read once
+    assert pcw.accum_engine.reads == 6
+
+    for valid_hour in range(3, 7):
+        path = str(tmpdir.join('out', f'201609040{valid_hour}_A03h.nc'))
+        with netCDF4.Dataset(path, 'r') as dataset:
+            data = dataset.variables['APCP_3'][:]
+            assert dataset.variables['APCP_3'].accum_time_sec == 10800
+            assert 'lat' in dataset.variables
+
+        expected = sum(range(valid_hour - 2, valid_hour + 1))
+        assert data[1, 2] == expected
+        # point missing at hour 5 is missing in outputs that include it
+        assert bool(np.ma.is_masked(data[0, 0])) == (valid_hour >= 5)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import logging
+import pytest
+
+import produtil
+import config_metplus
+import met_util as util
+from plot_service import PlotService
+
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='PlotService',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='PlotService')
+        produtil.log.postmsg('plot_service test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        util.get_logger(config)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'plot_service test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+def test_plot_service(tmpdir):
+    config = metplus_config()
+    log_file = str(tmpdir.join('plots.log'))
+
+    # helper module keeps a count of how many times it was used
+    with open(str(tmpdir.join('count_util.py')), 'w') as file_handle:
+        file_handle.write("calls = []\n")
+
+    script = str(tmpdir.join('plot_test.py'))
+    with open(script, 'w') as file_handle:
+        file_handle.write("""import os
+import logging
+import count_util
+logger = logging.getLogger(os.environ['LOG_METPLUS'])
+logger.setLevel('INFO')
+logger.addHandler(logging.FileHandler(os.environ['LOG_METPLUS'], mode='a'))
+count_util.calls.append(os.environ['PLOT_NAME'])
+logger.info('plot ' + os.environ['PLOT_NAME'])
+with open(os.environ['OUTPUT_FILE'], 'w') as file_handle:
+    file_handle.write(str(len(count_util.calls)))
+if os.environ['PLOT_NAME'] == 'bad':
+    exit(1)
+""")
+
+    with PlotService(config.logger) as service:
+        results = []
+        for name in ['one', 'two', 'bad']:
+            env = {'LOG_METPLUS': log_file,
+                   'PLOT_NAME': name,
+                   'OUTPUT_FILE': str(tmpdir.join(f'{name}.txt'))}
+            results.append(service.run(script, env))
+        worker_pid = service.process.pid
+
+    assert [ret for ret, _ in results] == [0, 0, 1]
+    assert 'exited with 1' in results[2][1]
+
+    # helper module was only imported once by the worker
+    with open(str(tmpdir.join('two.txt')), 'r') as file_handle:
+        assert file_handle.read() == '2'
+
+    # log handlers added by each script are removed after it runs
+    with open(log_file, 'r') as file_handle:
+        assert file_handle.read().splitlines() == ['plot one', 'plot two',
+                                                   'plot bad']
+
+    # environment of this process is not changed
+    assert 'PLOT_NAME' not in os.environ
+    assert worker_pid != os.getpid()
@@ -832,3 +832,140 @@ def test_calculate_stat():
         assert(test_stat_values_array[1,0,l] ==
                 expected_stat_values_array[1,0,l])
     assert(test_stat_plot_name == expected_stat_plot_name)
+
+def test_read_stat_file(tmpdir, monkeypatch):
+    # Test that .stat files are parsed once and loaded from the
+    # cache until the file changes
+    met_version = '8.1'
+    header = ' '.join(plot_util.get_stat_file_base_columns(met_version)
+                      +['TOTAL', 'FBAR', 'OBAR', 'FOBAR', 'FFBAR', 'OOBAR',
+                        'MAE'])
+    row = ('V8.1 GFS NA 240000 {date}_000000 {date}_000000 000000 '
+           '{date}_000000 {date}_000000 HGT NA P500 HGT NA P500 ANLYS '
+           'G002 NEAREST 1 NA NA NA NA SL1L2 {total} 5525.75 5525.66 '
+           '30533604.1 30534549.2 30532658.7 NA')
+    stat_file = str(tmpdir.join('GFS_dump_row.stat'))
+    with open(stat_file, 'w') as file_handle:
+        file_handle.write(header+'\n'
+                          +row.format(date='20190101', total=10226)+'\n'
+                          +row.format(date='20190102', total=10226)+'\n')
+    cache_dir = str(tmpdir.join('stat_cache'))
+    test_data = plot_util.read_stat_file(logger, met_version, stat_file,
+                                         cache_dir)
+    assert(test_data['FCST_VALID_BEG'].tolist() ==
+           ['20190101_000000', '20190102_000000'])
+    assert(test_data['FCST_LEAD'][0] == '240000')
+    assert(test_data['TOTAL'].dtype == np.float64)
+    assert(test_data['FBAR'][0] == 5525.75)
+    assert(np.isnan(test_data['MAE'][0]))
+    assert(len(os.listdir(cache_dir)) == 1)
+    # Changes made by the caller do not change the cached copy
+    test_data.loc[0, 'TOTAL'] = 0
+    # Loaded from memory, then from the cache directory,
+    # without parsing the file again
+    def fail_parse(logger, met_version, stat_file):
+        raise AssertionError('file should not be parsed again')
+    monkeypatch.setattr(plot_util, 'parse_stat_file', fail_parse)
+    test_data = plot_util.read_stat_file(logger, met_version, stat_file,
+                                         cache_dir)
+    assert(test_data['TOTAL'][0] == 10226)
+    plot_util.stat_file_cache.clear()
+    test_data = plot_util.read_stat_file(logger, met_version, stat_file,
+                                         cache_dir)
+    assert(len(test_data) == 2)
+    monkeypatch.undo()
+    # File is parsed again after it changes
+    with open(stat_file, 'a') as file_handle:
+        file_handle.write(row.format(date='20190103', total=5)+'\n')
+    test_data = plot_util.read_stat_file(logger, met_version, stat_file,
+                                         cache_dir)
+    assert(test_data['TOTAL'].tolist() == [10226, 10226, 5])
+    # File with only a header has no data
+    empty_file = str(tmpdir.join('empty_dump_row.stat'))
+    with open(empty_file, 'w') as file_handle:
+        file_handle.write(header+'\n')
+    assert(plot_util.read_stat_file(logger, met_version, empty_file) is None)
+    # Only the most recently used files are kept in memory
+    monkeypatch.setattr(plot_util, 'STAT_FILE_CACHE_SIZE', 2)
+    plot_util.stat_file_cache.clear()
+    plot_util.read_stat_file(logger, met_version, stat_file)
+    plot_util.read_stat_file(logger, met_version, empty_file)
+    plot_util.read_stat_file(logger, met_version, stat_file)
+    other_file = str(tmpdir.join('other_dump_row.stat'))
+    with open(other_file, 'w') as file_handle:
+        file_handle.write(header+'\n'+row.format(date='20190101', total=1))
+    plot_util.read_stat_file(logger, met_version, other_file)
+    assert(list(plot_util.stat_file_cache.keys()) ==
+           [os.path.abspath(stat_file), os.path.abspath(other_file)])
+
+def test_align_stat_file_dates():
+    # Independently test getting the .stat file values
+    # for each expected date
+    stat_file_data = pd.DataFrame({
+        'FCST_VALID_BEG': ['20190102_000000', '20190101_000000',
+                           '20190102_000000', '20190105_000000'],
+        'LINE_TYPE': ['SL1L2', 'SL1L2', 'SL1L2', 'SL1L2'],
+        'TOTAL': [2., 1., 99., 5.],
+        'FBAR': [20., 10., 99., 50.]
+    })
+    expected_dates = ['20190101_000000', '20190102_000000',
+                      '20190103_000000']
+    data_index = pd.MultiIndex.from_product(
+        [['MODEL_TEST'], expected_dates],
+        names=['model_plot_name', 'dates']
+    )
+    test_data = plot_util.align_stat_file_dates(stat_file_data,
+                                                expected_dates, data_index,
+                                                ['TOTAL', 'FBAR'])
+    assert(test_data.index.equals(data_index))
+    assert(test_data.columns.tolist() == ['TOTAL', 'FBAR'])
+    # First row is used for duplicate dates
+    assert(test_data['TOTAL'].tolist()[:2] == [1., 2.])
+    assert(test_data['FBAR'].tolist()[:2] == [10., 20.])
+    # Missing dates are NaN
+    assert(np.isnan(test_data.loc[('MODEL_TEST', '20190103_000000'),
+                                  'TOTAL']))
+
+def test_calculate_ci_monte_carlo_chunks(monkeypatch):
+    # Test that the Monte Carlo confidence interval does not
+    # depend on how many resampled sets are built at once
+    np.random.seed(1)
+    total_days = 6
+    expected_stat_file_dates = [
+        (datetime.datetime(2019, 1, 1)
+         + datetime.timedelta(days=i)).strftime('%Y%m%d_%H%M%S')
+        for i in range(total_days)
+    ]
+    columns = [ 'TOTAL', 'FBAR', 'OBAR', 'FOBAR', 'FFBAR', 'OOBAR', 'MAE' ]
+    model_data = {}
+    for model in ['MODEL_TESTA', 'MODEL_TESTB']:
+        fbar = np.random.rand(total_days) + 5.
+        obar = np.random.rand(total_days) + 5.
+        model_data[model] = pd.DataFrame(
+            np.column_stack([np.full(total_days, 100.), fbar, obar,
+                             fbar*obar, fbar*fbar+0.1, obar*obar+0.1,
+                             np.abs(fbar-obar)]),
+            index=pd.MultiIndex.from_product(
+                [[model], expected_stat_file_dates],
+                names=['model_plot_name', 'dates']
+            ),
+            columns=columns
+        )
+    # A missing day is skipped by the average
+    model_data['MODEL_TESTB'].iloc[2,:] = np.nan
+    randx = np.random.rand(10000, total_days)
+    for average_method in ['MEAN', 'MEDIAN', 'AGGREGATION']:
+        expected_intvl = plot_util.calculate_ci(
+            logger, 'EMC_MONTE_CARLO', model_data['MODEL_TESTB'],
+            model_data['MODEL_TESTA'], total_days, 'rmse',
+            average_method, randx
+        )
+        monkeypatch.setattr(plot_util, 'MONTE_CARLO_CHUNK_VALUES', 5000)
+        test_intvl = plot_util.calculate_ci(
+            logger, 'EMC_MONTE_CARLO', model_data['MODEL_TESTB'],
+            model_data['MODEL_TESTA'], total_days, 'rmse',
+            average_method, randx
+        )
+        monkeypatch.undo()
+        assert(np.isfinite(expected_intvl))
+        assert(np.isclose(test_intvl, expected_intvl))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import gzip
+import json
+import datetime
+import pytest
+
+import produtil
+import config_metplus
+import met_util as util
+import time_util
+import preflight
+from grid_stat_wrapper import GridStatWrapper
+
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='Preflight',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='Preflight')
+        produtil.log.postmsg('preflight test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        util.get_logger(config)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'preflight test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+def get_wrapper(tmpdir):
+    config = metplus_config()
+    config.set('config', 'PREFLIGHT_CHECK', True)
+    config.set('config', 'PREFLIGHT_SKIP_MISSING', True)
+    config.set('config', 'PREFLIGHT_CHECK_THREADS', 2)
+    config.set('config', 'LOG_TIMESTAMP', '')
+    config.set('config', 'LEAD_SEQ', '0')
+    config.set('dir', 'LOG_DIR', str(tmpdir))
+    config.set('dir', 'STAGING_DIR', str(tmpdir.join('stage')))
+
+    # values that contain % cannot be set directly, so read them from a file
+    conf_file = str(tmpdir.join('times.conf'))
+    with open(conf_file, 'w') as file_handle:
+        file_handle.write("""[config]
+LOOP_BY = VALID
+VALID_TIME_FMT = %Y%m%d%H
+VALID_BEG = 2019020100
+VALID_END = 2019020112
+VALID_INCREMENT = 6H
+""")
+    config.read(conf_file)
+
+    wrapper = GridStatWrapper(config, config.logger)
+    wrapper.c_dict['FCST_INPUT_DIR'] = str(tmpdir.mkdir('fcst'))
+    wrapper.c_dict['FCST_INPUT_TEMPLATE'] = 'fcst.{valid?fmt=%Y%m%d%H}.nc'
+    wrapper.c_dict['OBS_INPUT_DIR'] = str(tmpdir.mkdir('obs'))
+    wrapper.c_dict['OBS_INPUT_TEMPLATE'] = 'obs.{valid?fmt=%Y%m%d%H}.nc'
+    for key in ['FCST_FILE_WINDOW_BEGIN', 'FCST_FILE_WINDOW_END',
+                'OBS_FILE_WINDOW_BEGIN', 'OBS_FILE_WINDOW_END']:
+        wrapper.c_dict[key] = 0
+
+    return config, wrapper
+
+def test_preflight_check(tmpdir):
+    config, wrapper = get_wrapper(tmpdir)
+    fcst_dir = tmpdir.join('fcst')
+    obs_dir = tmpdir.join('obs')
+
+    # forecast at 06Z is missing and forecast at 12Z is compressed
+    open(str(fcst_dir.join('fcst.2019020100.nc')), 'w').close()
+    with gzip.open(str(fcst_dir.join('fcst.2019020112.nc.gz')), 'wb') as file_handle:
+        file_handle.write(b'data')
+    for hour in ['00', '06', '12']:
+        open(str(obs_dir.join(f'obs.20190201{hour}.nc')), 'w').close()
+
+    preflight.run_preflight_check(config, [wrapper])
+
+    with open(preflight.get_preflight_path(config), 'r') as file_handle:
+        records = [json.loads(line) for line in file_handle]
+    assert [record['valid'] for record in records] == ['20190201000000',
+                                                       '20190201060000',
+                                                       '20190201120000']
+    assert [record['available'] for record in records] == [True, False, True]
+    assert records[1]['missing'] == [str(fcst_dir.join('fcst.2019020106.nc'))]
+
+    # wrapper skips run time that is missing input
+    for hour, expected in [(0, False), (6, True)]:
+        time_info = time_util.ti_calculate({
+            'valid': datetime.datetime(2019, 2, 1, hour),
+            'lead': 0,
+        })
+        time_info['custom'] = ''
+        assert wrapper.should_skip_run_time(time_info) == expected
+
+class FakeUpstreamWrapper:
+    """!Wrapper that writes the files that the next wrapper reads"""
+    def __init__(self, c_dict):
+        self.c_dict = c_dict
+
+def test_preflight_upstream_output(tmpdir):
+    config, wrapper = get_wrapper(tmpdir)
+    for hour in ['00', '06', '12']:
+        open(str(tmpdir.join('fcst', f'fcst.20190201{hour}.nc')), 'w').close()
+
+    # observations are written by an earlier wrapper, i.e. PCPCombine
+    upstream = FakeUpstreamWrapper({'OUTPUT_DIR': str(tmpdir.join('obs'))})
+    preflight.run_preflight_check(config, [upstream, wrapper])
+
+    with open(preflight.get_preflight_path(config), 'r') as file_handle:
+        records = [json.loads(line) for line in file_handle]
+    assert [record['available'] for record in records] == [True, True, True]
+    assert not wrapper.skip_run_times
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import json
+import pytest
+
+import produtil
+import config_metplus
+import met_util as util
+import run_manifest
+from command_builder import CommandBuilder
+
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='RunManifest',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='RunManifest')
+        produtil.log.postmsg('run_manifest test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        util.get_logger(config)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'run_manifest test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+class CopyWrapper(CommandBuilder):
+    """!Wrapper that copies the input file to the output file"""
+    def __init__(self, config, logger):
+        self.app_name = 'copy'
+        super().__init__(config, logger)
+        self.run_count = 0
+
+        # count commands that are actually run
+        run_cmd = self.cmdrunner.run_cmd
+        def counted_run_cmd(*args, **kwargs):
+            self.run_count += 1
+            return run_cmd(*args, **kwargs)
+        self.cmdrunner.run_cmd = counted_run_cmd
+
+    def get_command(self):
+        return f"cp {self.infiles[0]} {self.get_output_path()}"
+
+def write_file(path, text):
+    with open(path, 'w') as file_handle:
+        file_handle.write(text)
+
+def test_skip_unchanged_commands(tmpdir):
+    config = metplus_config()
+    config.set('config', 'SKIP_UNCHANGED_COMMANDS', True)
+    config.set('config', 'DO_NOT_RUN_EXE', False)
+    config.set('dir', 'RUN_MANIFEST_DIR', str(tmpdir.join('manifest')))
+    wrapper = CopyWrapper(config, config.logger)
+
+    input_file = str(tmpdir.join('input.txt'))
+    output_file = str(tmpdir.join('output.txt'))
+    write_file(input_file, 'first')
+
+    def run():
+        wrapper.infiles = [input_file]
+        wrapper.set_output_path(output_file)
+        assert wrapper.build()
+
+    # first run runs the command
+    run()
+    assert wrapper.run_count == 1
+    assert os.path.exists(output_file)
+
+    # command is skipped if nothing changed
+    run()
+    assert wrapper.run_count == 1
+
+    # command runs again if input changes
+    write_file(input_file, 'second')
+    run()
+    assert wrapper.run_count == 2
+
+    # command runs again if output is removed
+    os.remove(output_file)
+    run()
+    assert wrapper.run_count == 3
+
+    # command runs again if environment changes
+    wrapper.add_env_var('TEST_MANIFEST_VAR', 'value')
+    run()
+    assert wrapper.run_count == 4
+    run()
+    assert wrapper.run_count == 4
+
+def test_manifest_entry_output_dir(tmpdir):
+    manifest_dir = str(tmpdir.join('manifest'))
+    out_dir = tmpdir.mkdir('out')
+    input_file = str(tmpdir.join('input.txt'))
+    write_file(input_file, 'input')
+
+    cmd = f"app {input_file} -outdir {out_dir}"
+    entry = run_manifest.ManifestEntry(manifest_dir, 'app', cmd, {},
+                                       str(out_dir))
+    assert list(entry.inputs.keys()) == [input_file]
+
+    # entry is not written if no output was found
+    assert not entry.save()
+    assert not entry.is_current()
+
+    write_file(str(out_dir.join('app_out.stat')), 'output')
+    assert entry.save()
+
+    entry = run_manifest.ManifestEntry(manifest_dir, 'app', cmd, {},
+                                       str(out_dir))
+    assert entry.is_current()
+
+    # different command uses a different entry
+    entry = run_manifest.ManifestEntry(manifest_dir, 'app', cmd + ' -v 3', {},
+                                       str(out_dir))
+    assert not entry.is_current()
+
+    # output that changed is detected
+    write_file(str(out_dir.join('app_out.stat')), 'changed output')
+    entry = run_manifest.ManifestEntry(manifest_dir, 'app', cmd, {},
+                                       str(out_dir))
+    assert not entry.is_current()
+
+def test_manifest_entry_env_inputs(tmpdir):
+    manifest_dir = str(tmpdir.join('manifest'))
+    climo_file = str(tmpdir.join('climo.nc'))
+    mask_file = str(tmpdir.join('mask.poly'))
+    write_file(climo_file, 'climo')
+    write_file(mask_file, 'mask')
+
+    env_vars = {'CLIMO_MEAN_FILE': f'["{climo_file}"]',
+                'VERIF_MASK': f'"{mask_file}", "FULL"',
+                'MET_TMP_DIR': str(tmpdir)}
+    cmd = "app fcst obs config"
+    entry = run_manifest.ManifestEntry(manifest_dir, 'app', cmd, env_vars,
+                                       str(tmpdir.join('out.nc')))
+    assert sorted(entry.inputs.keys()) == sorted([climo_file, mask_file])
+
+    write_file(str(tmpdir.join('out.nc')), 'output')
+    assert entry.save()
+
+    # command runs again if a file in the environment changes
+    write_file(climo_file, 'new climo')
+    entry = run_manifest.ManifestEntry(manifest_dir, 'app', cmd, env_vars,
+                                       str(tmpdir.join('out.nc')))
+    assert not entry.is_current()
+
+def test_manifest_entry_output_file_prefix(tmpdir):
+    manifest_dir = str(tmpdir.join('manifest'))
+    out_dir = tmpdir.mkdir('out')
+
+    cmd = "grid_stat fcst obs config -outdir out"
+    entry = run_manifest.ManifestEntry(manifest_dir, 'grid_stat', cmd, {},
+                                       str(out_dir),
+                                       'grid_stat_120000L_20050807_120000V')
+    out_file = 'grid_stat_120000L_20050807_120000V.stat'
+    write_file(str(out_dir.join(out_file)), 'output')
+    # written by a command for another run time at the same time
+    write_file(str(out_dir.join('grid_stat_060000L_20050807_060000V.stat')),
+               'other output')
+    assert entry.save()
+
+    with open(entry.path, 'r') as file_handle:
+        outputs = json.load(file_handle)['outputs']
+    assert list(outputs.keys()) == [str(out_dir.join(out_file))]
+
+    # changes to output of other commands do not cause a rerun
+    write_file(str(out_dir.join('grid_stat_060000L_20050807_060000V.stat')),
+               'changed other output')
+    entry = run_manifest.ManifestEntry(manifest_dir, 'grid_stat', cmd, {},
+                                       str(out_dir),
+                                       'grid_stat_120000L_20050807_120000V')
+    assert entry.is_current()
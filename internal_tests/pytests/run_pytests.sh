@@ -85,6 +85,15 @@ run_pytest_and_check check_metplus_python_version
 run_pytest_and_check grid_stat
 run_pytest_and_check logging
 run_pytest_and_check met_util
+run_pytest_and_check task_scheduler
+run_pytest_and_check file_catalog
+run_pytest_and_check netcdf_util
+run_pytest_and_check command_runner
+run_pytest_and_check run_manifest
+run_pytest_and_check preflight
+run_pytest_and_check stream_runner
+run_pytest_and_check plot_service
+run_pytest_and_check feature_util
 run_pytest_and_check mtd
 run_pytest_and_check pcp_combine -c ./test1.conf
 run_pytest_and_check stat_analysis -c ./test_stat_analysis.conf
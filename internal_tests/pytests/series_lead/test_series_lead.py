@@ -70,3 +70,86 @@ def test_retrieve_var_name_levels():
     print(f"ACTUAL: {actual_vars}")
     print(f"EXPECTED: {expected_vars}")
     assert(actual_vars == expected_vars)
+
+@pytest.mark.parametrize(
+    'num_procs', [
+        (1),
+        (4),
+    ]
+)
+def test_run_plot_jobs_gif_after_plots(num_procs, monkeypatch, tmpdir):
+    from series_by_lead_wrapper import SeriesByLeadWrapper
+    from command_runner import CommandRunner
+    config = metplus_config()
+    config.set('config', 'SERIES_ANALYSIS_PLOT_PROCESSES', num_procs)
+    # TMP_DIR does not exist yet and is created for the job logs
+    config.set('dir', 'TMP_DIR', str(tmpdir.join('tmp')))
+    # skip __init__ because it requires many settings that are not needed
+    wrapper = SeriesByLeadWrapper.__new__(SeriesByLeadWrapper)
+    wrapper.config = config
+    wrapper.logger = config.logger
+    wrapper.errors = 0
+    wrapper.cmdrunner = CommandRunner(config, logger=config.logger)
+
+    commands = []
+    def run_cmd(self, cmd, env=None, **kwargs):
+        # remove verbosity flag added to MET commands
+        commands.append((re.sub(r' -v \d+', '', cmd), env['CUR_STAT']))
+        return 0, cmd
+
+    monkeypatch.setattr(CommandRunner, 'run_cmd', run_cmd)
+
+    plot_jobs = {}
+    gif_jobs = {}
+    for stat in ['RMSE', 'FBAR']:
+        key = ('TMP', 'Z2', stat)
+        env = {'CUR_STAT': stat}
+        plot_jobs[key] = [(f'plot {stat} {fhr}', f'convert {stat} {fhr}', env)
+                          for fhr in ['000', '006', '012']]
+        gif_jobs[key] = (f'gif {stat}', env)
+
+    # GIF with no plots should still be created
+    gif_jobs[('TMP', 'Z2', 'OBAR')] = ('gif OBAR', {'CUR_STAT': 'OBAR'})
+
+    wrapper.run_plot_jobs(plot_jobs, gif_jobs)
+
+    assert len(commands) == 15
+    assert wrapper.errors == 0
+    for stat in ['RMSE', 'FBAR']:
+        gif_index = commands.index((f'gif {stat}', stat))
+        for fhr in ['000', '006', '012']:
+            assert commands.index((f'convert {stat} {fhr}', stat)) < gif_index
+            assert (commands.index((f'plot {stat} {fhr}', stat)) <
+                    commands.index((f'convert {stat} {fhr}', stat)))
+
+def test_run_plot_jobs_log_order(tmpdir):
+    from series_by_lead_wrapper import SeriesByLeadWrapper
+    from command_runner import CommandRunner
+    config = metplus_config()
+    config.set('config', 'SERIES_ANALYSIS_PLOT_PROCESSES', 4)
+    config.set('config', 'LOG_MET_OUTPUT_TO_METPLUS', True)
+    log_file = str(tmpdir.join('metplus.log'))
+    config.set('config', 'LOG_METPLUS', log_file)
+    config.set('dir', 'TMP_DIR', str(tmpdir.mkdir('tmp')))
+    # skip __init__ because it requires many settings that are not needed
+    wrapper = SeriesByLeadWrapper.__new__(SeriesByLeadWrapper)
+    wrapper.config = config
+    wrapper.logger = config.logger
+    wrapper.errors = 0
+    wrapper.cmdrunner = CommandRunner(config, logger=config.logger)
+
+    env = dict(os.environ)
+    plot_jobs = {('TMP', 'Z2', 'RMSE'): [('/bin/echo plot',
+                                          '/bin/sh -c "exit 3"', env)]}
+    # first GIF finishes last but its output is logged first
+    gif_jobs = {('TMP', 'Z2', 'FBAR'): ('sleep 0.5; echo first_gif', env),
+                ('TMP', 'Z2', 'OBAR'): ('echo second_gif', env)}
+
+    wrapper.run_plot_jobs(plot_jobs, gif_jobs)
+
+    # failed convert command is reported once
+    assert wrapper.errors == 1
+    with open(log_file, 'r') as file_handle:
+        log_text = file_handle.read()
+    assert log_text.index('first_gif') < log_text.index('second_gif')
+    assert os.listdir(str(tmpdir.join('tmp'))) == []
@@ -812,6 +812,32 @@ def test_run_stat_analysis_job():
            == os.path.getsize(comparison_filename))
 
 
+def test_run_jobs(tmpdir):
+    # Test that each job is run with its own settings when more than
+    # one job runs at once
+    st = stat_analysis_wrapper()
+    st.c_dict['MAX_CONCURRENT_PROCS'] = 2
+    # script that writes the model name to the file set in the job
+    st.app_path = str(tmpdir.join('stat_analysis'))
+    with open(st.app_path, 'w') as file_handle:
+        file_handle.write('#!/bin/sh\nsleep 0.2\necho $MODEL > $JOB\n')
+    os.chmod(st.app_path, 0o755)
+    job_list = []
+    for model, filename in [('MODEL_A', 'a.txt'), ('MODEL_B', 'b.txt'),
+                            ('MODEL_C', 'a.txt')]:
+        output_file = str(tmpdir.join(filename))
+        job_list.append(st.get_job({'MODEL': model, 'JOB': output_file,
+                                    '-lookin': str(tmpdir)},
+                                   [output_file]))
+    st.run_jobs(job_list)
+    assert st.wait_for_commands()
+    # third job waited for the first job because they write the same file
+    with open(str(tmpdir.join('a.txt')), 'r') as file_handle:
+        assert file_handle.read().strip() == 'MODEL_C'
+    with open(str(tmpdir.join('b.txt')), 'r') as file_handle:
+        assert file_handle.read().strip() == 'MODEL_B'
+
+
 @pytest.mark.parametrize(
     'data_type, config_list, expected_list', [
         ('FCST', '\"0,*,*\"', ["0,*,*"]),
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import time
+import json
+import pytest
+
+import produtil
+import config_metplus
+import met_util as util
+import stream_runner
+from grid_stat_wrapper import GridStatWrapper
+from pcp_combine_wrapper import PCPCombineWrapper
+
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='StreamRunner',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='StreamRunner')
+        produtil.log.postmsg('stream_runner test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        util.get_logger(config)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'stream_runner test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+def get_wrapper(config, tmpdir, run_list):
+    wrapper = GridStatWrapper(config, config.logger)
+    wrapper.c_dict['FCST_INPUT_DIR'] = str(tmpdir.join('fcst'))
+    wrapper.c_dict['FCST_INPUT_TEMPLATE'] = 'fcst.{valid?fmt=%Y%m%d%H}.nc'
+    wrapper.c_dict['OBS_INPUT_DIR'] = str(tmpdir.join('obs'))
+    wrapper.c_dict['OBS_INPUT_TEMPLATE'] = 'obs.{valid?fmt=%Y%m%d%H}.nc'
+    for key in ['FCST_FILE_WINDOW_BEGIN', 'FCST_FILE_WINDOW_END',
+                'OBS_FILE_WINDOW_BEGIN', 'OBS_FILE_WINDOW_END']:
+        wrapper.c_dict[key] = 0
+
+    # record the run times that are processed instead of building commands
+    wrapper.run_at_time_once = \
+        lambda time_info: run_list.append(time_info['valid'].strftime('%H'))
+    return wrapper
+
+def write_inputs(tmpdir, hour, mtime=None):
+    for data_type in ['fcst', 'obs']:
+        path = str(tmpdir.join(data_type, f'{data_type}.20190201{hour}.nc'))
+        open(path, 'w').close()
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+def test_stream_resume(tmpdir):
+    config = metplus_config()
+    config.set('config', 'STREAM_MODE', True)
+    config.set('config', 'STREAM_POLL_INTERVAL', 0)
+    config.set('config', 'STREAM_IDLE_TIMEOUT', 1)
+    config.set('config', 'STREAM_MIN_FILE_AGE', 60)
+    config.set('config', 'STREAM_STATE_FILE', str(tmpdir.join('state.json')))
+    config.set('config', 'LEAD_SEQ', '0')
+
+    # values that contain % cannot be set directly, so read them from a file
+    conf_file = str(tmpdir.join('times.conf'))
+    with open(conf_file, 'w') as file_handle:
+        file_handle.write("""[config]
+LOOP_BY = VALID
+VALID_TIME_FMT = %Y%m%d%H
+VALID_BEG = 2019020100
+VALID_END = 2019020106
+VALID_INCREMENT = 6H
+""")
+    config.read(conf_file)
+
+    tmpdir.mkdir('fcst')
+    tmpdir.mkdir('obs')
+
+    # 00Z has arrived, 06Z is still being written
+    old_time = time.time() - 120
+    write_inputs(tmpdir, '00', mtime=old_time)
+    write_inputs(tmpdir, '06')
+
+    run_list = []
+    wrapper = get_wrapper(config, tmpdir, run_list)
+    assert not stream_runner.run_stream(config, [wrapper])
+    assert run_list == ['00']
+
+    with open(str(tmpdir.join('state.json')), 'r') as file_handle:
+        state = json.load(file_handle)
+    assert state['done'] == {'GridStat': ['20190201000000']}
+
+    # start again after 06Z has finished writing, 00Z is not run again
+    write_inputs(tmpdir, '06', mtime=old_time)
+    run_list = []
+    wrapper = get_wrapper(config, tmpdir, run_list)
+    assert stream_runner.run_stream(config, [wrapper])
+    assert run_list == ['06']
+
+def test_stream_pcp_combine(tmpdir, monkeypatch):
+    config = metplus_config()
+    config.set('config', 'STREAM_MODE', True)
+    config.set('config', 'STREAM_POLL_INTERVAL', 0)
+    config.set('config', 'STREAM_IDLE_TIMEOUT', 1)
+    config.set('config', 'STREAM_STATE_FILE', str(tmpdir.join('state.json')))
+    config.set('config', 'LEAD_SEQ', '0')
+    config.set('config', 'OBS_PCP_COMBINE_RUN', True)
+    config.set('config', 'OBS_PCP_COMBINE_METHOD', 'ADD')
+    config.set('config', 'OBS_PCP_COMBINE_INPUT_ACCUMS', '1')
+    config.set('config', 'OBS_PCP_COMBINE_OUTPUT_ACCUM', '3')
+    config.set('config', 'OBS_PCP_COMBINE_OUTPUT_NAME', 'APCP')
+    config.set('dir', 'OBS_PCP_COMBINE_INPUT_DIR', str(tmpdir.mkdir('hourly')))
+    config.set('dir', 'OBS_PCP_COMBINE_OUTPUT_DIR', str(tmpdir.mkdir('obs')))
+
+    conf_file = str(tmpdir.join('times.conf'))
+    with open(conf_file, 'w') as file_handle:
+        file_handle.write("""[config]
+LOOP_BY = VALID
+VALID_TIME_FMT = %Y%m%d%H
+VALID_BEG = 2019020103
+VALID_END = 2019020104
+VALID_INCREMENT = 1H
+[filename_templates]
+OBS_PCP_COMBINE_INPUT_TEMPLATE = hourly.{valid?fmt=%Y%m%d%H}.nc
+OBS_PCP_COMBINE_OUTPUT_TEMPLATE = obs.{valid?fmt=%Y%m%d%H}.nc
+""")
+    config.read(conf_file)
+
+    tmpdir.mkdir('fcst')
+    for hour in ['03', '04']:
+        open(str(tmpdir.join('fcst', f'fcst.20190201{hour}.nc')), 'w').close()
+
+    # hourly files for the 03Z accumulation have arrived, 04Z has not
+    for hour in ['01', '02', '03']:
+        open(str(tmpdir.join('hourly', f'hourly.20190201{hour}.nc')), 'w').close()
+
+    def get_processes(pcp_list, run_list):
+        pcp_combine = PCPCombineWrapper(config, config.logger)
+        # write the output file instead of running pcp_combine
+        def build():
+            pcp_list.append(os.path.basename(pcp_combine.get_output_path()))
+            open(pcp_combine.get_output_path(), 'w').close()
+            return True
+        monkeypatch.setattr(pcp_combine, 'build', build)
+        return [pcp_combine, get_wrapper(config, tmpdir, run_list)]
+
+    pcp_list = []
+    run_list = []
+    assert not stream_runner.run_stream(config,
+                                        get_processes(pcp_list, run_list))
+    # 04Z accumulation is not built until its hourly files arrive
+    assert pcp_list == ['obs.2019020103.nc']
+    assert run_list == ['03']
+
+    open(str(tmpdir.join('hourly', 'hourly.2019020104.nc')), 'w').close()
+    pcp_list = []
+    run_list = []
+    assert stream_runner.run_stream(config, get_processes(pcp_list, run_list))
+    assert pcp_list == ['obs.2019020104.nc']
+    assert run_list == ['04']
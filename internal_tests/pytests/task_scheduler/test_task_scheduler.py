@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import datetime
+import pytest
+
+import produtil
+import config_metplus
+import met_util as util
+import task_scheduler
+from command_builder import CommandBuilder
+
+#@pytest.fixture
+def metplus_config():
+    """! Create a METplus configuration object that can be
+    manipulated/modified to
+         reflect different paths, directories, values, etc. for individual
+         tests.
+    """
+    try:
+        if 'JLOGFILE' in os.environ:
+            produtil.setup.setup(send_dbn=False, jobname='TaskScheduler ',
+                                 jlogfile=os.environ['JLOGFILE'])
+        else:
+            produtil.setup.setup(send_dbn=False, jobname='TaskScheduler ')
+        produtil.log.postmsg('task_scheduler test is starting')
+
+        # Read in the configuration object CONFIG
+        config = config_metplus.setup(util.baseinputconfs)
+        logger = util.get_logger(config)
+        return config
+
+    except Exception as e:
+        produtil.log.jlogger.critical(
+            'task_scheduler test failed: %s' % (str(e),), exc_info=True)
+        sys.exit(2)
+
+RUN_TIMES = [datetime.datetime(2019, 2, 1, hour) for hour in [0, 6, 12]]
+
+class FakeTimeWrapper:
+    """!Minimal wrapper that runs once for each run time"""
+    run_all_times = CommandBuilder.run_all_times
+    reads_other_run_times = CommandBuilder.reads_other_run_times
+
+    def __init__(self, c_dict, error_hours=None, calls=None):
+        self.c_dict = c_dict
+        self.errors = 0
+        self.error_hours = error_hours if error_hours else []
+        self.calls = calls
+
+    def clear(self):
+        pass
+
+    def wait_for_commands(self):
+        return True
+
+    def run_at_time(self, input_dict):
+        if self.calls is not None:
+            self.calls.append((self, input_dict['init'].hour))
+        if input_dict['init'].hour in self.error_hours:
+            self.errors += 1
+
+class FakeAllTimesWrapper(FakeTimeWrapper):
+    """!Minimal wrapper that runs once for all run times"""
+    def run_all_times(self):
+        if self.calls is not None:
+            self.calls.append((self, None))
+
+@pytest.mark.parametrize(
+    'out_dict, in_dict, expected', [
+        # same template
+        ({'OUTPUT_DIR': '/out', 'OUTPUT_TEMPLATE': '{init?fmt=%Y%m%d}/a.nc'},
+         {'FCST_INPUT_DIR': '/out', 'FCST_INPUT_TEMPLATE': '{init?fmt=%Y%m%d}/a.nc'},
+         True),
+        # input directory is under output directory
+        ({'OUTPUT_DIR': '/out'},
+         {'OBS_INPUT_DIR': '/out/sub', 'OBS_INPUT_TEMPLATE': 'b.nc'},
+         True),
+        # unrelated directories
+        ({'OUTPUT_DIR': '/out'},
+         {'FCST_INPUT_DIR': '/in', 'FCST_INPUT_TEMPLATE': 'a.nc'},
+         False),
+        # similar directory names are not related
+        ({'OUTPUT_DIR': '/out'},
+         {'FCST_INPUT_DIR': '/output'},
+         False),
+    ]
+)
+def test_process_feeds(out_dict, in_dict, expected):
+    upstream = FakeTimeWrapper(out_dict)
+    downstream = FakeTimeWrapper(in_dict)
+    assert(task_scheduler.process_feeds(upstream, downstream) == expected)
+
+def test_build_task_graph():
+    pcp = FakeTimeWrapper({'OUTPUT_DIR': '/pcp'})
+    other = FakeTimeWrapper({'OUTPUT_DIR': '/other',
+                             'CUSTOM_LOOP_LIST': ['a', 'b']})
+    grid_stat = FakeTimeWrapper({'FCST_INPUT_DIR': '/pcp',
+                                 'OUTPUT_DIR': '/grid_stat'})
+    series = FakeAllTimesWrapper({'INPUT_DIR': '/grid_stat'})
+    processes = [pcp, other, grid_stat, series]
+
+    tasks = task_scheduler.build_task_graph(processes, RUN_TIMES)
+    assert(len(tasks) == 3 + 6 + 3 + 1)
+
+    by_process = {}
+    for task in tasks:
+        by_process.setdefault(task.process_index, []).append(task)
+
+    # first process and unrelated process have no dependencies
+    for task in by_process[0] + by_process[1]:
+        assert(not task.depends_on)
+
+    # grid_stat depends only on pcp task at the same time
+    for pcp_task, gs_task in zip(by_process[0], by_process[2]):
+        assert(gs_task.depends_on == {pcp_task.task_id})
+
+    # wrapper that runs over all times waits for all earlier tasks
+    series_task = by_process[3][0]
+    assert(series_task.run_time is None)
+    assert(series_task.depends_on == {task.task_id for task in tasks[:-1]})
+
+@pytest.mark.parametrize(
+    'in_dict', [
+        {'OBS_FILE_WINDOW_BEGIN': -3600, 'OBS_FILE_WINDOW_END': 0},
+        {'OBS_FILE_WINDOW_BEGIN': 0, 'OBS_FILE_WINDOW_END': 3600},
+        {'OFFSETS': [0, 12]},
+    ]
+)
+def test_build_task_graph_other_times(in_dict):
+    pcp = FakeTimeWrapper({'OUTPUT_DIR': '/pcp'})
+    in_dict = dict(in_dict, OBS_INPUT_DIR='/pcp')
+    point_stat = FakeTimeWrapper(in_dict)
+    tasks = task_scheduler.build_task_graph([pcp, point_stat], RUN_TIMES)
+
+    # each run time waits for the upstream process at every run time
+    pcp_ids = {task.task_id for task in tasks if task.process_index == 0}
+    for task in tasks:
+        if task.process_index == 1:
+            assert(task.depends_on == pcp_ids)
+
+    # no window or offsets only waits for the same run time
+    in_dict = {'OBS_INPUT_DIR': '/pcp', 'OBS_FILE_WINDOW_BEGIN': 0,
+               'OBS_FILE_WINDOW_END': 0, 'OFFSETS': [0]}
+    tasks = task_scheduler.build_task_graph([pcp, FakeTimeWrapper(in_dict)],
+                                            RUN_TIMES)
+    for task in tasks:
+        if task.process_index == 1:
+            assert(len(task.depends_on) == 1)
+
+@pytest.mark.parametrize(
+    'num_parallel', [
+        1, 4,
+    ]
+)
+def test_run_tasks(monkeypatch, num_parallel):
+    conf = metplus_config()
+    conf.set('config', 'LOOP_BY', 'INIT')
+    conf.set('config', 'RUN_PARALLEL_TASKS', num_parallel)
+    monkeypatch.setattr(util, 'get_run_times', lambda config: RUN_TIMES)
+
+    calls = []
+    upstream = FakeTimeWrapper({'OUTPUT_DIR': '/up'}, [6], calls)
+    downstream = FakeTimeWrapper({'INPUT_DIR': '/up'}, [0, 12], calls)
+    series = FakeAllTimesWrapper({}, calls=calls)
+    processes = [upstream, downstream, series]
+
+    assert(task_scheduler.run_tasks(conf, processes))
+    assert([process.errors for process in processes] == [1, 2, 0])
+
+    # calls are only recorded when running in the same process
+    if num_parallel == 1:
+        for hour in [0, 6, 12]:
+            assert(calls.index((upstream, hour)) <
+                   calls.index((downstream, hour)))
+        assert(calls[-1] == (series, None))
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+
+"""
+Program Name: accumulation_engine.py
+Contact(s): George McCabe
+Abstract: Add precipitation accumulations from NetCDF files without
+ running pcp_combine
+History Log:  Initial version
+Usage: Called by PCPCombineWrapper if PCP_COMBINE_IN_PROCESS is True
+Parameters: None
+Input Files: NetCDF files
+Output Files: NetCDF files
+"""
+
+import os
+import re
+import datetime
+
+import numpy as np
+import netCDF4
+
+'''!@namespace accumulation_engine
+@brief Builds accumulations by adding fields read from NetCDF files. The sum
+for the previous output is kept, so when consecutive valid times share most
+of their input files (i.e. a 24 hour accumulation built from hourly files
+every hour) only the fields that entered or left the window are read and
+added or subtracted. Each input field is read once instead of once for
+every output that uses it. The sum is computed from scratch again after
+the window has moved as many times as it has fields so rounding error does
+not build up.
+@code{.sh}
+Cannot be called directly. These are helper functions
+to be used in other METplus wrappers
+@endcode
+'''
+
+# value written for grid points that are missing in any input field
+FILL_VALUE = -9999.
+
+# variable names that are copied from the first input file to the output
+COORDINATE_NAMES = ['lat', 'lon', 'latitude', 'longitude']
+
+def get_field_from_addon(addon):
+    """!Get field name and level from a pcp_combine input field string, i.e.
+        'name="P01M_NONE"; level="(0,*,*)";'
+        Args:
+            @param addon field information passed to pcp_combine after the
+             input file
+            @returns tuple of name and level (None if not set) or None if
+             name is not set or other options are included
+    """
+    match = re.match(r'^\'name="([^"]+)";(?:\s*level="([^"]*)";)?\'$',
+                     addon.strip())
+    if not match:
+        return None
+
+    return match.group(1), match.group(2)
+
+def get_level_index(level):
+    """!Get index to read a field from a NetCDF variable from a MET level
+        string, i.e. (0,*,*) or (*,*)
+        Args:
+            @param level level string or None to read all values
+            @returns tuple to index variable or None if level is invalid
+    """
+    if not level:
+        return Ellipsis
+
+    if not level.startswith('(') or not level.endswith(')'):
+        return None
+
+    index = []
+    for item in level[1:-1].split(','):
+        item = item.strip()
+        if item == '*':
+            index.append(slice(None))
+        elif item.isdigit():
+            index.append(int(item))
+        else:
+            return None
+
+    return tuple(index)
+
+def get_met_time_strings(time_value):
+    """!Get time string and unix time string written by MET for a time"""
+    unix_time = int((time_value - datetime.datetime(1970, 1, 1)).total_seconds())
+    return time_value.strftime('%Y%m%d_%H%M%S'), str(unix_time)
+
+class AccumulationEngine(object):
+    """!Adds fields read from NetCDF files, reusing the sum of the previous
+        set of fields when the next set overlaps it"""
+    def __init__(self):
+        # values and mask of each field in the current window,
+        # keyed by (path, name, level)
+        self.fields = {}
+        self.window = set()
+        self.total = None
+        self.missing = None
+        self.slides = 0
+        self.reads = 0
+
+    def read_field(self, key):
+        """!Read a field from a NetCDF file unless it was already read
+            Args:
+                @param key tuple of path, variable name, and level
+                @returns tuple of values (float64 with missing set to 0) and
+                 mask of missing values
+        """
+        if key in self.fields:
+            return self.fields[key]
+
+        path, name, level = key
+        index = get_level_index(level)
+        if index is None:
+            raise ValueError(f"Invalid level for {name} in {path}: {level}")
+
+        with netCDF4.Dataset(path, 'r') as dataset:
+            if name not in dataset.variables:
+                raise ValueError(f"Variable {name} not found in {path}")
+            data = np.ma.masked_invalid(dataset.variables[name][index])
+
+        self.reads += 1
+        field = (np.ma.filled(data.astype(np.float64), 0.),
+                 np.ma.getmaskarray(data))
+        self.fields[key] = field
+        return field
+
+    def add(self, keys):
+        """!Add fields together. If the fields overlap the fields from the
+            previous call, the previous sum is updated instead
+            Args:
+                @param keys list of (path, variable name, level) of each
+                 field to add
+                @returns masked array of the sum, masked where any field is
+                 missing
+        """
+        key_set = set(keys)
+        to_remove = self.window - key_set
+        to_add = key_set - self.window
+
+        if self.total is None or len(key_set) != len(keys) or \
+                len(to_remove) + len(to_add) >= len(keys) or \
+                self.slides >= len(keys):
+            self.total = None
+            self.missing = None
+            self.slides = 0
+            to_remove = set()
+            to_add = keys
+        else:
+            self.slides += 1
+
+        for key in to_remove:
+            values, mask = self.fields[key]
+            self.total -= values
+            self.missing -= mask
+
+        for key in to_add:
+            values, mask = self.read_field(key)
+            if self.total is None:
+                self.total = values.copy()
+                self.missing = mask.astype(np.int32)
+                continue
+
+            if values.shape != self.total.shape:
+                raise ValueError(f"Field {key[1]} in {key[0]} has shape "
+                                 f"{values.shape} but expected "
+                                 f"{self.total.shape}")
+
+            self.total += values
+            self.missing += mask
+
+        # keep only the fields that may be subtracted from the next sum
+        for key in list(self.fields):
+            if key not in key_set:
+                del self.fields[key]
+
+        self.window = key_set
+        return np.ma.masked_array(self.total.copy(), mask=self.missing > 0)
+
+    @staticmethod
+    def write_output(out_path, data, template_key, output_name, time_info,
+                     accum_seconds):
+        """!Write accumulation to a NetCDF file with the same grid information
+            as the input
+            Args:
+                @param out_path path to write
+                @param data masked array to write
+                @param template_key (path, variable name, level) of an input
+                 field to copy grid information and attributes from
+                @param output_name name of variable to write
+                @param time_info time dictionary of output
+                @param accum_seconds accumulation interval in seconds
+        """
+        template_path, template_name, _ = template_key
+        init_time = time_info.get('init', time_info['valid'])
+        accum_hours, accum_remainder = divmod(int(accum_seconds), 3600)
+        accum_time = '{:02d}{:02d}{:02d}'.format(accum_hours,
+                                                 *divmod(accum_remainder, 60))
+
+        tmp_path = f'{out_path}.tmp{os.getpid()}'
+        try:
+            with netCDF4.Dataset(template_path, 'r') as src, \
+                    netCDF4.Dataset(tmp_path, 'w') as dst:
+                dst.setncatts({attr: src.getncattr(attr)
+                               for attr in src.ncattrs()})
+
+                src_var = src.variables[template_name]
+                dims = src_var.dimensions[len(src_var.dimensions) - data.ndim:]
+                for dim in dims:
+                    dst.createDimension(dim, len(src.dimensions[dim]))
+
+                for name, variable in src.variables.items():
+                    if name == template_name or \
+                            not set(variable.dimensions) <= set(dims) or \
+                            (name not in COORDINATE_NAMES and name not in dims):
+                        continue
+                    coord = dst.createVariable(name, variable.datatype,
+                                               variable.dimensions)
+                    coord.setncatts({attr: variable.getncattr(attr)
+                                     for attr in variable.ncattrs()
+                                     if attr != '_FillValue'})
+                    coord[:] = variable[:]
+
+                out_var = dst.createVariable(output_name, 'f4', dims,
+                                             fill_value=FILL_VALUE)
+                init_string, init_unix = get_met_time_strings(init_time)
+                valid_string, valid_unix = get_met_time_strings(time_info['valid'])
+                attrs = {'name': output_name,
+                         'long_name': getattr(src_var, 'long_name', output_name),
+                         'level': f'A{accum_hours:02d}',
+                         'units': getattr(src_var, 'units', 'kg/m^2'),
+                         'init_time': init_string,
+                         'init_time_ut': init_unix,
+                         'valid_time': valid_string,
+                         'valid_time_ut': valid_unix,
+                         'accum_time': accum_time,
+                         'accum_time_sec': int(accum_seconds),
+                         }
+                out_var.setncatts(attrs)
+                out_var[:] = data.astype(np.float32)
+
+            os.replace(tmp_path, out_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -19,6 +19,9 @@ from inspect import getframeinfo, stack
 
 from command_runner import CommandRunner
 import met_util as util
+import file_catalog
+import resource_usage
+import run_manifest
 import string_template_substitution as sts
 
 # pylint:disable=pointless-string-statement
@@ -55,6 +58,14 @@ class CommandBuilder:
         self.c_dict = self.create_c_dict()
         self.check_for_externals()
 
+        # run times to skip with the reason to log, set by the pre-flight
+        # check if PREFLIGHT_SKIP_MISSING is True and by stream mode
+        self.skip_run_times = {}
+
+        # manifest entries of commands that were started by build but have
+        # not finished yet, keyed by command
+        self.pending_manifest_entries = {}
+
         self.cmdrunner = CommandRunner(self.config, logger=self.logger,
                                        verbose=self.c_dict['VERBOSITY'])
 
@@ -75,6 +86,25 @@ class CommandBuilder:
         c_dict['ALLOW_MULTIPLE_FILES'] = False
         c_dict['CURRENT_VAR_INFO'] = None
 
+        # time information for the command that is being built, used to
+        # identify the command in the resource usage file
+        c_dict['CURRENT_TIME_INFO'] = None
+
+        # number of MET commands to run at the same time. Wrappers that run
+        # independent commands can override this value
+        c_dict['MAX_CONCURRENT_PROCS'] = 1
+
+        # skip commands that already ran with the same inputs if their
+        # outputs have not changed since
+        c_dict['SKIP_UNCHANGED_COMMANDS'] = (
+            self.config.getbool('config', 'SKIP_UNCHANGED_COMMANDS', False)
+        )
+        c_dict['RUN_MANIFEST_DIR'] = (
+            self.config.getdir('RUN_MANIFEST_DIR',
+                               os.path.join(self.config.getdir('OUTPUT_BASE'),
+                                            'run_manifest'))
+        )
+
         c_dict['CUSTOM_LOOP_LIST'] = util.get_custom_string_list(self.config,
                                                                  self.app_name)
 
@@ -304,6 +334,26 @@ class CommandBuilder:
         self.logger.warning('Using default values for {}'.format(gen_name))
         return default, default
 
+    def should_skip_run_time(self, time_info):
+        """!Check if a run time was marked to be skipped, i.e. because the
+            pre-flight check found that input files are missing
+              Args:
+                @param time_info dictionary containing timing information
+                @rtype bool
+                @return True if run time should be skipped
+        """
+        if not self.skip_run_times:
+            return False
+
+        key = (time_info.get('init'), time_info.get('valid'),
+               time_info.get('custom', ''))
+        reason = self.skip_run_times.get(key)
+        if reason is None:
+            return False
+
+        self.logger.info(f"Skipping run time because {reason}")
+        return True
+
     def find_model(self, time_info, var_info, mandatory=True, return_list=False):
         """! Finds the model file to compare
               Args:
@@ -343,21 +393,7 @@ class CommandBuilder:
                 @rtype string
                 @return Returns the path to an observation file
         """
-        if var_info is not None:
-            # set level based on input data type
-            if data_type.startswith("OBS"):
-                v_level = var_info['obs_level']
-            else:
-                v_level = var_info['fcst_level']
-
-            # separate character from beginning of numeric level value if applicable
-            level = util.split_level(v_level)[1]
-
-            # set level to 0 character if it is not a number
-            if not level.isdigit():
-                level = '0'
-        else:
-            level = '0'
+        level = self.get_search_level(var_info, data_type)
 
         # arguments for find helper functions
         arg_dict = {'level': level,
@@ -375,6 +411,33 @@ class CommandBuilder:
         # if looking for a file within a time window:
         return self.find_file_in_window(**arg_dict)
 
+    @staticmethod
+    def get_search_level(var_info, data_type):
+        """!Get level to substitute into input templates when finding data
+              Args:
+                @param var_info object containing variable information or None
+                @param data_type type of data to find (FCST or OBS)
+                @rtype string
+                @return numeric level value or '0' if not a number
+        """
+        if var_info is None:
+            return '0'
+
+        # set level based on input data type
+        if data_type.startswith("OBS"):
+            v_level = var_info['obs_level']
+        else:
+            v_level = var_info['fcst_level']
+
+        # separate character from beginning of numeric level value if applicable
+        level = util.split_level(v_level)[1]
+
+        # set level to 0 character if it is not a number
+        if not level.isdigit():
+            level = '0'
+
+        return level
+
     def find_exact_file(self, level, data_type, time_info, mandatory=True, return_list=False):
         input_template = self.c_dict[f'{data_type}_INPUT_TEMPLATE']
         data_dir = self.c_dict[f'{data_type}_INPUT_DIR']
@@ -424,12 +487,11 @@ class CommandBuilder:
                 # add single file to list
                 check_file_list.append(full_path)
 
-        for file_path in check_file_list:
-            # check if file exists
-            processed_path = util.preprocess_file(file_path,
-                                                  self.c_dict[data_type + '_INPUT_DATATYPE'],
-                                                  self.config)
-
+        # check if files exist, uncompressing them in parallel if requested
+        processed_paths = util.preprocess_files(check_file_list,
+                                                self.c_dict[data_type + '_INPUT_DATATYPE'],
+                                                self.config)
+        for file_path, processed_path in zip(check_file_list, processed_paths):
             # report error if file path could not be found
             if not processed_path:
                 msg = f"Could not find {data_type} file {file_path} using template {template}"
@@ -452,20 +514,15 @@ class CommandBuilder:
         template = self.c_dict[f'{data_type}_INPUT_TEMPLATE']
         data_dir = self.c_dict[f'{data_type}_INPUT_DIR']
 
-        # convert valid_time to unix time
-        valid_time = time_info['valid_fmt']
-        valid_seconds = int(datetime.strptime(valid_time, "%Y%m%d%H%M%S").strftime("%s"))
-        # get time of each file, compare to valid time, save best within range
-        closest_files = []
-        closest_time = 9999999
-
         # get range of times that will be considered
+        valid_time = time_info['valid_fmt']
+        valid_dt = datetime.strptime(valid_time, "%Y%m%d%H%M%S")
         valid_range_lower = self.c_dict[data_type + '_FILE_WINDOW_BEGIN']
         valid_range_upper = self.c_dict[data_type + '_FILE_WINDOW_END']
-        lower_limit = int(datetime.strptime(util.shift_time_seconds(valid_time, valid_range_lower),
-                                            "%Y%m%d%H%M%S").strftime("%s"))
-        upper_limit = int(datetime.strptime(util.shift_time_seconds(valid_time, valid_range_upper),
-                                            "%Y%m%d%H%M%S").strftime("%s"))
+        lower_limit = datetime.strptime(util.shift_time_seconds(valid_time, valid_range_lower),
+                                        "%Y%m%d%H%M%S")
+        upper_limit = datetime.strptime(util.shift_time_seconds(valid_time, valid_range_upper),
+                                        "%Y%m%d%H%M%S")
 
         msg = f"Looking for {data_type} files under {data_dir} within range " +\
               f"[{valid_range_lower},{valid_range_upper}] using template {template}"
@@ -475,38 +532,18 @@ class CommandBuilder:
             self.log_error('Must set INPUT_DIR if looking for files within a time window')
             return None
 
-        # step through all files under input directory in sorted order
-        for dirpath, _, all_files in os.walk(data_dir):
-            for filename in sorted(all_files):
-                fullpath = os.path.join(dirpath, filename)
-
-                # remove input data directory to get relative path
-                rel_path = fullpath.replace(f'{data_dir}/', "")
-                # extract time information from relative path using template
-                file_time_info = util.get_time_from_file(self.logger, rel_path, template)
-                if file_time_info is not None:
-                    # get valid time and check if it is within the time range
-                    file_valid_time = file_time_info['valid'].strftime("%Y%m%d%H%M%S")
-                    # skip if could not extract valid time
-                    if file_valid_time == '':
-                        continue
-                    file_valid_dt = datetime.strptime(file_valid_time, "%Y%m%d%H%M%S")
-                    file_valid_seconds = int(file_valid_dt.strftime("%s"))
-                    # skip if outside time range
-                    if file_valid_seconds < lower_limit or file_valid_seconds > upper_limit:
-                        continue
-
-                    # if only 1 file is allowed, check if file is
-                    # closer to desired valid time than previous match
-                    if not self.c_dict['ALLOW_MULTIPLE_FILES']:
-                        diff = abs(valid_seconds - file_valid_seconds)
-                        if diff < closest_time:
-                            closest_time = diff
-                            del closest_files[:]
-                            closest_files.append(fullpath)
-                    # if multiple files are allowed, get all files within range
-                    else:
-                        closest_files.append(fullpath)
+        # get files within range from catalog of files under input directory,
+        # which only re-reads directories that have changed since last search
+        catalog = file_catalog.get_file_catalog(data_dir, template, self.logger)
+        matches = catalog.find_files(lower_limit, upper_limit)
+
+        # if only 1 file is allowed, get file closest to desired valid time,
+        # using the first file found if more than one are equally close
+        if matches and not self.c_dict['ALLOW_MULTIPLE_FILES']:
+            matches = [min(matches,
+                           key=lambda match: abs((valid_dt - match[0]).total_seconds()))]
+
+        closest_files = [match[1] for match in matches]
 
         if not closest_files:
             msg = f"Could not find {data_type} files under {data_dir} within range " +\
@@ -525,14 +562,9 @@ class CommandBuilder:
                                         self.config)
 
         # return list if multiple files are found
-        out = []
-        for close_file in closest_files:
-            outfile = util.preprocess_file(close_file,
-                                           self.c_dict[data_type + '_INPUT_DATATYPE'],
-                                           self.config)
-            out.append(outfile)
-
-        return out
+        return util.preprocess_files(closest_files,
+                                     self.c_dict[data_type + '_INPUT_DATATYPE'],
+                                     self.config)
 
     def write_list_file(self, filename, file_list):
         """! Writes a file containing a list of filenames to the staging dir"""
@@ -727,15 +759,116 @@ class CommandBuilder:
         if cmd is None:
             return False
 
+        manifest_entry = None
+        if self.c_dict.get('SKIP_UNCHANGED_COMMANDS'):
+            manifest_entry = self.get_manifest_entry(cmd)
+            if manifest_entry.is_current():
+                self.logger.info("Skipping command because it already ran "
+                                 "with the same inputs and its output has "
+                                 f"not changed: {cmd}")
+                return True
+
+        log_info = resource_usage.get_command_log_info(self.app_name,
+                                                       self.c_dict.get('CURRENT_TIME_INFO'),
+                                                       self.c_dict.get('CURRENT_VAR_INFO'))
+
+        # start command without waiting if running more than one at once
+        # errors are reported when wait_for_commands is called
+        if self.c_dict.get('MAX_CONCURRENT_PROCS', 1) > 1:
+            self.cmdrunner.submit_cmd(cmd, self.env, app_name=self.app_name,
+                                      copyable_env=self.get_env_copy(),
+                                      max_procs=self.c_dict['MAX_CONCURRENT_PROCS'],
+                                      log_info=log_info)
+            if manifest_entry is not None:
+                self.pending_manifest_entries[cmd] = manifest_entry
+            return True
+
         ret, out_cmd = self.cmdrunner.run_cmd(cmd, self.env, app_name=self.app_name,
-                                              copyable_env=self.get_env_copy())
+                                              copyable_env=self.get_env_copy(),
+                                              log_info=log_info)
         if ret != 0:
             self.log_error(f"MET command returned a non-zero return code: {cmd}")
             self.logger.info("Check the logfile for more information on why it failed")
             return False
 
+        if manifest_entry is not None:
+            self.save_manifest_entry(manifest_entry)
+
         return True
 
+    def get_manifest_entry(self, cmd):
+        """!Create run manifest entry for command. This reads the state of
+            the input files, so it should be called right before the command
+            is run
+            Args:
+                @param cmd command to run
+                @returns run_manifest.ManifestEntry object
+        """
+        env_vars = set(self.env_list)
+        if 'user_env_vars' in self.config.sections():
+            env_vars.update(self.config.keys('user_env_vars'))
+
+        return run_manifest.ManifestEntry(self.c_dict['RUN_MANIFEST_DIR'],
+                                          self.app_name,
+                                          cmd,
+                                          {var: self.env.get(var, '')
+                                           for var in env_vars},
+                                          self.get_output_path(),
+                                          self.get_output_file_prefix())
+
+    def get_output_file_prefix(self):
+        """!Get the start of the names of the files that the MET tool
+            writes when the output path is a directory, i.e.
+            grid_stat_PREFIX_. Used to tell which files in the output
+            directory were written by the current command
+            @returns file name prefix
+        """
+        file_prefix = f'{self.app_name}_'
+        output_prefix = self.env.get('OUTPUT_PREFIX') \
+            if 'OUTPUT_PREFIX' in self.env_list else None
+        if output_prefix:
+            file_prefix += f'{output_prefix}_'
+
+        return file_prefix
+
+    def save_manifest_entry(self, manifest_entry):
+        """!Write run manifest entry for a command that succeeded. Logs a
+            debug message if no output files could be found, which means the
+            command will run again next time
+            Args:
+                @param manifest_entry run_manifest.ManifestEntry object
+        """
+        if self.config.getbool('config', 'DO_NOT_RUN_EXE', False):
+            return
+
+        try:
+            if not manifest_entry.save():
+                self.logger.debug("Could not find output of command to add "
+                                  f"to run manifest: {manifest_entry.cmd}")
+        except OSError as err:
+            self.logger.warning("Could not write run manifest entry "
+                                f"{manifest_entry.path}: {err}")
+
+    def wait_for_commands(self):
+        """!Wait for MET commands started by build to finish and report an
+            error for each command that failed
+            @returns True if all commands succeeded, False if any failed
+        """
+        all_good = True
+        for ret, cmd in self.cmdrunner.wait_for_cmds():
+            if ret != 0:
+                self.log_error(f"MET command returned a non-zero return code: {cmd}")
+                self.logger.info("Check the logfile for more information on why it failed")
+                all_good = False
+                self.pending_manifest_entries.pop(cmd, None)
+                continue
+
+            manifest_entry = self.pending_manifest_entries.pop(cmd, None)
+            if manifest_entry is not None:
+                self.save_manifest_entry(manifest_entry)
+
+        return all_good
+
     # argument needed to match call
     # pylint:disable=unused-argument
     def run_at_time(self, input_dict):
@@ -748,4 +881,46 @@ class CommandBuilder:
     def run_all_times(self):
         """!Loop over time range specified in conf file and
         call METplus wrapper for each time"""
+        self.prepare_all_times()
         util.loop_over_times_and_call(self.config, self)
+
+    def reads_other_run_times(self):
+        """!Check if the wrapper may read input files from times other than
+            the current run time, i.e. if a file window or a list of offsets
+            is set. Used when LOOP_ORDER = tasks so that each run time waits
+            for every run time of the wrappers that write its input
+            @returns True if input from other run times may be read
+        """
+        for key, value in self.c_dict.items():
+            if key.endswith(('_FILE_WINDOW_BEGIN', '_FILE_WINDOW_END')) and \
+                    isinstance(value, int) and value != 0:
+                return True
+
+            if key.endswith('OFFSETS') and isinstance(value, list) and \
+                    any(value):
+                return True
+
+        return False
+
+    # argument needed to match call
+    # pylint:disable=unused-argument
+    def check_run_time_inputs(self, input_dict):
+        """!Check if the input files of a run time exist. Used in stream
+            mode for wrappers whose input files cannot be found from their
+            input templates by the pre-flight check. Wrappers that can
+            find their inputs without running commands override this.
+            Args:
+                @param input_dict dictionary with init or valid time
+                @returns None if the wrapper cannot check its inputs,
+                 otherwise tuple of True if all input files were found and
+                 list of input file paths that were found
+        """
+        return None
+
+    def prepare_all_times(self):
+        """!Called by run_all_times before the first run time is processed.
+            Wrappers that run once per run time can override this to do work
+            that covers all run times instead of overriding run_all_times,
+            so they are still scheduled one run time at a time when
+            LOOP_ORDER is tasks or in stream mode"""
+        return
@@ -35,9 +35,20 @@ Output Files: N/A
 # It runs the Runnable object
 #
 import os
-from produtil.run import exe, run
+import shutil
 import shlex
+import tempfile
 from datetime import datetime
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from produtil.run import exe, make_pipeline
+
+import resource_usage
+
+# MET command started by submit_cmd that has not been merged into the log yet
+SubmittedCommand = namedtuple('SubmittedCommand',
+                              'cmd future cmd_log log_dest')
 
 class CommandRunner(object):
     """! Class for Creating and Running External Programs
@@ -51,8 +62,16 @@ class CommandRunner(object):
         self.verbose = verbose
         self.log_command_to_met_log = False
 
+        # pool used to run commands from submit_cmd, list of commands that
+        # were submitted in order, and (return code, command) of commands
+        # that finished but have not been returned by wait_for_cmds
+        self._executor = None
+        self._submitted = []
+        self._finished = []
+
     def run_cmd(self, cmd, env=None, ismetcmd = True, app_name=None, run_inshell=False,
-                log_theoutput=False, copyable_env=None, **kwargs):
+                log_theoutput=False, copyable_env=None, log_info=None,
+                log_file=None, **kwargs):
         """!The command cmd is a string which is converted to a produtil
         exe Runner object and than run. Output of the command may also
         be redirected to either METplus log, MET log, or TTY.
@@ -77,6 +96,11 @@ class CommandRunner(object):
             @param log_theoutput: Used only when ismetcmd=False, will redirect
             the stderr and stdout to a the METplus log file or tty.
             DO Not set to True if the command is redirecting output to a file.
+            @param log_info: dictionary of information, i.e. wrapper name and
+            run time, to write with the resource usage of the command
+            @param log_file: if set, write output that would be sent to the
+            METplus log or MET log to this file instead. Used to keep the
+            output of commands running at the same time separate
             @param kwargs Other options sent to the produtil Run constructor
         """
 
@@ -106,6 +130,8 @@ class CommandRunner(object):
 
             # Determine where to send the output from the MET command.
             log_dest = self.cmdlog_destination(cmdlog=app_name+'.log')
+            if log_dest and log_file:
+                log_dest = log_file
 
             # KEEP This comment as a reference note.
             # Run the executable in a new process instead of through a shell.
@@ -124,19 +150,8 @@ class CommandRunner(object):
                 self.logger.debug("app_name is: %s, output sent to: %s" % (app_name, log_dest))
 
                 with open(log_dest, 'a+') as log_file_handle:
-                    # if logging MET command to its own log file, add command that was run to that log
-                    if self.log_command_to_met_log:
-                        # if environment variables were set and available, write them to MET tool log
-                        if copyable_env:
-                            log_file_handle.write("\nCOPYABLE ENVIRONMENT FOR NEXT COMMAND:\n")
-                            log_file_handle.write(f"{copyable_env}\n\n")
-                        else:
-                            log_file_handle.write('\n')
-
-                        log_file_handle.write(f"COMMAND:\n{cmd}\n\n")
-
-                    # write line to designate where MET tool output starts
-                    log_file_handle.write("MET OUTPUT:\n")
+                    self.write_met_log_header(log_file_handle, cmd,
+                                              copyable_env)
 
                 cmd_exe = exe(the_exe)[the_args].env(**env).err2out() >> log_dest
             else:
@@ -160,6 +175,8 @@ class CommandRunner(object):
 
                 if log_theoutput:
                     log_dest = self.cmdlog_destination()
+                    if log_dest and log_file:
+                        log_dest = log_file
                     cmd_exe = exe('sh')['-c', cmd].env(**env).err2out() >> log_dest
                 else:
                     cmd_exe = exe('sh')['-c', cmd].env(**env)
@@ -169,6 +186,8 @@ class CommandRunner(object):
                 the_args = shlex.split(cmd)[1:]
                 if log_theoutput:
                     log_dest = self.cmdlog_destination()
+                    if log_dest and log_file:
+                        log_dest = log_file
                     cmd_exe = exe(the_exe)[the_args].env(**env).err2out() >> log_dest
                 else:
                     cmd_exe = exe(the_exe)[the_args].env(**env)
@@ -176,22 +195,173 @@ class CommandRunner(object):
         ret = 0
         # run app unless DO_NOT_RUN_EXE is set to True
         if not self.config.getbool('config', 'DO_NOT_RUN_EXE', False):
-            # get current time to calculate total time to run command
-            start_cmd_time = datetime.now()
-
-            # run command
-            try:
-                ret = run(cmd_exe, **kwargs)
-            except:
-                ret = -1
-            else:
-                # calculate time to run
-                end_cmd_time = datetime.now()
-                total_cmd_time = end_cmd_time - start_cmd_time
-                self.logger.debug(f'Finished running {the_exe} in {total_cmd_time}')
+            ret = self.run_cmd_exe(cmd_exe, the_exe, log_info=log_info,
+                                   **kwargs)
 
         return (ret, cmd)
 
+    def run_cmd_exe(self, cmd_exe, the_exe, log_info=None, **kwargs):
+        """!Run produtil Runner object and log how long it took. If
+            LOG_RESOURCE_USAGE is True, write the time and memory used by
+            the command to the resource usage file.
+            Args:
+                @param cmd_exe produtil Runner object to run
+                @param the_exe name of executable to log
+                @param log_info dictionary of information to write with the
+                 resource usage of the command
+                @param kwargs Other options sent to the produtil Run constructor
+                @returns return code of command or -1 if it could not be run
+        """
+        # get current time to calculate total time to run command
+        start_cmd_time = datetime.now()
+
+        # run command
+        # the pipeline is run directly instead of calling produtil.run.run
+        # so that the resource usage of the processes can be read after
+        try:
+            pipeline = make_pipeline(cmd_exe, False)
+            pipeline.communicate(sleeptime=kwargs.get('sleeptime'))
+            ret = pipeline.poll()
+        except:
+            ret = -1
+        else:
+            # calculate time to run
+            end_cmd_time = datetime.now()
+            total_cmd_time = end_cmd_time - start_cmd_time
+            self.logger.debug(f'Finished running {the_exe} in {total_cmd_time}')
+
+            usage_path = resource_usage.get_resource_usage_path(self.config)
+            if usage_path:
+                record = resource_usage.get_usage_record(the_exe, ret,
+                                                         total_cmd_time.total_seconds(),
+                                                         pipeline.rusage(),
+                                                         log_info)
+                resource_usage.write_resource_usage(usage_path, record)
+
+        return ret
+
+    def write_met_log_header(self, log_file_handle, cmd, copyable_env=None):
+        """!Write command and environment to log before MET output
+            Args:
+                @param log_file_handle open file to write to
+                @param cmd command that will be run
+                @param copyable_env environment variables to write if
+                 logging MET command to its own log file
+        """
+        # if logging MET command to its own log file, add command that was run to that log
+        if self.log_command_to_met_log:
+            # if environment variables were set and available, write them to MET tool log
+            if copyable_env:
+                log_file_handle.write("\nCOPYABLE ENVIRONMENT FOR NEXT COMMAND:\n")
+                log_file_handle.write(f"{copyable_env}\n\n")
+            else:
+                log_file_handle.write('\n')
+
+            log_file_handle.write(f"COMMAND:\n{cmd}\n\n")
+
+        # write line to designate where MET tool output starts
+        log_file_handle.write("MET OUTPUT:\n")
+
+    def submit_cmd(self, cmd, env=None, app_name=None, copyable_env=None,
+                   max_procs=1, log_info=None):
+        """!Start a MET command without waiting for it to finish. At most
+        max_procs commands submitted to this object run at the same time and
+        the rest wait in a queue. The output of each command is written to
+        its own log file in TMP_DIR and appended to the log that run_cmd
+        would write to after all commands submitted before it have been
+        appended, so the log is in the same order as if the commands were
+        run one at a time. Call wait_for_cmds to get the return codes.
+
+        Args:
+            @param cmd: A string, Command used in the produtil exe Runner object.
+            @param env: Default None, environment for run to pass in, uses
+            os.environ if not set. A copy is made, so env can be changed
+            after this call.
+            @param app_name: The name of the exectable being run.
+            @param copyable_env: environment variables to write to the log
+            @param max_procs: maximum number of commands to run at once
+            @param log_info: dictionary of information to write with the
+            resource usage of the command
+        """
+        if cmd is None:
+            return
+
+        # if env not set, use os.environ
+        if env is None:
+            env = os.environ
+
+        self.logger.info("COMMAND: %s" % cmd)
+
+        if not app_name:
+            app_name = os.path.basename(cmd.split()[0])
+
+        the_exe = shlex.split(cmd)[0]
+        the_args = shlex.split(cmd)[1:]
+        cmd_exe = exe(the_exe)[the_args].env(**env).err2out()
+
+        # do not run app if DO_NOT_RUN_EXE is set to True
+        if self.config.getbool('config', 'DO_NOT_RUN_EXE', False):
+            self._finished.append((0, cmd))
+            return
+
+        # Determine where to send the output from the MET command.
+        # write output to a separate file so that output from commands
+        # running at the same time is not mixed together
+        log_dest = self.cmdlog_destination(cmdlog=app_name+'.log')
+        cmd_log = None
+        if log_dest:
+            file_handle, cmd_log = tempfile.mkstemp(prefix=f'{app_name}_',
+                                                    suffix='.log',
+                                                    dir=self.config.getdir('TMP_DIR'))
+            with os.fdopen(file_handle, 'w') as log_file_handle:
+                self.write_met_log_header(log_file_handle, cmd, copyable_env)
+
+            self.logger.debug("app_name is: %s, output sent to: %s" % (app_name, log_dest))
+            cmd_exe = cmd_exe >> cmd_log
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=max(max_procs, 1))
+
+        future = self._executor.submit(self.run_cmd_exe, cmd_exe, the_exe,
+                                       log_info=log_info)
+        self._submitted.append(SubmittedCommand(cmd, future, cmd_log, log_dest))
+
+        # add output of any commands that have finished to the log
+        self.merge_finished_logs()
+
+    def merge_finished_logs(self):
+        """!Append output of commands from submit_cmd that have finished to
+            the log, stopping at the first command that is still running so
+            that output is always added in the order that commands were
+            submitted"""
+        while self._submitted and self._submitted[0].future.done():
+            submitted = self._submitted.pop(0)
+            if submitted.cmd_log:
+                with open(submitted.cmd_log, 'r') as cmd_log_handle, \
+                        open(submitted.log_dest, 'a+') as log_file_handle:
+                    shutil.copyfileobj(cmd_log_handle, log_file_handle)
+                os.remove(submitted.cmd_log)
+
+            self._finished.append((submitted.future.result(), submitted.cmd))
+
+    def wait_for_cmds(self):
+        """!Wait for all commands started by submit_cmd to finish
+            @returns list of (return code, command) for each command that
+             finished since the last call, in the order they were submitted
+        """
+        for submitted in self._submitted:
+            submitted.future.result()
+
+        self.merge_finished_logs()
+
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+        finished = self._finished
+        self._finished = []
+        return finished
+
     # TODO: Refactor seriesbylead.
     # For now we are back to running through a shell.
     # Can not run its cmd string, unless we run through a shell.
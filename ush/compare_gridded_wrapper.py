@@ -40,6 +40,15 @@ that reformat gridded data
         if not hasattr(self, 'app_name'):
             self.app_name = 'compare_gridded'
 
+        # field information read from the config, set the first time that
+        # fields are needed and reused for each run time
+        self.field_plan = None
+
+        # climatology files that were already found, keyed by the path that
+        # was searched, so run times that share a file (i.e. monthly
+        # climatology) only search for it and stage it once
+        self.climo_file_cache = {}
+
         super().__init__(config, logger)
         # check to make sure all necessary probabilistic settings are set correctly
         # this relies on the subclass to finish creating the c_dict, so it has to
@@ -75,6 +84,12 @@ that reformat gridded data
         c_dict['OBS_PROB_THRESH'] = None
 
         c_dict['ALLOW_MULTIPLE_FILES'] = False
+
+        # commands for each field and lead are independent so they can run
+        # at the same time
+        c_dict['MAX_CONCURRENT_PROCS'] = \
+            self.config.getint('config', 'MET_MAX_CONCURRENT_PROCS', 1)
+
         c_dict['NEIGHBORHOOD_WIDTH'] = ''
         c_dict['NEIGHBORHOOD_SHAPE'] = ''
         c_dict['VERIFICATION_MASK_TEMPLATE'] = ''
@@ -147,10 +162,25 @@ that reformat gridded data
                                template,
                                **time_info).do_string_sub()
         climo_path = os.path.join(self.c_dict[f'CLIMO_{climo_item}_INPUT_DIR'], climo_file)
+
+        # use file found for a previous run time if it is still available
+        # and was not staged from a compressed file that has since changed
+        climo_file = self.climo_file_cache.get(climo_path)
+        if climo_file is not None and \
+                util.is_preprocessed_file_current(climo_path, climo_file,
+                                                  self.config):
+            self.c_dict[f'CLIMO_{climo_item}_FILE'] = climo_file
+            return
+
         self.logger.debug(f"Looking for climatology {climo_item.lower()} file {climo_path}")
-        self.c_dict[f'CLIMO_{climo_item}_FILE'] = util.preprocess_file(climo_path,
-                                                                       '',
-                                                                       self.config)
+        climo_file = util.preprocess_file(climo_path,
+                                          '',
+                                          self.config)
+        self.c_dict[f'CLIMO_{climo_item}_FILE'] = climo_file
+
+        # only save files that were found in case they become available later
+        if climo_file is not None:
+            self.climo_file_cache[climo_path] = climo_file
 
     def run_at_time(self, input_dict):
         """! Runs the MET application for a given run time. This function loops
@@ -179,6 +209,9 @@ that reformat gridded data
 
                 time_info['custom'] = custom_string
 
+                if self.should_skip_run_time(time_info):
+                    continue
+
                 # Run for given init/valid time and forecast lead combination
                 self.run_at_time_once(time_info)
 
@@ -188,11 +221,20 @@ that reformat gridded data
                 @param time_info dictionary containing timing information
         """
 
+        self.c_dict['CURRENT_TIME_INFO'] = time_info
+
         # get verification mask if available
         self.get_verification_mask(time_info)
 
+        # read field information from config once and substitute time
+        # information for each run time
+        if self.field_plan is None:
+            self.field_plan = util.get_field_plan(self.config,
+                                                  met_tool=self.app_name)
+
         self.c_dict['VAR_LIST'] = util.parse_var_list(self.config, time_info,
-                                                      met_tool=self.app_name)
+                                                      met_tool=self.app_name,
+                                                      field_plan=self.field_plan)
 
         if not self.c_dict['VAR_LIST']:
             self.log_error('No input fields were specified. You must set '
@@ -499,6 +541,38 @@ that reformat gridded data
             mask_list_string = self.format_list_string(filenames)
             self.c_dict['VERIFICATION_MASK'] = mask_list_string
 
+    def get_output_file_prefix(self):
+        """!Get the start of the names of the files that the MET tool
+            writes, i.e. grid_stat_PREFIX_120000L_20050807_120000V, so that
+            commands for other run times writing to the same directory are
+            not included
+            @returns file name prefix
+        """
+        file_prefix = super().get_output_file_prefix()
+        time_info = self.c_dict.get('CURRENT_TIME_INFO')
+        if not time_info:
+            return file_prefix
+
+        return file_prefix + self.get_output_time_string(time_info)
+
+    def get_output_time_string(self, time_info):
+        """!Get the lead and valid time that MET adds to output file
+            names, i.e. 120000L_20050807_120000V
+            Args:
+                @param time_info dictionary containing timing information
+                @returns time string or empty string if it cannot be
+                 determined
+        """
+        lead = time_info.get('lead')
+        valid = time_info.get('valid')
+        if not isinstance(lead, int) or lead < 0 or valid is None:
+            return ''
+
+        hours, remainder = divmod(lead, 3600)
+        minutes, seconds = divmod(remainder, 60)
+        return (f"{hours:02d}{minutes:02d}{seconds:02d}L_"
+                f"{valid.strftime('%Y%m%d_%H%M%S')}V")
+
     def get_command(self):
         """! Builds the command to run the MET application
            @rtype string
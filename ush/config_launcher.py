@@ -16,7 +16,12 @@ import logging
 import collections
 import datetime
 import shutil
+import time
+import threading
+import functools
+from contextlib import contextmanager
 from os.path import dirname, realpath
+from configparser import NoOptionError
 
 from produtil.config import ProdConfig
 import produtil.fileop
@@ -402,6 +407,26 @@ def _set_logvars(config, logger=None):
     # expand LOG_METPLUS to ensure it is available
     config.set('config', 'LOG_METPLUS', metpluslog)
 
+def _counted_lookup(method):
+    """!Decorator for METplusConfig get methods that adds the number of calls
+        and the time spent in them to the lookup counts of the current owner
+        if lookup counting is turned on. Get methods that are called from
+        inside another get method are not counted separately."""
+    @functools.wraps(method)
+    def counted(self, *args, **kwargs):
+        if not self.count_lookups or getattr(self._lookup_state, 'depth', 0):
+            return method(self, *args, **kwargs)
+
+        self._lookup_state.depth = 1
+        start_time = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._lookup_state.depth = 0
+            self.add_lookup(time.perf_counter() - start_time)
+
+    return counted
+
 class METplusConfig(ProdConfig):
     """!A replacement for the produtil.config.ProdConfig used throughout
     the METplus system.  You should never need to instantiate one of
@@ -422,6 +447,18 @@ class METplusConfig(ProdConfig):
         # get the OS environment and store it
         self.env = os.environ.copy()
 
+        # if True, resolved values are stored so each config item is only
+        # interpreted once until set is called
+        self._frozen = False
+        self._interp_cache = {}
+        self._raw_cache = {}
+
+        # number of get calls and seconds spent in them for each owner
+        # (usually a wrapper name) if count_lookups is True
+        self.count_lookups = False
+        self.lookup_counts = {}
+        self._lookup_state = threading.local()
+
         # TODO: does this do anything?
         logger = self._logger
 
@@ -451,7 +488,102 @@ class METplusConfig(ProdConfig):
         throw a wide variety of exceptions if sanity checks fail."""
         logger = self.log('sanity.checker')
 
+    def freeze(self):
+        """!Resolve every config item once and store the values so that
+            later get calls do not need to interpret them again. Stored
+            values are removed when set is called and are read again the
+            next time they are requested.
+            @returns number of config items that were resolved
+        """
+        self._frozen = True
+        self.clear_lookup_cache()
+
+        num_resolved = 0
+        for sec in self.sections():
+            for opt in self.keys(sec):
+                try:
+                    self.getraw(sec, opt)
+                    self._interp(sec, opt)
+                except Exception:
+                    # some items, i.e. filename templates, can only be
+                    # resolved later with time information
+                    continue
+
+                num_resolved += 1
+
+        return num_resolved
+
+    def clear_lookup_cache(self):
+        """!Remove all stored values so they are resolved again"""
+        self._interp_cache.clear()
+        self._raw_cache.clear()
+
+    def set(self, section, key, value):
+        """!Overrides ProdConfig set to remove stored values because they may
+            reference the item that changed. Stored values are kept if the
+            value is the same as the current value."""
+        section = str(section)
+        key = str(key)
+        value = str(value)
+        if (self._conf.has_option(section, key) and
+                self._conf.get(section, key, raw=True) == value):
+            return
+
+        super().set(section, key, value)
+        self.clear_lookup_cache()
+
+    def set_options(self, section, **kwargs):
+        """!Overrides ProdConfig set_options to remove stored values"""
+        super().set_options(section, **kwargs)
+        self.clear_lookup_cache()
+
+    def _interp(self, sec, opt, morevars=None, taskvars=None):
+        """!Overrides ProdConfig _interp to use the stored value if the config
+            has been frozen. Values are only stored if no additional variables
+            are used to interpret them."""
+        if not self._frozen or morevars is not None or taskvars is not None:
+            return super()._interp(sec, opt, morevars=morevars,
+                                   taskvars=taskvars)
+
+        key = (sec, opt)
+        value = self._interp_cache.get(key)
+        if value is None:
+            try:
+                value = super()._interp(sec, opt)
+            except NoOptionError as err:
+                value = err
+            self._interp_cache[key] = value
+
+        if isinstance(value, NoOptionError):
+            raise NoOptionError(opt, sec)
+
+        return value
+
+    @contextmanager
+    def lookup_owner(self, owner):
+        """!Context manager to count get calls made inside the block for
+            owner, i.e. the name of a wrapper
+            @param owner name to count get calls for
+        """
+        previous = getattr(self._lookup_state, 'owner', None)
+        self._lookup_state.owner = owner
+        try:
+            yield
+        finally:
+            self._lookup_state.owner = previous
+
+    def add_lookup(self, seconds):
+        """!Add a get call and the time it took to the counts of the
+            current owner
+            @param seconds time spent in get call
+        """
+        owner = getattr(self._lookup_state, 'owner', None) or 'METplus'
+        counts = self.lookup_counts.setdefault(owner, [0, 0.0])
+        counts[0] += 1
+        counts[1] += seconds
+
     # override get methods to perform additional error checking
+    @_counted_lookup
     def getraw(self, sec, opt, default='', count=0):
         """ parse parameter and replace any existing parameters
             referenced with the value (looking in same section, then
@@ -469,6 +601,19 @@ class METplusConfig(ProdConfig):
         if count >= 10:
             return ''
 
+        if self._frozen and count == 1:
+            key = (sec, opt, default)
+            value = self._raw_cache.get(key)
+            if value is None:
+                value = self._getraw(sec, opt, default, count)
+                self._raw_cache[key] = value
+            return value
+
+        return self._getraw(sec, opt, default, count)
+
+    def _getraw(self, sec, opt, default, count):
+        """!Implementation of getraw that replaces references to other
+            config items with their raw values"""
         in_template = super().getraw(sec, opt, default)
         out_template = ""
         in_brackets = False
@@ -526,6 +671,7 @@ class METplusConfig(ProdConfig):
         #  using a default value
         self.set(sec, name, default)
 
+    @_counted_lookup
     def getexe(self, exe_name, default=None, morevars=None):
         """!Wraps produtil exe with checks to see if option is set and if
             exe actually exists. Returns None if not found instead of exiting"""
@@ -552,6 +698,7 @@ class METplusConfig(ProdConfig):
         self.set('exe', exe_name, full_exe_path)
         return full_exe_path
 
+    @_counted_lookup
     def getdir(self, dir_name, default=None, morevars=None,taskvars=None, must_exist=False):
         """!Wraps produtil getdir and reports an error if it is set to /path/to"""
         if not self.has_option('dir', dir_name):
@@ -582,6 +729,7 @@ class METplusConfig(ProdConfig):
         return super().getstr(sec, name, default=default).replace('//', '/')
 
 
+    @_counted_lookup
     def getstr(self, sec, name, default=None, badtypeok=False, morevars=None, taskvars=None):
         """!Wraps produtil getstr to gracefully report if variable is not set
             and no default value is specified"""
@@ -592,6 +740,7 @@ class METplusConfig(ProdConfig):
         self.check_default(sec, name, default)
         return default.replace('//', '/')
 
+    @_counted_lookup
     def getbool(self, sec, name, default=None, badtypeok=False, morevars=None, taskvars=None):
         """!Wraps produtil getbool to gracefully report if variable is not set
             and no default value is specified"""
@@ -602,6 +751,7 @@ class METplusConfig(ProdConfig):
         self.check_default(sec, name, default)
         return default
 
+    @_counted_lookup
     def getint(self, sec, name, default=None, badtypeok=False, morevars=None, taskvars=None):
         """!Wraps produtil getint to gracefully report if variable is not set
             and no default value is specified"""
@@ -612,6 +762,7 @@ class METplusConfig(ProdConfig):
         self.check_default(sec, name, default)
         return default
 
+    @_counted_lookup
     def getfloat(self, sec, name, default=None, badtypeok=False, morevars=None, taskvars=None):
         """!Wraps produtil getfloat to gracefully report if variable is not set
             and no default value is specified"""
@@ -622,6 +773,7 @@ class METplusConfig(ProdConfig):
         self.check_default(sec, name, default)
         return default
 
+    @_counted_lookup
     def getseconds(self, sec, name, default=None, badtypeok=False, morevars=None, taskvars=None):
         """!Converts time values ending in H, M, or S to seconds"""
         if self.has_option(sec, name):
@@ -409,6 +409,20 @@ class EnsembleStatWrapper(CompareGriddedWrapper):
         self.grid_obs_files = []
 
 
+    def get_output_time_string(self, time_info):
+        """!Get the valid time that ensemble_stat adds to output file names,
+            i.e. 20050807_120000V
+            Args:
+                @param time_info dictionary containing timing information
+                @returns time string or empty string if it cannot be
+                 determined
+        """
+        valid = time_info.get('valid')
+        if valid is None:
+            return ''
+
+        return f"{valid.strftime('%Y%m%d_%H%M%S')}V"
+
     def get_command(self):
         """! Builds the command to run the MET application
            @rtype string
@@ -113,9 +113,11 @@ class ExtractTilesWrapper(CommandBuilder):
                                "config file settings.s")
                 sys.exit(1)
 
-        # Now get unique storm ids from the filter file,
-        # filter_yyyymmdd_hh.tcst
-        sorted_storm_ids = util.get_storm_ids(filter_name, self.logger)
+        # Read the filter file once, splitting the rows by storm id.
+        # Store the rows for each storm into a temporary file in the
+        # tmp directory (or pass them directly if filtering in memory),
+        # then create the tiles for the storm.
+        sorted_storm_ids = self.create_results_files(cur_init, filter_name, tmp_dir)
 
         # Useful debugging info: Check for empty sorted_storm_ids, if empty,
         # continue to the next time.
@@ -126,16 +128,6 @@ class ExtractTilesWrapper(CommandBuilder):
             self.logger.debug(msg)
             return
 
-        # Process each storm in the sorted_storm_ids list
-        # Iterate over each filter file in the output directory and
-        # search for the presence of the storm id.  Store this
-        # corresponding row of data into a temporary file in the
-        # /tmp directory where each file contains information based on storm.
-        if not self.create_results_files(sorted_storm_ids, cur_init, filter_name, tmp_dir):
-            self.log_error("There was a problem with processing storms from the filtered result, "\
-                    "please check your METplus config file settings or your write permissions for your "\
-                    "tmp directory.")
-
         util.prune_empty(self.filtered_out_dir, self.logger)
 
     def tc_files_exist(self):
@@ -187,56 +179,23 @@ class ExtractTilesWrapper(CommandBuilder):
 
         return 0
 
-    def create_results_files(self, sorted_storm_ids, cur_init, filter_name, tmp_dir):
-        ''' Create the tmp files that contain filtered results- one tmp file per storm, then
-            invoke retrieve_and_regrid to create the final output as netCDF forecast and analysis (obs)
-            files.
+    def create_results_files(self, cur_init, filter_name, tmp_dir):
+        ''' Split the filtered results by storm in a single pass of the filter file, then
+            invoke retrieve_and_regrid for each storm to create the final output as netCDF
+            forecast and analysis (obs) files.
 
             Args:
-                @param sorted_storm_ids:
                 @param cur_init: The current init time of interest
                 @param filter_name: The full file name of the filter file generated by tc stat
-                @param tmp_dir: The location of the tmp directory where these tmp files will be saved
-
-
+                @param tmp_dir: The location of the tmp directory where the tmp files (one per
+                                storm) will be saved
 
             Return:
-             0 if successful in creating the tmp files (one per storm) in the tmp_dir
+             sorted list of storm ids that were processed
         '''
-
-        processed_file = False
-        # Process each storm in the sorted_storm_ids list
-        # Iterate over each filter file in the output directory and
-        # search for the presence of the storm id.  Store this
-        # corresponding row of data into a temporary file in the
-        # /tmp/<pid> directory.
-        for cur_storm in sorted_storm_ids:
-            storm_output_dir = os.path.join(self.filtered_out_dir,
-                                            cur_init, cur_storm)
-            header = open(filter_name, "r").readline()
-            util.mkdir_p(storm_output_dir)
-
-            tmp_filename = "filter_" + cur_init + "_" + cur_storm
-            full_tmp_filename = os.path.join(tmp_dir, tmp_filename)
-
-            storm_match_list = util.grep(cur_storm, filter_name)
-
-            # open with w+ to overwrite if it exists and create it if not
-            with open(full_tmp_filename, "w") as tmp_file:
-                # copy over header information
-                tmp_file.write(header)
-                for storm_match in storm_match_list:
-                    tmp_file.write(storm_match)
-
-            feature_util.retrieve_and_regrid(full_tmp_filename, cur_init,
-                                             cur_storm, self.filtered_out_dir,
-                                             self.config)
-
-            # remove tmp file
-            os.remove(full_tmp_filename)
-            processed_file = True
-
-        return processed_file
+        return feature_util.retrieve_and_regrid_storms(filter_name, cur_init,
+                                                       self.filtered_out_dir,
+                                                       tmp_dir, self.config)
 
 if __name__ == "__main__":
     util.run_stand_alone(__file__, "ExtractTiles")
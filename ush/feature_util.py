@@ -3,7 +3,13 @@ import os
 import sys
 import re
 import datetime
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import netCDF4
 import met_util as util
+from command_runner import CommandRunner
 from regrid_data_plane_wrapper import RegridDataPlaneWrapper
 from string_template_substitution import StringSub
 
@@ -11,12 +17,42 @@ from string_template_substitution import StringSub
  @brief Provides  Utility functions for METplus feature relative use case.
 """
 
+# allowed difference, in grid points, between tile and grid locations
+GRID_TOLERANCE = 1e-4
 
-def retrieve_and_regrid(tmp_filename, cur_init, cur_storm, out_dir, config):
+
+def retrieve_and_regrid(tmp_filename, cur_init, cur_storm, out_dir, config,
+                        regrid_jobs=None):
     """! Retrieves the data from the EXTRACT_TILES_GRID_INPUT_DIR (defined in metplus.conf)
-         that corresponds to the storms defined in the tmp_filename:
+         that corresponds to the storms defined in the tmp_filename. See
+         retrieve_and_regrid_lines for details.
+        Args:
+        @param tmp_filename:   Filename of the temporary filter file in
+                               the /tmp directory. Contains rows
+                               of data corresponding to a storm id of varying
+                               times.
+        @param cur_init:       The current init time
+        @param cur_storm:      The current storm
+        @param out_dir:  The directory where regridded netCDF or grib2 output
+                         is saved.
+        @param config:  config instance
+        @param regrid_jobs: dictionary to add the tiles to. If not set, the
+                            tiles are created before returning
+        Returns:
+           None
+    """
+    with open(tmp_filename, "r") as tf:
+        header = tf.readline()
+        retrieve_and_regrid_lines(header, tf, cur_init, cur_storm, out_dir,
+                                  config, regrid_jobs)
+
+
+def retrieve_and_regrid_lines(header, lines, cur_init, cur_storm, out_dir, config,
+                              regrid_jobs=None):
+    """! Retrieves the data from the EXTRACT_TILES_GRID_INPUT_DIR (defined in metplus.conf)
+         that corresponds to the storms defined in the lines of a filter file:
         1) create the analysis tile and forecast file names from the
-           tmp_filename file.
+           filter file lines.
         2) perform regridding via MET tool (regrid_data_plane) and store
            results (netCDF files) in the out_dir or via
            Regridding via  regrid_data_plane on the forecast and analysis
@@ -27,16 +63,18 @@ def retrieve_and_regrid(tmp_filename, cur_init, cur_storm, out_dir, config):
         ***NOTE:  This is used by both extract_tiles_wrapper.py and
                series_by_lead_wrapper.py
         Args:
-        @param tmp_filename:   Filename of the temporary filter file in
-                               the /tmp directory. Contains rows
-                               of data corresponding to a storm id of varying
-                               times.
+        @param header:   Header line of the filter file
+        @param lines:    Rows of the filter file corresponding to a storm id
+                         of varying times
         @param cur_init:       The current init time
         @param cur_storm:      The current storm
         @param out_dir:  The directory where regridded netCDF or grib2 output
                          is saved.
                          netCDF data is produced by the MET regridding tool, regrid_data_plane.
         @param config:  config instance
+        @param regrid_jobs: dictionary to add the tiles to with
+                            add_regrid_job. If not set, the tiles are created
+                            before returning
         Returns:
            None
     """
@@ -47,14 +85,7 @@ def retrieve_and_regrid(tmp_filename, cur_init, cur_storm, out_dir, config):
     # pylint: disable=too-many-arguments
     # all input is needed to perform task
 
-    # rdp=, was added when logging capability was added to capture
-    # all MET output to log files. It is a temporary work around
-    # to get logging up and running as needed.
-    # It is being used to call the run_cmd method, which runs the cmd
-    # and redirects logging based on the conf settings.
-    # Instantiate a RegridDataPlaneWrapper
     logger = config.logger
-    rdp = RegridDataPlaneWrapper(config, logger)
 
     # For logging
     cur_filename = sys._getframe().f_code.co_filename
@@ -62,204 +93,593 @@ def retrieve_and_regrid(tmp_filename, cur_init, cur_storm, out_dir, config):
 
     # Get variables, etc. from param/config file.
     model_data_dir = config.getdir('EXTRACT_TILES_GRID_INPUT_DIR')
-    met_bin_dir = config.getdir('MET_BIN_DIR', '')
-    regrid_data_plane_exe = os.path.join(met_bin_dir,
-                                         'regrid_data_plane')
 
     overwrite_flag = config.getbool('config', 'EXTRACT_TILES_OVERWRITE_TRACK')
 
+    # tiles to create, grouped by the input file they are cut from
+    create_now = regrid_jobs is None
+    if create_now:
+        regrid_jobs = {}
+
     # Extract the columns of interest: init time, lead time,
     # valid time lat and lon of both tropical cyclone tracks, etc.
     # Then calculate the forecast hour and other things.
-    with open(tmp_filename, "r") as tf:
-        # read header
-        header = tf.readline().split()
-        # get column number for columns on interest
-        # print('header{}:'.format(header))
-        header_colnum_init, header_colnum_lead, header_colnum_valid = \
-            header.index('INIT'), header.index('LEAD'), header.index(
-                'VALID')
-        header_colnum_alat, header_colnum_alon = \
-            header.index('ALAT'), header.index('ALON')
-        header_colnum_blat, header_colnum_blon = \
-            header.index('BLAT'), header.index('BLON')
-        for line in tf:
-            col = line.split()
-            init, lead, valid, alat, alon, blat, blon = \
-                col[header_colnum_init], col[header_colnum_lead], \
-                col[header_colnum_valid], col[header_colnum_alat], \
-                col[header_colnum_alon], col[header_colnum_blat], \
-                col[header_colnum_blon]
-
-            # integer division for both Python 2 and 3
-            lead_time = int(lead)
-            fcst_hr = lead_time // 10000
-
-            init_ymd_match = re.match(r'[0-9]{8}', init)
-            if init_ymd_match:
-                init_ymd = init_ymd_match.group(0)
-            else:
-                logger.WARN("RuntimeError raised")
-                raise RuntimeError(
-                    'init time has unexpected format for YMD')
-
-            init_ymdh_match = re.match(r'[0-9|_]{11}', init)
-            if init_ymdh_match:
-                init_ymdh = init_ymdh_match.group(0)
-            else:
-                logger.WARN("RuntimeError raised")
-
-            valid_ymd_match = re.match(r'[0-9]{8}', valid)
-            if valid_ymd_match:
-                valid_ymd = valid_ymd_match.group(0)
-            else:
-                logger.WARN("RuntimeError raised")
-
-            valid_ymdh_match = re.match(r'[0-9|_]{11}', valid)
-            if valid_ymdh_match:
-                valid_ymdh = valid_ymdh_match.group(0)
-            else:
-                logger.WARN("RuntimeError raised")
-
-            lead_str = str(fcst_hr).zfill(3)
-            fcst_dir = os.path.join(model_data_dir, init_ymd)
-            init_ymdh_split = init_ymdh.split("_")
-            init_yyyymmddhh = "".join(init_ymdh_split)
-            anly_dir = os.path.join(model_data_dir, valid_ymd)
-            valid_ymdh_split = valid_ymdh.split("_")
-            valid_yyyymmddhh = "".join(valid_ymdh_split)
-
-            init_dt = datetime.datetime.strptime(init_yyyymmddhh, '%Y%m%d%H')
-            valid_dt = datetime.datetime.strptime(valid_yyyymmddhh, '%Y%m%d%H')
-            lead_seconds = int(fcst_hr * 3600)
-            # Create output filenames for regridding
-            # wgrib2 used to regrid.
-            # Create the filename for the regridded file, which is a
-            # grib2 file.
-            fcst_sts = \
-                StringSub(logger, config.getraw('filename_templates',
-                                            'FCST_EXTRACT_TILES_INPUT_TEMPLATE'),
-                          init=init_dt, lead=lead_seconds)
-
-            anly_sts = \
-                StringSub(logger, config.getraw('filename_templates',
-                                            'OBS_EXTRACT_TILES_INPUT_TEMPLATE'),
-                          valid=valid_dt, lead=lead_seconds)
-
-            fcst_file = fcst_sts.do_string_sub()
-            fcst_filename = os.path.join(fcst_dir, fcst_file)
-            anly_file = anly_sts.do_string_sub()
-            anly_filename = os.path.join(anly_dir, anly_file)
-
-            # Check if the forecast input file exists. If it doesn't
-            # exist, just log it
-            if util.file_exists(fcst_filename):
-                logger.debug("Forecast file: {}".format(fcst_filename))
-            else:
-                logger.warning("Can't find forecast file {}, continuing"\
-                               .format(fcst_filename))
-                continue
-
-            # Check if the analysis input file exists. If it doesn't
-            # exist, just log it.
-            if util.file_exists(anly_filename):
-                logger.debug("Analysis file: {}".format(anly_filename))
-
-            else:
-                logger.warning("Can't find analysis file {}, continuing"\
-                       .format(anly_filename))
-                continue
-
-            # Create the arguments used to perform regridding.
-            # NOTE: the base name
-            # is the same for both the fcst and anly filenames,
-            # so use either one to derive the base name that will
-            # be used to create the fcst_regridded_filename and
-            # anly_regridded_filename.
-            fcst_anly_base = os.path.basename(fcst_filename)
-
-            fcst_grid_spec = \
-                util.create_grid_specification_string(alat, alon,
-                                                      logger,
-                                                      config)
-            anly_grid_spec = \
-                util.create_grid_specification_string(blat, blon,
-                                                      logger,
-                                                      config)
-
-            nc_fcst_anly_base = re.sub("grb2", "nc", fcst_anly_base)
-            fcst_anly_base = nc_fcst_anly_base
-
-            tile_dir = os.path.join(out_dir, cur_init, cur_storm)
-            fcst_hr_str = str(fcst_hr).zfill(3)
-
-            fcst_regridded_filename = \
-                config.getstr('regex_pattern', 'FCST_EXTRACT_TILES_PREFIX') + \
-                fcst_hr_str + "_" + fcst_anly_base
-            fcst_regridded_file = os.path.join(tile_dir,
-                                               fcst_regridded_filename)
-            anly_regridded_filename = \
-                config.getstr('regex_pattern', 'OBS_EXTRACT_TILES_PREFIX') + \
-                fcst_hr_str + "_" + fcst_anly_base
-            anly_regridded_file = os.path.join(tile_dir,
-                                               anly_regridded_filename)
-
-            # Regrid the fcst file only if a fcst tile
-            # file does NOT already exist or if the overwrite flag is True.
-            # Create new gridded file for fcst tile
-            if util.file_exists(fcst_regridded_file) and not overwrite_flag:
-                msg = "Forecast tile file {} exists, skip regridding"\
-                  .format(fcst_regridded_file)
-                logger.debug(msg)
-            else:
-                # Perform fcst regridding on the records of interest
-                var_level_string = retrieve_var_info(config)
-
-
-
-                # Perform regridding using MET Tool regrid_data_plane
-                fcst_cmd_list = [regrid_data_plane_exe, ' ',
-                                 fcst_filename, ' ',
-                                 fcst_grid_spec, ' ',
-                                 fcst_regridded_file, ' ',
-                                 var_level_string,
-                                 ' -method NEAREST ']
-                regrid_cmd_fcst = ''.join(fcst_cmd_list)
-
-                # Since not using the CommandBuilder to build the cmd,
-                # add the met verbosity level to the
-                # MET cmd created before we run the command.
-                regrid_cmd_fcst = rdp.cmdrunner.insert_metverbosity_opt(
-                    regrid_cmd_fcst)
-                (ret, regrid_cmd_fcst) = rdp.cmdrunner.run_cmd(
-                    regrid_cmd_fcst, env=None, app_name=rdp.app_name)
-
-            # Create new gridded file for anly tile
-            if util.file_exists(anly_regridded_file) and not overwrite_flag:
-                logger.debug("Analysis tile file: " + anly_regridded_file +
-                             " exists, skip regridding")
-            else:
-                # Perform anly regridding on the records of interest
-                var_level_string = retrieve_var_info(config)
-                anly_cmd_list = [regrid_data_plane_exe, ' ',
-                                 anly_filename, ' ',
-                                 anly_grid_spec, ' ',
-                                 anly_regridded_file, ' ',
-                                 var_level_string, ' ',
-                                 ' -method NEAREST ']
-                regrid_cmd_anly = ''.join(anly_cmd_list)
-
-                # Since not using the CommandBuilder to build the cmd,
-                # add the met verbosity level to the MET cmd
-                # created before we run the command.
-                regrid_cmd_anly = rdp.cmdrunner.insert_metverbosity_opt(
-                    regrid_cmd_anly)
-                (ret, regrid_cmd_anly) = rdp.cmdrunner.run_cmd(
-                    regrid_cmd_anly, env=None, app_name=rdp.app_name)
-                msg = ("on anly file:" +
-                       anly_regridded_file)
-                logger.debug(msg)
+    header = header.split()
+    # get column number for columns on interest
+    # print('header{}:'.format(header))
+    header_colnum_init, header_colnum_lead, header_colnum_valid = \
+        header.index('INIT'), header.index('LEAD'), header.index(
+            'VALID')
+    header_colnum_alat, header_colnum_alon = \
+        header.index('ALAT'), header.index('ALON')
+    header_colnum_blat, header_colnum_blon = \
+        header.index('BLAT'), header.index('BLON')
+    for line in lines:
+        col = line.split()
+        init, lead, valid, alat, alon, blat, blon = \
+            col[header_colnum_init], col[header_colnum_lead], \
+            col[header_colnum_valid], col[header_colnum_alat], \
+            col[header_colnum_alon], col[header_colnum_blat], \
+            col[header_colnum_blon]
+
+        # integer division for both Python 2 and 3
+        lead_time = int(lead)
+        fcst_hr = lead_time // 10000
+
+        init_ymd_match = re.match(r'[0-9]{8}', init)
+        if init_ymd_match:
+            init_ymd = init_ymd_match.group(0)
+        else:
+            logger.WARN("RuntimeError raised")
+            raise RuntimeError(
+                'init time has unexpected format for YMD')
+
+        init_ymdh_match = re.match(r'[0-9|_]{11}', init)
+        if init_ymdh_match:
+            init_ymdh = init_ymdh_match.group(0)
+        else:
+            logger.WARN("RuntimeError raised")
+
+        valid_ymd_match = re.match(r'[0-9]{8}', valid)
+        if valid_ymd_match:
+            valid_ymd = valid_ymd_match.group(0)
+        else:
+            logger.WARN("RuntimeError raised")
+
+        valid_ymdh_match = re.match(r'[0-9|_]{11}', valid)
+        if valid_ymdh_match:
+            valid_ymdh = valid_ymdh_match.group(0)
+        else:
+            logger.WARN("RuntimeError raised")
+
+        lead_str = str(fcst_hr).zfill(3)
+        fcst_dir = os.path.join(model_data_dir, init_ymd)
+        init_ymdh_split = init_ymdh.split("_")
+        init_yyyymmddhh = "".join(init_ymdh_split)
+        anly_dir = os.path.join(model_data_dir, valid_ymd)
+        valid_ymdh_split = valid_ymdh.split("_")
+        valid_yyyymmddhh = "".join(valid_ymdh_split)
+
+        init_dt = datetime.datetime.strptime(init_yyyymmddhh, '%Y%m%d%H')
+        valid_dt = datetime.datetime.strptime(valid_yyyymmddhh, '%Y%m%d%H')
+        lead_seconds = int(fcst_hr * 3600)
+        # Create output filenames for regridding
+        # wgrib2 used to regrid.
+        # Create the filename for the regridded file, which is a
+        # grib2 file.
+        fcst_sts = \
+            StringSub(logger, config.getraw('filename_templates',
+                                        'FCST_EXTRACT_TILES_INPUT_TEMPLATE'),
+                      init=init_dt, lead=lead_seconds)
+
+        anly_sts = \
+            StringSub(logger, config.getraw('filename_templates',
+                                        'OBS_EXTRACT_TILES_INPUT_TEMPLATE'),
+                      valid=valid_dt, lead=lead_seconds)
+
+        fcst_file = fcst_sts.do_string_sub()
+        fcst_filename = os.path.join(fcst_dir, fcst_file)
+        anly_file = anly_sts.do_string_sub()
+        anly_filename = os.path.join(anly_dir, anly_file)
+
+        # Check if the forecast input file exists. If it doesn't
+        # exist, just log it
+        if util.file_exists(fcst_filename):
+            logger.debug("Forecast file: {}".format(fcst_filename))
+        else:
+            logger.warning("Can't find forecast file {}, continuing"\
+                           .format(fcst_filename))
+            continue
+
+        # Check if the analysis input file exists. If it doesn't
+        # exist, just log it.
+        if util.file_exists(anly_filename):
+            logger.debug("Analysis file: {}".format(anly_filename))
+
+        else:
+            logger.warning("Can't find analysis file {}, continuing"\
+                   .format(anly_filename))
+            continue
+
+        # Create the arguments used to perform regridding.
+        # NOTE: the base name
+        # is the same for both the fcst and anly filenames,
+        # so use either one to derive the base name that will
+        # be used to create the fcst_regridded_filename and
+        # anly_regridded_filename.
+        fcst_anly_base = os.path.basename(fcst_filename)
+
+        fcst_grid_spec = \
+            util.create_grid_specification_string(alat, alon,
+                                                  logger,
+                                                  config)
+        anly_grid_spec = \
+            util.create_grid_specification_string(blat, blon,
+                                                  logger,
+                                                  config)
+
+        nc_fcst_anly_base = re.sub("grb2", "nc", fcst_anly_base)
+        fcst_anly_base = nc_fcst_anly_base
+
+        tile_dir = os.path.join(out_dir, cur_init, cur_storm)
+        fcst_hr_str = str(fcst_hr).zfill(3)
+
+        fcst_regridded_filename = \
+            config.getstr('regex_pattern', 'FCST_EXTRACT_TILES_PREFIX') + \
+            fcst_hr_str + "_" + fcst_anly_base
+        fcst_regridded_file = os.path.join(tile_dir,
+                                           fcst_regridded_filename)
+        anly_regridded_filename = \
+            config.getstr('regex_pattern', 'OBS_EXTRACT_TILES_PREFIX') + \
+            fcst_hr_str + "_" + fcst_anly_base
+        anly_regridded_file = os.path.join(tile_dir,
+                                           anly_regridded_filename)
+
+        # Regrid the fcst file only if a fcst tile
+        # file does NOT already exist or if the overwrite flag is True.
+        # Create new gridded file for fcst tile
+        if util.file_exists(fcst_regridded_file) and not overwrite_flag:
+            msg = "Forecast tile file {} exists, skip regridding"\
+              .format(fcst_regridded_file)
+            logger.debug(msg)
+        else:
+            add_regrid_job(regrid_jobs, fcst_filename, fcst_grid_spec,
+                           fcst_regridded_file)
+
+        # Create new gridded file for anly tile
+        if util.file_exists(anly_regridded_file) and not overwrite_flag:
+            logger.debug("Analysis tile file: " + anly_regridded_file +
+                         " exists, skip regridding")
+        else:
+            add_regrid_job(regrid_jobs, anly_filename, anly_grid_spec,
+                           anly_regridded_file)
+
+    if create_now:
+        create_tiles(regrid_jobs, config)
+
+
+def retrieve_and_regrid_storms(filter_filename, cur_init, out_dir, tmp_dir,
+                               config):
+    """! Read a filter file once, splitting its rows by STORM_ID, and call
+         retrieve_and_regrid for each storm. If
+         EXTRACT_TILES_FILTER_IN_MEMORY is True, the rows are passed
+         directly to retrieve_and_regrid_lines instead of being written to a
+         temporary file in tmp_dir. The tiles of all storms are created
+         together so that tiles cut from the same input file can share a
+         single regrid_data_plane run.
+
+        Args:
+            @param filter_filename: filter file generated by tc_stat
+            @param cur_init: The current init time
+            @param out_dir: The directory where regridded output is saved
+            @param tmp_dir: The directory to write temporary files
+            @param config: config instance
+        Returns:
+            list of storm ids that were processed
+    """
+    logger = config.logger
+    in_memory = config.getbool('config', 'EXTRACT_TILES_FILTER_IN_MEMORY',
+                               False)
+    header, storm_lines = util.split_by_storm_id(filter_filename)
+    if not in_memory and storm_lines:
+        util.mkdir_p(tmp_dir)
+
+    regrid_jobs = {}
+    for cur_storm, lines in storm_lines.items():
+        logger.debug("Processing storm: " + cur_storm +
+                     " for file: " + filter_filename)
+        storm_output_dir = os.path.join(out_dir, cur_init, cur_storm)
+        util.mkdir_p(storm_output_dir)
+
+        if in_memory:
+            retrieve_and_regrid_lines(header, lines, cur_init, cur_storm,
+                                      out_dir, config, regrid_jobs)
+            continue
+
+        tmp_filename = os.path.join(tmp_dir,
+                                    "filter_" + cur_init + "_" + cur_storm)
+        with open(tmp_filename, "w") as tmp_file:
+            tmp_file.write(header)
+            tmp_file.writelines(lines)
+
+        retrieve_and_regrid(tmp_filename, cur_init, cur_storm, out_dir,
+                            config, regrid_jobs)
+
+        # remove tmp file
+        os.remove(tmp_filename)
+
+    create_tiles(regrid_jobs, config)
+
+    return list(storm_lines.keys())
+
+
+def add_regrid_job(regrid_jobs, input_file, grid_spec, output_file):
+    """! Add a tile to create to the list of tiles for its input file,
+         skipping tiles that have already been added.
+
+        Args:
+            @param regrid_jobs: dictionary with input file as the key and a
+                                list of (grid spec, output file) tuples as the
+                                value
+            @param input_file: file to cut the tile from
+            @param grid_spec: latlon grid specification string of the tile
+            @param output_file: file to write the tile to
+        Returns:
+            None
+    """
+    tiles = regrid_jobs.setdefault(input_file, [])
+    if (grid_spec, output_file) not in tiles:
+        tiles.append((grid_spec, output_file))
+
+
+def create_tiles(regrid_jobs, config):
+    """! Create all of the tiles that were added with add_regrid_job.
+
+        Args:
+            @param regrid_jobs: dictionary with input file as the key and a
+                                list of (grid spec, output file) tuples as the
+                                value
+            @param config: config instance
+        Returns:
+            None
+    """
+    if not regrid_jobs:
+        return
 
+    # rdp=, was added when logging capability was added to capture
+    # all MET output to log files. It is a temporary work around
+    # to get logging up and running as needed.
+    # It is being used to call the run_cmd method, which runs the cmd
+    # and redirects logging based on the conf settings.
+    # Instantiate a RegridDataPlaneWrapper
+    rdp = RegridDataPlaneWrapper(config, config.logger)
+    met_bin_dir = config.getdir('MET_BIN_DIR', '')
+    regrid_data_plane_exe = os.path.join(met_bin_dir,
+                                         'regrid_data_plane')
+
+    # Perform regridding on the records of interest. The variable info is
+    # the same for every tile, so only read it once
+    var_level_string = retrieve_var_info(config)
+    run_regrid_jobs(regrid_jobs, regrid_data_plane_exe, var_level_string,
+                    rdp, config)
+
+
+def run_regrid_jobs(regrid_jobs, regrid_data_plane_exe, var_level_string,
+                    rdp, config):
+    """! Run regrid_data_plane to create each tile. If more than one tile is
+         cut from an input file and the tiles line up on the same lat/lon
+         grid, regrid_data_plane is run once to regrid the input file to a
+         grid that covers all of the tiles and each tile is cut out of that
+         file. regrid_data_plane only accepts one output grid, so otherwise
+         it is run once for each tile. Input files are processed in parallel
+         using EXTRACT_TILES_REGRID_PROCESSES concurrent regrid_data_plane
+         processes. The output of each input file's commands is written to
+         a temporary log file that is appended to the log in input order
+         after the commands finish so output of different files is not mixed.
+
+        Args:
+            @param regrid_jobs: dictionary with input file as the key and a
+                                list of (grid spec, output file) tuples as the
+                                value
+            @param regrid_data_plane_exe: path to regrid_data_plane
+            @param var_level_string: -field arguments from retrieve_var_info
+            @param rdp: RegridDataPlaneWrapper used to run the commands
+            @param config: config instance
+        Returns:
+            None
+    """
+    logger = config.logger
+    tmp_dir = config.getdir('TMP_DIR')
+
+    def regrid_input_file(input_file, log_file=None):
+        """!Create all tiles for an input file, writing command output to
+            log_file if it is set"""
+        # use separate command runner for each worker
+        cmdrunner = CommandRunner(config, logger=logger,
+                                  verbose=rdp.cmdrunner.verbose)
+
+        def regrid(grid_spec, output_file):
+            # Perform regridding using MET Tool regrid_data_plane
+            cmd_list = [regrid_data_plane_exe, ' ',
+                        input_file, ' ',
+                        grid_spec, ' ',
+                        output_file, ' ',
+                        var_level_string,
+                        ' -method NEAREST ']
+            regrid_cmd = ''.join(cmd_list)
+
+            # Since not using the CommandBuilder to build the cmd,
+            # add the met verbosity level to the
+            # MET cmd created before we run the command.
+            regrid_cmd = cmdrunner.insert_metverbosity_opt(regrid_cmd)
+            ret, _ = cmdrunner.run_cmd(regrid_cmd, env=None,
+                                       app_name=rdp.app_name,
+                                       log_file=log_file)
+            logger.debug("on file:" + output_file)
+            return ret == 0 and os.path.exists(output_file)
+
+        tiles = regrid_jobs[input_file]
+        union_spec = None
+        if len(tiles) > 1:
+            union_spec = get_union_grid_spec([tile[0] for tile in tiles])
+
+        if union_spec is None:
+            for grid_spec, output_file in tiles:
+                regrid(grid_spec, output_file)
+            return
+
+        util.mkdir_p(tmp_dir)
+        union_dir = tempfile.mkdtemp(prefix='tiles_', dir=tmp_dir)
+        union_file = os.path.join(union_dir, 'tiles.nc')
+        try:
+            union_ok = regrid(union_spec, union_file)
+            for grid_spec, output_file in tiles:
+                try:
+                    cut = union_ok and cut_tile(union_file, grid_spec,
+                                                output_file)
+                except OSError as err:
+                    logger.warning("Could not cut tile {} from {}: {}"
+                                   .format(output_file, union_file, err))
+                    cut = False
+
+                if cut:
+                    logger.debug("Cut tile {} from {}"
+                                 .format(output_file, input_file))
+                    continue
+
+                regrid(grid_spec, output_file)
+        finally:
+            shutil.rmtree(union_dir, ignore_errors=True)
+
+    num_procs = config.getint('config', 'EXTRACT_TILES_REGRID_PROCESSES', 1)
+    if num_procs <= 1 or len(regrid_jobs) == 1:
+        for input_file in regrid_jobs:
+            regrid_input_file(input_file)
+        return
+
+    log_dest = rdp.cmdrunner.cmdlog_destination(cmdlog=rdp.app_name+'.log')
+
+    # the work is done by regrid_data_plane, so threads are sufficient to
+    # keep num_procs processes running at a time
+    with ThreadPoolExecutor(max_workers=num_procs) as executor:
+        jobs = []
+        for input_file in regrid_jobs:
+            log_file = None
+            if log_dest:
+                util.mkdir_p(tmp_dir)
+                file_handle, log_file = \
+                    tempfile.mkstemp(prefix='regrid_', suffix='.log',
+                                     dir=tmp_dir)
+                os.close(file_handle)
+
+            jobs.append((executor.submit(regrid_input_file, input_file,
+                                         log_file),
+                         log_file))
+
+        # append output of each job to the log in the order of the inputs
+        for future, log_file in jobs:
+            try:
+                future.result()
+            finally:
+                if log_file:
+                    with open(log_file, 'r') as job_log_handle, \
+                            open(log_dest, 'a+') as log_file_handle:
+                        shutil.copyfileobj(job_log_handle, log_file_handle)
+                    os.remove(log_file)
+
+
+def parse_grid_spec(grid_spec):
+    """! Read the values from a latlon grid specification string created by
+         util.create_grid_specification_string.
+
+        Args:
+            @param grid_spec: string with format
+                              "latlon Nx Ny lat_ll lon_ll delta_lat delta_lon"
+        Returns:
+            tuple of (Nx, Ny, lat_ll, lon_ll, delta_lat, delta_lon) or None
+            if the string could not be read
+    """
+    values = grid_spec.strip().strip('"').split()
+    if len(values) != 7 or values[0] != 'latlon':
+        return None
+
+    try:
+        return (int(values[1]), int(values[2]), float(values[3]),
+                float(values[4]), float(values[5]), float(values[6]))
+    except ValueError:
+        return None
+
+
+def get_grid_offset(value, start, delta):
+    """! Get the number of grid points between start and value.
+
+        Args:
+            @param value: lat or lon of the grid point
+            @param start: lat or lon of the first grid point
+            @param delta: distance between grid points
+        Returns:
+            number of grid points or None if value is not on the grid
+    """
+    steps = (value - start) / delta
+    if abs(steps - round(steps)) > GRID_TOLERANCE:
+        return None
+    return int(round(steps))
+
+
+def get_union_grid_spec(grid_specs):
+    """! Get a latlon grid specification that covers all of the tiles. The
+         tiles must be the same size and resolution and their grid points
+         must line up so that each tile can be cut out of the larger grid
+         without changing any values.
+
+        Args:
+            @param grid_specs: list of grid specification strings
+        Returns:
+            grid specification string or None if the tiles cannot share a
+            grid or if the shared grid is larger than the tiles combined
+    """
+    grids = [parse_grid_spec(grid_spec) for grid_spec in grid_specs]
+    if None in grids:
+        return None
+
+    nx, ny, _, _, dlat, dlon = grids[0]
+    if any(grid[0] != nx or grid[1] != ny or grid[4] != dlat or
+           grid[5] != dlon for grid in grids):
+        return None
+
+    lat_ll = min(grid[2] for grid in grids)
+    lon_ll = min(grid[3] for grid in grids)
+    union_nx = union_ny = 0
+    for grid in grids:
+        x_offset = get_grid_offset(grid[3], lon_ll, dlon)
+        y_offset = get_grid_offset(grid[2], lat_ll, dlat)
+        if x_offset is None or y_offset is None:
+            return None
+        union_nx = max(union_nx, x_offset + nx)
+        union_ny = max(union_ny, y_offset + ny)
+
+    # tiles that are far apart are faster to regrid separately
+    if union_nx * union_ny > len(grids) * nx * ny:
+        return None
+
+    return '"latlon {} {} {} {} {} {}"'.format(union_nx, union_ny,
+                                              lat_ll, lon_ll, dlat, dlon)
+
+
+def get_tile_slice(values, start, count, delta, period=None):
+    """! Find the grid points of a tile in the lat or lon values of a grid.
+
+        Args:
+            @param values: 1D array of lat or lon values of the grid
+            @param start: lat or lon of the first grid point of the tile
+            @param count: number of grid points in the tile
+            @param delta: distance between grid points
+            @param period: if set, compare values modulo period, i.e. 360 for
+                           longitude
+        Returns:
+            slice of the tile grid points or None if they were not found
+    """
+    offsets = np.asarray(values, dtype=float) - start
+    if period:
+        offsets = np.mod(offsets + delta / 2., period) - delta / 2.
+
+    steps = offsets / delta
+    on_tile = ((np.abs(steps - np.round(steps)) <= GRID_TOLERANCE) &
+               (np.round(steps) >= 0) & (np.round(steps) < count))
+    indices = np.flatnonzero(on_tile)
+    if len(indices) != count or np.any(np.diff(indices) != 1):
+        return None
+
+    return slice(int(indices[0]), int(indices[-1]) + 1)
+
+
+def set_grid_attribute(dataset, name, value):
+    """! Replace the number in a MET grid attribute, i.e. lat_ll is
+         "10.000000 degrees_north", keeping the units that follow it.
+
+        Args:
+            @param dataset: netCDF4 Dataset to modify
+            @param name: name of the global attribute
+            @param value: formatted value to set
+        Returns:
+            None
+    """
+    if name not in dataset.ncattrs():
+        return
+
+    units = str(dataset.getncattr(name)).split(' ', 1)[1:]
+    dataset.setncattr(name, ' '.join([value] + units))
+
+
+def cut_tile(grid_file, grid_spec, output_file):
+    """! Write the part of a NetCDF file created by regrid_data_plane that is
+         covered by a tile to a new file. The lat and lon dimensions of every
+         variable are cut down to the tile and the grid attributes are
+         updated to describe the tile.
+
+        Args:
+            @param grid_file: regrid_data_plane output that covers the tile
+            @param grid_spec: latlon grid specification string of the tile
+            @param output_file: file to write the tile to
+        Returns:
+            True if the tile was written, False if the tile could not be
+            found in grid_file
+    """
+    grid = parse_grid_spec(grid_spec)
+    if grid is None:
+        return False
+    nx, ny, lat_ll, lon_ll, dlat, dlon = grid
+
+    with netCDF4.Dataset(grid_file, 'r') as src:
+        if not all(name in src.dimensions and name in src.variables
+                   for name in ('lat', 'lon')):
+            return False
+
+        lats = src.variables['lat'][:]
+        lons = src.variables['lon'][:]
+        if lats.ndim == 2:
+            lats = lats[:, 0]
+            lons = lons[0, :]
+
+        tile_slices = {
+            'lat': get_tile_slice(lats, lat_ll, ny, dlat),
+            'lon': get_tile_slice(lons, lon_ll, nx, dlon, period=360.),
+        }
+        if None in tile_slices.values():
+            return False
+
+        src.set_auto_maskandscale(False)
+        with netCDF4.Dataset(output_file, 'w',
+                             format=src.data_model) as dst:
+            dst.setncatts(src.__dict__)
+            set_grid_attribute(dst, 'lat_ll', '{:f}'.format(lat_ll))
+            set_grid_attribute(dst, 'lon_ll', '{:f}'.format(lon_ll))
+            set_grid_attribute(dst, 'Nlat', str(ny))
+            set_grid_attribute(dst, 'Nlon', str(nx))
+
+            for name, dimension in src.dimensions.items():
+                if name in tile_slices:
+                    size = ny if name == 'lat' else nx
+                elif dimension.isunlimited():
+                    size = None
+                else:
+                    size = len(dimension)
+                dst.createDimension(name, size)
+
+            dst.set_auto_maskandscale(False)
+            for name, variable in src.variables.items():
+                attributes = variable.__dict__
+                out_var = dst.createVariable(
+                    name, variable.datatype, variable.dimensions,
+                    fill_value=attributes.get('_FillValue'))
+                out_var.setncatts({key: value
+                                   for key, value in attributes.items()
+                                   if key != '_FillValue'})
+                index = tuple(tile_slices.get(dim, slice(None))
+                              for dim in variable.dimensions)
+                out_var[:] = variable[index]
+
+    return True
 
 
 def retrieve_var_info(config):
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+
+"""
+Program Name: file_catalog.py
+Contact(s): George McCabe
+Abstract: Index of files under a directory keyed by time information
+ extracted from their paths using a filename template
+History Log:  Initial version
+Usage: Called by CommandBuilder.find_file_in_window
+Parameters: None
+Input Files: N/A
+Output Files: N/A
+"""
+
+import os
+from datetime import datetime
+from bisect import bisect_left, bisect_right
+
+from string_template_substitution import StringExtract
+
+'''!@namespace file_catalog
+@brief Keeps a catalog of the files under an input directory that match a
+filename template. Each filename is parsed once and stored in a list sorted by
+valid time so files within a time window can be found with a binary search.
+Before each search, the modification time of each directory is checked and
+only directories that have changed are read again, so new files that arrive
+while METplus is running are still found.
+@code{.sh}
+Cannot be called directly. These are helper functions
+to be used in other METplus wrappers
+@endcode
+'''
+
+# catalogs that have already been created, keyed by directory and template
+_CATALOGS = {}
+
+def get_file_catalog(data_dir, template, logger=None):
+    """!Get catalog for directory and template, creating it if it has not
+        been created yet
+        Args:
+            @param data_dir directory to search for files
+            @param template filename template relative to data_dir
+            @param logger logger to pass to StringExtract
+            @returns FileCatalog object
+    """
+    key = (data_dir, template)
+    catalog = _CATALOGS.get(key)
+    if catalog is None:
+        catalog = FileCatalog(data_dir, template, logger)
+        _CATALOGS[key] = catalog
+    else:
+        catalog.logger = logger
+
+    return catalog
+
+def clear_file_catalogs():
+    """!Remove all catalogs so files will be read again on the next search"""
+    _CATALOGS.clear()
+
+class FileCatalog(object):
+    """!Files under a directory that match a template sorted by valid time"""
+    def __init__(self, data_dir, template, logger=None):
+        self.data_dir = data_dir
+        self.template = template
+        self.logger = logger
+
+        # modification time, subdirectory names, and matching file info
+        # for each directory that has been read, keyed by directory path
+        self._dir_info = {}
+
+        # valid times and file info sorted by valid time for bisect
+        self._valid_times = []
+        self._files = []
+
+    def refresh(self):
+        """!Read any directories that were added or modified since the last
+            refresh and rebuild the sorted index if anything changed
+            @returns True if the index changed, False if not
+        """
+        ordered_files = []
+        seen_dirs = set()
+        changed = self._scan_dir(self.data_dir, ordered_files, seen_dirs)
+
+        # remove directories that no longer exist
+        for removed_dir in set(self._dir_info) - seen_dirs:
+            del self._dir_info[removed_dir]
+            changed = True
+
+        if not changed:
+            return False
+
+        # sort by valid time, keeping files with the same valid time in the
+        # order they were found
+        indexed = sorted(((file_info[0], order, file_info)
+                          for order, file_info in enumerate(ordered_files)),
+                         key=lambda item: item[:2])
+        self._valid_times = [item[0] for item in indexed]
+        self._files = [(item[1],) + item[2] for item in indexed]
+        return True
+
+    def _scan_dir(self, dirpath, ordered_files, seen_dirs):
+        """!Read directory if it is new or has been modified, then check its
+            subdirectories. Files are added to ordered_files in the same order
+            that os.walk would find them.
+            @returns True if any directory was read, False if not
+        """
+        try:
+            mtime = os.stat(dirpath).st_mtime_ns
+        except OSError:
+            return False
+
+        changed = False
+        info = self._dir_info.get(dirpath)
+        if info is None or info[0] != mtime:
+            info = self._read_dir(dirpath, mtime)
+            if info is None:
+                return False
+
+            self._dir_info[dirpath] = info
+            changed = True
+
+        seen_dirs.add(dirpath)
+        ordered_files.extend(info[2])
+        for subdir in info[1]:
+            if self._scan_dir(os.path.join(dirpath, subdir),
+                              ordered_files, seen_dirs):
+                changed = True
+
+        return changed
+
+    def _read_dir(self, dirpath, mtime):
+        """!List directory and extract time info from each file
+            @returns tuple of modification time, list of subdirectory names,
+             and list of (valid time, full path, time info) for each file that
+             matches the template, or None if directory could not be read
+        """
+        subdirs = []
+        filenames = []
+        try:
+            with os.scandir(dirpath) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+
+                    if not is_dir:
+                        filenames.append(entry.name)
+                    # do not follow links to directories, like os.walk
+                    elif not entry.is_symlink():
+                        subdirs.append(entry.name)
+        except OSError:
+            return None
+
+        fullpaths = [os.path.join(dirpath, filename)
+                     for filename in sorted(filenames)]
+
+        # remove input data directory to get relative paths and extract time
+        # information from all of them at once using template
+        rel_paths = [fullpath.replace(f'{self.data_dir}/', "")
+                     for fullpath in fullpaths]
+        time_infos = StringExtract(self.logger, self.template).extract_many(rel_paths)
+
+        files = []
+        for fullpath, time_info in zip(fullpaths, time_infos):
+            if time_info is None:
+                continue
+
+            # skip if could not extract valid time
+            valid_time = time_info.get('valid')
+            if not isinstance(valid_time, datetime):
+                continue
+
+            files.append((valid_time, fullpath, time_info))
+
+        return mtime, subdirs, files
+
+    def find_files(self, begin, end):
+        """!Get files with a valid time between begin and end (inclusive)
+            Args:
+                @param begin datetime object of earliest valid time to allow
+                @param end datetime object of latest valid time to allow
+                @returns list of (valid time, full path, time info) tuples in
+                 the order that the files were found in the directory tree
+        """
+        self.refresh()
+        lower_index = bisect_left(self._valid_times, begin)
+        upper_index = bisect_right(self._valid_times, end)
+        matches = sorted(self._files[lower_index:upper_index],
+                         key=lambda item: item[0])
+        return [match[1:] for match in matches]
@@ -22,6 +22,7 @@ import re
 import subprocess
 import datetime
 import itertools
+import plot_service
 from command_builder import CommandBuilder
 
 class MakePlotsWrapper(CommandBuilder):
@@ -31,10 +32,38 @@ class MakePlotsWrapper(CommandBuilder):
         self.app_path = 'python'
         self.app_name = 'make_plots'
         super().__init__(config, logger)
+        # worker process that runs the plotting scripts
+        # if MAKE_PLOTS_IN_PROCESS is True
+        self.plot_service = None
         
     def set_plotting_script(self, plotting_script_path):
         self.plotting_script = plotting_script_path
 
+    def run_plotting_script(self):
+        """! Run the plotting script set with set_plotting_script
+             in the plot service worker process if
+             MAKE_PLOTS_IN_PROCESS is True or as a separate
+             command if not
+             
+             Args:
+ 
+             Returns:
+        """
+        if self.plot_service is None:
+            self.build()
+            return
+        self.logger.info("Running plotting script in process: "
+                         +self.plotting_script)
+        if self.config.getbool('config', 'DO_NOT_RUN_EXE', False):
+            self.logger.info("Not running script because "
+                             +"DO_NOT_RUN_EXE is True")
+            return
+        ret, error_msg = self.plot_service.run(self.plotting_script,
+                                               dict(self.env))
+        if ret != 0:
+            self.log_error("Plotting script "+self.plotting_script+" "
+                           +"failed: "+error_msg)
+
     def get_command(self):
 
         cmd = self.app_path + " "
@@ -67,6 +96,13 @@ class MakePlotsWrapper(CommandBuilder):
         c_dict['INPUT_BASE_DIR'] = self.config.getdir('MAKE_PLOTS_INPUT_DIR')
         c_dict['OUTPUT_BASE_DIR'] = self.config.getdir('MAKE_PLOTS_OUTPUT_DIR')
         c_dict['SCRIPTS_BASE_DIR'] = self.config.getdir('MAKE_PLOTS_SCRIPTS_DIR')
+        c_dict['IN_PROCESS'] = self.config.getbool('config',
+                                                   'MAKE_PLOTS_IN_PROCESS',
+                                                   False)
+        c_dict['STAT_CACHE_DIR'] = self.config.getdir(
+            'MAKE_PLOTS_STAT_CACHE_DIR',
+            os.path.join(c_dict['OUTPUT_BASE_DIR'], 'stat_cache')
+        )
         c_dict['DATE_TYPE'] = self.config.getstr('config', 'DATE_TYPE')
         c_dict['VALID_BEG'] = self.config.getstr('config', 'VALID_BEG', '')
         c_dict['VALID_END'] = self.config.getstr('config', 'VALID_END', '')
@@ -320,7 +356,7 @@ class MakePlotsWrapper(CommandBuilder):
                         "make_plot could not generate command"
                     )
                     return
-                self.build()
+                self.run_plotting_script()
                 self.clear()
 
     def create_plots_grid2grid_anom(self, runtime_settings_dict_list):
@@ -357,7 +393,7 @@ class MakePlotsWrapper(CommandBuilder):
                         "make_plot could not generate command"
                     )
                     return
-                self.build()
+                self.run_plotting_script()
                 self.clear()
 
     def create_plots_grid2grid_sfc(self, runtime_settings_dict_list):
@@ -392,7 +428,7 @@ class MakePlotsWrapper(CommandBuilder):
                         "make_plot could not generate command"
                     )
                     return
-                self.build()
+                self.run_plotting_script()
                 self.clear()
 
     def create_plots_grid2obs_upper_air(self, runtime_settings_dict_list):
@@ -430,7 +466,7 @@ class MakePlotsWrapper(CommandBuilder):
                         "make_plot could not generate command"
                     )
                     return
-                self.build()
+                self.run_plotting_script()
                 self.clear()
 
     def create_plots_grid2obs_conus_sfc(self, runtime_settings_dict_list):
@@ -465,7 +501,7 @@ class MakePlotsWrapper(CommandBuilder):
                         "make_plot could not generate command"
                     )
                     return
-                self.build()
+                self.run_plotting_script()
                 self.clear()
 
     def create_plots_precip(self, runtime_settings_dict_list):
@@ -504,7 +540,7 @@ class MakePlotsWrapper(CommandBuilder):
                         "make_plot could not generate command"
                     )
                     return
-                self.build()
+                self.run_plotting_script()
                 self.clear()
 
     def create_plots_user(self, runtime_settings_dict_list, scripts_to_run):
@@ -536,7 +572,7 @@ class MakePlotsWrapper(CommandBuilder):
                         "make_plot could not generate command"
                     )
                     return
-                self.build()
+                self.run_plotting_script()
                 self.clear()
 
     def create_plots(self, verif_case, verif_type):
@@ -916,7 +952,8 @@ class MakePlotsWrapper(CommandBuilder):
                 'VERIF_CASE', 'VERIF_TYPE', 'INPUT_BASE_DIR', 'OUTPUT_BASE_DIR',
                 'SCRIPTS_BASE_DIR', 'DATE_TYPE', 'VALID_BEG', 'VALID_END',
                 'INIT_BEG', 'INIT_END', 'AVERAGE_METHOD', 'CI_METHOD',
-                'VERIF_GRID','EVENT_EQUALIZATION', 'LOG_METPLUS', 'LOG_LEVEL'
+                'VERIF_GRID','EVENT_EQUALIZATION', 'LOG_METPLUS', 'LOG_LEVEL',
+                'STAT_CACHE_DIR'
             ]
             for key in add_from_c_dict_list:
                 runtime_setup_dict[key] = [self.c_dict[key]]
@@ -1044,8 +1081,15 @@ class MakePlotsWrapper(CommandBuilder):
                                   +"MAKE_PLOTS_VERIF_TYPE, or "
                                   +"MAKE_PLOTS_USER_SCRIPT_LIST")
         if run_make_plots:
-            self.create_plots(self.c_dict['VERIF_CASE'],
-                              self.c_dict['VERIF_TYPE'])
+            if self.c_dict['IN_PROCESS']:
+                self.plot_service = plot_service.PlotService(self.logger)
+            try:
+                self.create_plots(self.c_dict['VERIF_CASE'],
+                                  self.c_dict['VERIF_TYPE'])
+            finally:
+                if self.plot_service is not None:
+                    self.plot_service.close()
+                    self.plot_service = None
         else:
             exit(1)
 
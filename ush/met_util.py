@@ -14,6 +14,10 @@ import bz2
 import zipfile
 import struct
 import getpass
+import json
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from os import stat
 from pwd import getpwuid
 from csv import reader
@@ -25,6 +29,10 @@ from string_template_substitution import StringExtract
 from string_template_substitution import get_tags
 from gempak_to_cf_wrapper import GempakToCFWrapper
 import time_util
+import task_scheduler
+import resource_usage
+import preflight
+import stream_runner
 
 # for run stand alone
 import produtil.setup
@@ -39,6 +47,22 @@ import config_metplus
 # list of compression extensions that are handled by METplus
 VALID_EXTENSIONS = ['.gz', '.bz2', '.zip']
 
+# number of bytes to read at a time when uncompressing files
+DECOMPRESS_CHUNK_SIZE = 16 * 1024 * 1024
+
+# directory under STAGING_DIR that holds info about the compressed file
+# that each staged file was created from
+STAGING_CACHE_INFO_DIR = 'staging_cache_info'
+
+# number of seconds that a staged file is protected from removal after it is
+# used if it is not released by release_staged_files, i.e. if METplus stops
+STAGING_IN_USE_SECONDS = 86400
+
+# staging cache info files of the staged files that this process used for
+# commands that may not have finished yet
+_STAGED_IN_USE = set()
+_STAGED_IN_USE_LOCK = threading.Lock()
+
 baseinputconfs = ['metplus_config/metplus_system.conf',
                   'metplus_config/metplus_data.conf',
                   'metplus_config/metplus_runtime.conf',
@@ -128,6 +152,14 @@ def pre_run_setup(filename, app_name):
 
     config.env = os.environ.copy()
 
+    # count config lookups made by each wrapper if requested
+    config.count_lookups = config.getbool('config', 'LOG_CONFIG_LOOKUP_COUNTS',
+                                          False)
+
+    # resolve all config items once so later lookups use the stored values
+    num_resolved = config.freeze()
+    logger.debug(f"Resolved {num_resolved} config items")
+
     return config
 
 def run_metplus(config, process_list):
@@ -137,9 +169,10 @@ def run_metplus(config, process_list):
         for item in process_list:
             try:
                 logger = config.log(item)
-                command_builder = \
-                    getattr(sys.modules['__main__'],
-                            item + "Wrapper")(config, logger)
+                with config.lookup_owner(item):
+                    command_builder = \
+                        getattr(sys.modules['__main__'],
+                                item + "Wrapper")(config, logger)
                 # if Usage specified in PROCESS_LIST, print usage and exit
                 if item == 'Usage':
                     command_builder.run_all_times()
@@ -162,18 +195,36 @@ def run_metplus(config, process_list):
             logger.info("Refer to ERROR messages above to resolve issues.")
             return 1
 
+        # stream mode checks for input files while it runs
+        stream_mode = config.getbool('config', 'STREAM_MODE', False)
+        if not stream_mode:
+            # check that input files exist for all run times before running
+            preflight.run_preflight_check(config, processes)
+
         loop_order = config.getstr('config', 'LOOP_ORDER', '')
 
-        if loop_order == "processes":
+        # run each time as its input files arrive instead of using LOOP_ORDER
+        if stream_mode:
+            if not stream_runner.run_stream(config, processes):
+                return 1
+
+        elif loop_order == "processes":
             for process in processes:
-                process.run_all_times()
+                with config.lookup_owner(get_process_name(process)):
+                    process.run_all_times()
+                    process.wait_for_commands()
+                    release_staged_files(config)
 
         elif loop_order == "times":
             loop_over_times_and_call(config, processes)
 
+        elif loop_order == "tasks":
+            if not task_scheduler.run_tasks(config, processes):
+                return 1
+
         else:
             logger.error("Invalid LOOP_ORDER defined. " + \
-                         "Options are processes, times")
+                         "Options are processes, times, tasks")
             return 1
 
        # compute total number of errors that occurred and output results
@@ -202,6 +253,9 @@ def post_run_cleanup(config, app_name, total_errors):
         logger.info("Scrubbing staging dir: %s", staging_dir)
         shutil.rmtree(staging_dir)
 
+    log_config_lookup_counts(config)
+    resource_usage.log_resource_usage_summary(config)
+
     # rewrite final conf so it contains all of the default values used
     write_final_conf(config, logger)
 
@@ -223,6 +277,25 @@ def post_run_cleanup(config, app_name, total_errors):
         logger.info(f"Check the log file for more information: {config.getstr('config', 'LOG_METPLUS')}")
 
 
+def get_process_name(process):
+    """!Get name of wrapper object without Wrapper, i.e. GridStat"""
+    return process.__class__.__name__.replace('Wrapper', '')
+
+def log_config_lookup_counts(config):
+    """!Log the number of config lookups made by each wrapper and the time
+        spent in them if LOG_CONFIG_LOOKUP_COUNTS is True. Lookups made in
+        separate worker processes are not included.
+        Args:
+            @param config METplusConfig object
+    """
+    if not config.count_lookups:
+        return
+
+    config.logger.info("Config lookups by wrapper:")
+    for owner, (count, seconds) in sorted(config.lookup_counts.items(),
+                                          key=lambda item: -item[1][0]):
+        config.logger.info(f"  {owner}: {count} lookups in {seconds:.3f} seconds")
+
 def check_for_deprecated_config(conf):
     """!Checks user configuration files and reports errors or warnings if any deprecated variable
         is found. If an alternate variable name can be suggested, add it to the 'alt' section
@@ -819,42 +892,150 @@ def get_start_end_interval_times(config):
 
     return start_time, end_time, time_interval
 
-def loop_over_times_and_call(config, processes):
-    """!Loop over all run times and call wrappers listed in config"""
-    clock_time_obj = datetime.datetime.strptime(config.getstr('config', 'CLOCK_TIME'),
-                                                '%Y%m%d%H%M%S')
-    use_init = is_loop_by_init(config)
-
+def get_run_times(config):
+    """!Get list of all init or valid times to process from config
+        Args:
+            @param config METplusConfig object
+            @returns list of datetime objects or None if time information
+             could not be read from the config
+    """
     # get start time, end time, and time interval from config
     loop_time, end_time, time_interval = get_start_end_interval_times(config) or (None, None, None)
     if not loop_time:
         config.logger.error("Could not get [INIT/VALID] time information from configuration file")
         return None
 
+    run_times = []
     while loop_time <= end_time:
-        run_time = loop_time.strftime("%Y%m%d%H%M")
-        config.logger.info("****************************************")
-        config.logger.info("* Running METplus")
-        if use_init:
-            config.logger.info("*  at init time: " + run_time)
-        else:
-            config.logger.info("*  at valid time: " + run_time)
-        config.logger.info("****************************************")
-        if not isinstance(processes, list):
-            processes = [processes]
-        for process in processes:
-            input_dict = {}
-            input_dict['now'] = clock_time_obj
+        run_times.append(loop_time)
+        loop_time += time_interval
 
-            if use_init:
-                input_dict['init'] = loop_time
-            else:
-                input_dict['valid'] = loop_time
+    return run_times
+
+def loop_over_times_and_call(config, processes):
+    """!Loop over all run times and call wrappers listed in config.
+        If RUN_PARALLEL_TIMES is greater than 1, independent run times are
+        dispatched to a pool of worker processes instead of run serially"""
+    run_times = get_run_times(config)
+    if run_times is None:
+        return None
 
-            process.clear()
-            process.run_at_time(input_dict)
+    if not isinstance(processes, list):
+        processes = [processes]
 
-        loop_time += time_interval
+    num_parallel = config.getint('config', 'RUN_PARALLEL_TIMES', 1)
+    if num_parallel > 1 and len(run_times) > 1:
+        run_times_in_parallel(config, processes, run_times, num_parallel)
+        return
+
+    for run_time in run_times:
+        run_processes_at_time(config, processes, run_time)
+
+def run_processes_at_time(config, processes, loop_time):
+    """!Call each wrapper in processes for a single init or valid time
+        Args:
+            @param config METplusConfig object
+            @param processes list of wrapper objects to run
+            @param loop_time datetime object of init or valid time to process
+    """
+    log_run_time(config, loop_time)
+    for process in processes:
+        run_process_at_time(config, process, loop_time)
+
+def log_run_time(config, loop_time):
+    """!Output banner to log for the init or valid time being processed"""
+    run_time = loop_time.strftime("%Y%m%d%H%M")
+    config.logger.info("****************************************")
+    config.logger.info("* Running METplus")
+    if is_loop_by_init(config):
+        config.logger.info("*  at init time: " + run_time)
+    else:
+        config.logger.info("*  at valid time: " + run_time)
+    config.logger.info("****************************************")
+
+def run_process_at_time(config, process, loop_time):
+    """!Call a single wrapper for a single init or valid time"""
+    clock_time_obj = datetime.datetime.strptime(config.getstr('config', 'CLOCK_TIME'),
+                                                '%Y%m%d%H%M%S')
+    input_dict = {}
+    input_dict['now'] = clock_time_obj
+
+    if is_loop_by_init(config):
+        input_dict['init'] = loop_time
+    else:
+        input_dict['valid'] = loop_time
+
+    with config.lookup_owner(get_process_name(process)):
+        process.clear()
+
+        # wrappers add the forecast lead to input_dict as they process each
+        # lead, so the current lead is available when commands are run
+        process.c_dict['CURRENT_TIME_INFO'] = input_dict
+        process.run_at_time(input_dict)
+
+        # wait for commands that were started in the background so output
+        # is available to the next process
+        process.wait_for_commands()
+        release_staged_files(config)
+
+# config and wrapper objects inherited by forked worker processes
+_PARALLEL_TIMES_STATE = None
+
+def _run_processes_at_time_worker(loop_time):
+    """!Run all wrappers for a single time inside a worker process. Each
+        worker has its own copy of the wrapper objects (including their c_dict
+        and env) so the state set while building commands is not shared.
+        Args:
+            @param loop_time datetime object of init or valid time to process
+            @returns list containing the number of errors that occurred in
+             each wrapper while processing the run time
+    """
+    config, processes = _PARALLEL_TIMES_STATE
+    # each worker process can handle more than one run time,
+    # so only report errors that occurred for this run time
+    errors_before = [process.errors for process in processes]
+    log_run_time(config, loop_time)
+    for process in processes:
+        try:
+            run_process_at_time(config, process, loop_time)
+        except (Exception, SystemExit):
+            process_name = process.__class__.__name__.replace('Wrapper', '')
+            config.logger.exception(f"{process_name} failed at "
+                                    f"{loop_time.strftime('%Y%m%d%H%M')}")
+            process.errors += 1
+
+    return [process.errors - before
+            for process, before in zip(processes, errors_before)]
+
+def run_times_in_parallel(config, processes, run_times, num_parallel):
+    """!Dispatch each run time to a pool of worker processes. The number of
+        errors from each wrapper are added to the errors value of the wrapper
+        objects in this process so that they are reported by run_metplus.
+        Args:
+            @param config METplusConfig object
+            @param processes list of wrapper objects to run
+            @param run_times list of datetime objects to process
+            @param num_parallel maximum number of worker processes
+    """
+    global _PARALLEL_TIMES_STATE
+
+    num_workers = min(num_parallel, len(run_times))
+    config.logger.info(f"Running {len(run_times)} run times using "
+                       f"{num_workers} parallel processes")
+
+    _PARALLEL_TIMES_STATE = (config, processes)
+    try:
+        # fork so each worker gets a copy of the wrappers without pickling
+        context = multiprocessing.get_context('fork')
+        with context.Pool(processes=num_workers) as pool:
+            all_errors = pool.map(_run_processes_at_time_worker, run_times,
+                                  chunksize=1)
+    finally:
+        _PARALLEL_TIMES_STATE = None
+
+    for errors in all_errors:
+        for process, num_errors in zip(processes, errors):
+            process.errors += num_errors
 
 def get_lead_sequence(config, input_dict=None):
     """!Get forecast lead list from LEAD_SEQ or compute it from INIT_SEQ.
@@ -1359,6 +1540,35 @@ def get_storm_ids(filter_filename, logger):
     return sorted_storms
 
 
+def split_by_storm_id(filter_filename):
+    """! Read a filter file once and group its rows by the value in the
+        STORM_ID column.
+        Args:
+            @param filter_filename:  The name of the filter file to read
+        Returns:
+            header (string): header line of the file, or empty string if the
+                             file does not exist or is empty
+            storm_lines (dict): rows of the file (including newlines) for each
+                                storm id, with storm ids in sorted order
+    """
+    storm_lines = {}
+    if not os.path.isfile(filter_filename) or \
+            os.stat(filter_filename).st_size == 0:
+        return '', storm_lines
+
+    with open(filter_filename, "r") as fileobj:
+        header = fileobj.readline()
+        header_colnum = header.split().index('STORM_ID')
+        for line in fileobj:
+            columns = line.split()
+            if len(columns) <= header_colnum:
+                continue
+            storm_lines.setdefault(columns[header_colnum], []).append(line)
+
+    return header, {storm_id: storm_lines[storm_id]
+                    for storm_id in sorted(storm_lines)}
+
+
 def get_files(filedir, filename_regex, logger):
     """! Get all the files (with a particular
         naming format) by walking
@@ -2087,6 +2297,23 @@ def get_var_items(config, data_type, index, time_info, met_tool=None):
             @returns tuple containing name, level, thresh, extra values if found. If not found
                4 empty strings are returned.
     """
+    var_templates = get_var_item_templates(config, data_type, index,
+                                           met_tool=met_tool)
+    return sub_var_items(config, var_templates, time_info)
+
+def get_var_item_templates(config, data_type, index, met_tool=None):
+    """!Get configuration variables for given data type and index without
+        substituting time information so they can be reused for many run
+        times. Use sub_var_items to get the values for a given run time.
+        Args:
+            @param config: METplusConfig object
+            @param data_type: type of data to find, i.e. FCST, OBS, BOTH, or ENS
+            @param index: index of variable, i.e. _VAR<index>_NAME
+            @param met_tool: optional name of MET tool to look for wrapper specific items
+            @returns tuple containing name template, list of level templates,
+               list of thresholds, and extra options template (None if not
+               set) if found. If not found or invalid, None is returned.
+    """
 
     # build string to search for BOTH items, using MET tool name if provided
     # do the same for data_type, i.e. FCST
@@ -2102,29 +2329,23 @@ def get_var_items(config, data_type, index, time_info, met_tool=None):
 
     # get field variable name from data type name
     # look for BOTH_VAR<n>_NAME if looking for FCST or OBS (not ENS)
-    # return empty strings if name cannot be found from either
+    # return None if name cannot be found from either
     if data_type in ['FCST', 'OBS'] and config.has_option('config', f"{both_var}{index}_NAME"):
         search_name = f"{both_var}{index}_NAME"
     elif config.has_option('config', f"{data_type_var}{index}_NAME"):
         search_name = f"{data_type_var}{index}_NAME"
     else:
-        return '', '', '', ''
+        return None
 
-    name = StringSub(config.logger,
-                     config.getraw('config', search_name),
-                     **time_info).do_string_sub()
+    name = config.getraw('config', search_name)
 
     # get levels if available
-    levels = []
     if data_type in ['FCST', 'OBS'] and config.has_option('config', f"{both_var}{index}_LEVELS"):
         search_levels = f"{both_var}{index}_LEVELS"
     else:
         search_levels = f"{data_type_var}{index}_LEVELS"
 
-    levels = []
-    for level in getlist(config.getraw('config', search_levels, '')):
-        subbed_level = StringSub(config.logger, level, **time_info).do_string_sub()
-        levels.append(subbed_level)
+    levels = getlist(config.getraw('config', search_levels, ''))
 
     # if no levels are found, add an empty string
     if not levels:
@@ -2143,20 +2364,40 @@ def get_var_items(config, data_type, index, time_info, met_tool=None):
         thresh = getlist(config.getstr('config', search_thresh))
         if not validate_thresholds(thresh):
             config.logger.error(f"  Update {search_thresh} to match this format")
-            return '', '', '', ''
+            return None
 
     # get extra options if available
-    extra = ""
+    extra = None
     if data_type in ['FCST', 'OBS'] and config.has_option('config', f"{both_var}{index}_OPTIONS"):
-        search_extra = f"{both_var}{index}_OPTIONS"
+        extra = config.getraw('config', f"{both_var}{index}_OPTIONS")
     elif config.has_option('config', f"{data_type_var}{index}_OPTIONS"):
-        search_extra = f"{data_type_var}{index}_OPTIONS"
-    else:
-        search_extra = None
+        extra = config.getraw('config', f"{data_type_var}{index}_OPTIONS")
+
+    return name, levels, thresh, extra
+
+def sub_var_items(config, var_templates, time_info):
+    """!Substitute time information into field information templates
+        Args:
+            @param config: METplusConfig object
+            @param var_templates: tuple returned by get_var_item_templates
+            @param time_info: time dictionary used for string substitution
+            @returns tuple containing name, level, thresh, extra values. If
+               var_templates is None, 4 empty strings are returned.
+    """
+    if var_templates is None:
+        return '', '', '', ''
+
+    name_template, level_templates, thresh, extra_template = var_templates
 
-    if search_extra:
-        extra = StringSub(config.logger,
-                          config.getraw('config', search_extra),
+    name = StringSub(config.logger, name_template,
+                     **time_info).do_string_sub()
+
+    levels = [StringSub(config.logger, level, **time_info).do_string_sub()
+              for level in level_templates]
+
+    extra = ""
+    if extra_template is not None:
+        extra = StringSub(config.logger, extra_template,
                           **time_info).do_string_sub()
 
         # split up each item by semicolon, then add a semicolon to the end of each item
@@ -2165,7 +2406,8 @@ def get_var_items(config, data_type, index, time_info, met_tool=None):
         extra_list = list(filter(None, extra.split(';')))
         extra = f"{'; '.join(extra_list)};"
 
-    return name, levels, thresh, extra
+    # copy list so changes by the caller do not modify the templates
+    return name, levels, list(thresh), extra
 
 def find_var_name_indices(config, data_type, met_tool=None):
 
@@ -2188,16 +2430,19 @@ def find_var_name_indices(config, data_type, met_tool=None):
                                           config,
                                           'config')
 
-def parse_var_list(config, time_info=None, data_type=None, met_tool=None):
-    """ read conf items and populate list of dictionaries containing
-    information about each variable to be compared
+def get_field_plan(config, data_type=None, met_tool=None):
+    """!Read the conf items that define each field to be compared without
+        substituting time information. The result can be passed to
+        parse_var_list to get the field information for each run time
+        without reading and validating the conf items again.
         Args:
             @param config: METplusConfig object
-            @param time_info: time object for string sub, optional
             @param data_type: data type to find. Can be FCST, OBS, or ENS. If not set, get FCST/OBS/BOTH
             @param met_tool: optional name of MET tool to look for wrapper specific var items
         Returns:
-            list of dictionaries with variable information
+            list of dictionaries with the index and the templates for each
+            data type (key is lowercase data type, i.e. fcst) ordered by
+            index, or an empty list if the conf items are invalid
     """
 
     # validate configs again in case wrapper is not running from master_metplus
@@ -2209,16 +2454,6 @@ def parse_var_list(config, time_info=None, data_type=None, met_tool=None):
         config.logger.error("Cannot request BOTH explicitly in parse_var_list")
         return []
 
-    # if time_info is not passed in, set 'now' to CLOCK_TIME
-    # NOTE: any attempt to use string template substitution with an item other than
-    #  'now' will fail if time_info is not passed into parse_var_list
-    if time_info is None:
-        time_info = { 'now' : datetime.datetime.strptime(config.getstr('config', 'CLOCK_TIME'),
-                                                         '%Y%m%d%H%M%S') }
-
-    # var_list is a list containing an list of dictionaries
-    var_list = []
-
     # check if *_<MET-tool>_VAR<n>_NAME exists, if so, use that instead of generic
     data_types_and_indices = {}
 
@@ -2229,18 +2464,73 @@ def parse_var_list(config, time_info=None, data_type=None, met_tool=None):
 
     if not data_types_and_indices:
         data_types_and_indices = find_var_name_indices(config, data_type)
-    # if found wrapper specific fields, pass the MET tool name to get_var_items
+    # if found wrapper specific fields, pass the MET tool name to get_var_item_templates
     else:
         use_met_tool = met_tool
 
+    field_plan = []
+    for index in sorted(data_types_and_indices, key=int):
+        field = {'index': index}
+
+        # if specific data type is requested, only get that type
+        if data_type:
+            field[data_type.lower()] = get_var_item_templates(config, data_type, index,
+                                                              met_tool=use_met_tool)
+
+        # if FCST and OBS or BOTH are used, get and set both of them
+        else:
+            fcst = get_var_item_templates(config, 'FCST', index, met_tool=use_met_tool)
+            obs = get_var_item_templates(config, 'OBS', index, met_tool=use_met_tool)
+
+            # if number of levels are not equal, return an empty list
+            f_num_levels = len(fcst[1]) if fcst else 0
+            o_num_levels = len(obs[1]) if obs else 0
+            if f_num_levels != o_num_levels:
+                return []
+
+            field['fcst'] = fcst
+            field['obs'] = obs
+
+        field_plan.append(field)
+
+    return field_plan
+
+def parse_var_list(config, time_info=None, data_type=None, met_tool=None,
+                   field_plan=None):
+    """ read conf items and populate list of dictionaries containing
+    information about each variable to be compared
+        Args:
+            @param config: METplusConfig object
+            @param time_info: time object for string sub, optional
+            @param data_type: data type to find. Can be FCST, OBS, or ENS. If not set, get FCST/OBS/BOTH
+            @param met_tool: optional name of MET tool to look for wrapper specific var items
+            @param field_plan: optional result of get_field_plan called with
+             the same data_type and met_tool. If not set, conf items are read
+        Returns:
+            list of dictionaries with variable information
+    """
+    if field_plan is None:
+        field_plan = get_field_plan(config, data_type, met_tool)
+
+    # if time_info is not passed in, set 'now' to CLOCK_TIME
+    # NOTE: any attempt to use string template substitution with an item other than
+    #  'now' will fail if time_info is not passed into parse_var_list
+    if time_info is None:
+        time_info = { 'now' : datetime.datetime.strptime(config.getstr('config', 'CLOCK_TIME'),
+                                                         '%Y%m%d%H%M%S') }
+
+    # var_list is a list containing an list of dictionaries
+    var_list = []
+
     # loop over all possible variables and add them to list
-    for index, data_type_list in data_types_and_indices.items():
+    for field in field_plan:
+        index = field['index']
 
         # if specific data type is requested, only get that type
         if data_type:
             data_type_lower = data_type.lower()
-            name, levels, thresh, extra = get_var_items(config, data_type, index, time_info,
-                                                        met_tool=use_met_tool)
+            name, levels, thresh, extra = sub_var_items(config, field[data_type_lower],
+                                                        time_info)
 
             if not name:
                 continue
@@ -2256,16 +2546,10 @@ def parse_var_list(config, time_info=None, data_type=None, met_tool=None):
 
         # if FCST and OBS or BOTH are used, get and set both of them
         else:
-            f_name, f_levels, f_thresh, f_extra = get_var_items(config, 'FCST', index,
-                                                                time_info,
-                                                                met_tool=use_met_tool)
-            o_name, o_levels, o_thresh, o_extra = get_var_items(config, 'OBS', index,
-                                                                time_info,
-                                                                met_tool=use_met_tool)
-
-            # if number of levels are not equal, return an empty list
-            if len(f_levels) != len(o_levels):
-                return []
+            f_name, f_levels, f_thresh, f_extra = sub_var_items(config, field['fcst'],
+                                                                time_info)
+            o_name, o_levels, o_thresh, o_extra = sub_var_items(config, field['obs'],
+                                                                time_info)
 
             if not o_name and not f_name:
                 continue
@@ -2534,44 +2818,258 @@ def preprocess_file(filename, data_type, config):
     if os.path.isfile(filename[:-2]+'grd'):
         return preprocess_file(filename[:-2]+'grd', data_type, config)
 
-    # if file exists in the staging area, return that path
+    # find compressed file to uncompress
+    source = None
+    for ext in VALID_EXTENSIONS:
+        if os.path.isfile(filename + ext):
+            source = filename + ext
+            break
+
+    # if file exists in the staging area, return that path unless it was
+    # created from a compressed file that has changed since it was staged
     outpath = stage_dir + filename
+    info_path = get_staging_cache_info_path(stage_dir, filename)
     if os.path.isfile(outpath):
-        return outpath
+        if source is None or is_staged_file_current(info_path, source):
+            mark_staged_file_in_use(info_path)
+            return outpath
+
+        if config.logger:
+            config.logger.debug(f"Staged file {outpath} is out of date with {source}")
+
+    if source is None:
+        return None
 
     # Create staging area if it does not exist
     outdir = os.path.dirname(outpath)
-    if not os.path.exists(outdir):
-        os.makedirs(outdir, mode=0o0775)
+    os.makedirs(outdir, mode=0o0775, exist_ok=True)
 
     # uncompress gz, bz2, or zip file
-    if os.path.isfile(filename+".gz"):
-        if config.logger:
-            config.logger.debug("Uncompressing gz file to {}".format(outpath))
-        with gzip.open(filename+".gz", 'rb') as infile:
-            with open(outpath, 'wb') as outfile:
-                outfile.write(infile.read())
-                infile.close()
-                outfile.close()
-                return outpath
-    elif os.path.isfile(filename+".bz2"):
-        if config.logger:
-            config.logger.debug("Uncompressing bz2 file to {}".format(outpath))
-        with open(filename+".bz2", 'rb') as infile:
-            with open(outpath, 'wb') as outfile:
-                outfile.write(bz2.decompress(infile.read()))
-                infile.close()
-                outfile.close()
-                return outpath
-    elif os.path.isfile(filename+".zip"):
-        if config.logger:
-            config.logger.debug("Uncompressing zip file to {}".format(outpath))
-        with zipfile.ZipFile(filename+".zip") as z:
-            with open(outpath, 'wb') as f:
-                f.write(z.read(os.path.basename(filename)))
-                return outpath
+    if config.logger:
+        config.logger.debug(f"Uncompressing {os.path.splitext(source)[1][1:]} "
+                            f"file to {outpath}")
+    uncompress_file(source, outpath)
+    write_staging_cache_info(info_path, source)
+    mark_staged_file_in_use(info_path)
+
+    max_mb = config.getint('config', 'STAGING_CACHE_MAX_MB', 0)
+    if max_mb > 0:
+        limit_staging_cache(stage_dir, max_mb * 1024 * 1024,
+                            logger=config.logger)
+
+    return outpath
+
+def is_preprocessed_file_current(filename, preprocessed, config):
+    """!Check if a file that preprocess_file returned for filename can be
+        used again without calling preprocess_file. A file that was
+        uncompressed into the staging directory is checked against the
+        compressed file it was created from and is marked as in use so that
+        limit_staging_cache does not remove it, like preprocess_file does when
+        it finds a staged file.
+        Args:
+            @param filename path that was passed to preprocess_file
+            @param preprocessed path that preprocess_file returned
+            @param config METplusConfig object
+            @returns True if preprocessed can be used, False if
+             preprocess_file should be called again
+    """
+    if not os.path.exists(preprocessed):
+        return False
 
-    return None
+    stage_dir = config.getdir('STAGING_DIR')
+    if preprocessed != stage_dir + filename:
+        return True
+
+    info_path = get_staging_cache_info_path(stage_dir, filename)
+    for ext in VALID_EXTENSIONS:
+        source = filename + ext
+        if os.path.isfile(source):
+            if not is_staged_file_current(info_path, source):
+                return False
+            break
+
+    mark_staged_file_in_use(info_path)
+    return True
+
+def preprocess_files(filenames, data_type, config):
+    """!Call preprocess_file for each file, uncompressing files in parallel
+        using STAGING_PREFETCH_THREADS threads. Gempak files are converted
+        one at a time.
+        Args:
+            @param filenames list of paths to pass to preprocess_file
+            @param data_type type of data, i.e. GEMPAK
+            @param config METplusConfig object
+            @returns list of paths returned by preprocess_file in the same
+             order as filenames
+    """
+    num_threads = config.getint('config', 'STAGING_PREFETCH_THREADS', 1)
+    if num_threads <= 1 or len(filenames) <= 1 or data_type == 'GEMPAK' or \
+            any(filename and filename.endswith('.grd') for filename in filenames):
+        return [preprocess_file(filename, data_type, config)
+                for filename in filenames]
+
+    # uncompressing releases the GIL, so threads can run concurrently
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        return list(executor.map(lambda filename:
+                                 preprocess_file(filename, data_type, config),
+                                 filenames))
+
+def uncompress_file(source, outpath):
+    """!Uncompress gz, bz2, or zip file a chunk at a time so the entire file
+        is never held in memory. Data is written to a temporary file that is
+        renamed when complete so that an incomplete file is never staged.
+        Args:
+            @param source path to compressed file
+            @param outpath path to write uncompressed file
+    """
+    tmp_path = f'{outpath}.tmp{os.getpid()}_{threading.get_ident()}'
+    try:
+        with open(tmp_path, 'wb') as outfile:
+            if source.endswith('.gz'):
+                with gzip.open(source, 'rb') as infile:
+                    shutil.copyfileobj(infile, outfile, DECOMPRESS_CHUNK_SIZE)
+            elif source.endswith('.bz2'):
+                with bz2.open(source, 'rb') as infile:
+                    shutil.copyfileobj(infile, outfile, DECOMPRESS_CHUNK_SIZE)
+            elif source.endswith('.zip'):
+                member = os.path.basename(source[:-len('.zip')])
+                with zipfile.ZipFile(source) as zip_file:
+                    with zip_file.open(member) as infile:
+                        shutil.copyfileobj(infile, outfile, DECOMPRESS_CHUNK_SIZE)
+
+        os.replace(tmp_path, outpath)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def get_staging_cache_info_path(stage_dir, filename):
+    """!Get path to file that stores info about the compressed file that
+        the staged version of filename was created from"""
+    return os.path.join(stage_dir, STAGING_CACHE_INFO_DIR) + filename + '.json'
+
+def get_source_info(source):
+    """!Get path, size, and modification time of a compressed file"""
+    source_stat = os.stat(source)
+    return {'source': source,
+            'size': source_stat.st_size,
+            'mtime_ns': source_stat.st_mtime_ns}
+
+def is_staged_file_current(info_path, source):
+    """!Check if staged file was created from the current version of source
+        Args:
+            @param info_path path to staging cache info file
+            @param source path to compressed file
+            @returns True if the path, size, and modification time of source
+             match the values saved when the file was staged
+    """
+    try:
+        with open(info_path, 'r') as file_handle:
+            return json.load(file_handle) == get_source_info(source)
+    except (OSError, ValueError):
+        return False
+
+def write_staging_cache_info(info_path, source):
+    """!Save info about compressed file that a staged file was created from"""
+    os.makedirs(os.path.dirname(info_path), exist_ok=True)
+    tmp_path = f'{info_path}.tmp{os.getpid()}_{threading.get_ident()}'
+    with open(tmp_path, 'w') as file_handle:
+        json.dump(get_source_info(source), file_handle)
+    os.replace(tmp_path, info_path)
+
+def touch_staging_cache_info(info_path):
+    """!Update modification time of staging cache info file to mark that the
+        staged file was used recently"""
+    try:
+        os.utime(info_path)
+    except OSError:
+        pass
+
+def mark_staged_file_in_use(info_path):
+    """!Protect a staged file from being removed by limit_staging_cache
+        until release_staged_files is called, because a command that has not
+        run yet may read it. The modification time of the staging cache info
+        file is set in the future so other threads and processes that share
+        the staging directory also do not remove it.
+        Args:
+            @param info_path path to staging cache info file
+    """
+    in_use_until = time.time() + STAGING_IN_USE_SECONDS
+    try:
+        os.utime(info_path, (in_use_until, in_use_until))
+    except OSError:
+        return
+
+    with _STAGED_IN_USE_LOCK:
+        _STAGED_IN_USE.add(info_path)
+
+def release_staged_files(config):
+    """!Mark staged files that were used by this process as used now so
+        they can be removed by limit_staging_cache, then remove least
+        recently used files if STAGING_CACHE_MAX_MB is exceeded. Called
+        after a wrapper's commands for a run time have finished.
+        Args:
+            @param config METplusConfig object
+    """
+    with _STAGED_IN_USE_LOCK:
+        info_paths = list(_STAGED_IN_USE)
+        _STAGED_IN_USE.clear()
+
+    for info_path in info_paths:
+        touch_staging_cache_info(info_path)
+
+    max_mb = config.getint('config', 'STAGING_CACHE_MAX_MB', 0)
+    if max_mb > 0:
+        limit_staging_cache(config.getdir('STAGING_DIR'),
+                            max_mb * 1024 * 1024, logger=config.logger)
+
+def limit_staging_cache(stage_dir, max_bytes, logger=None):
+    """!Remove least recently used staged files that were uncompressed by
+        preprocess_file until the total size is no more than max_bytes.
+        Files that are in use (see mark_staged_file_in_use) are not removed.
+        Args:
+            @param stage_dir staging directory
+            @param max_bytes maximum number of bytes of uncompressed files
+            @param logger optional logger to write debug info
+    """
+    info_dir = os.path.join(stage_dir, STAGING_CACHE_INFO_DIR)
+
+    entries = []
+    total_bytes = 0
+    now = time.time()
+    for dirpath, _, filenames in os.walk(info_dir):
+        for info_name in filenames:
+            if not info_name.endswith('.json'):
+                continue
+
+            info_path = os.path.join(dirpath, info_name)
+            staged_file = stage_dir + info_path[len(info_dir):-len('.json')]
+            try:
+                last_used = os.stat(info_path).st_mtime
+                size = os.stat(staged_file).st_size
+            except OSError:
+                continue
+
+            total_bytes += size
+            entries.append((last_used, info_path, staged_file, size))
+
+    # remove oldest files first
+    for last_used, info_path, staged_file, size in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+
+        # in use files are marked with a modification time in the future
+        if last_used > now:
+            continue
+
+        try:
+            os.remove(staged_file)
+            os.remove(info_path)
+        except OSError:
+            continue
+
+        total_bytes -= size
+        if logger:
+            logger.debug(f"Removed {staged_file} from staging directory")
 
 def run_stand_alone(filename, app_name):
     """ Used to allow MET tool wrappers to be run without using
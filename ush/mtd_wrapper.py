@@ -33,6 +33,10 @@ class MTDWrapper(MODEWrapper):
 
     def create_c_dict(self):
         c_dict = CompareGriddedWrapper.create_c_dict(self)
+
+        # file lists are reused between commands, so run one at a time
+        c_dict['MAX_CONCURRENT_PROCS'] = 1
+
         c_dict['VERBOSITY'] = self.config.getstr('config', 'LOG_MTD_VERBOSITY',
                                                  c_dict['VERBOSITY'])
 
@@ -431,6 +435,15 @@ class MTDWrapper(MODEWrapper):
 
         self.print_all_envs()
 
+    def get_output_time_string(self, time_info):
+        """!MTD reads many run times in a single command, so output files are
+            only matched by the tool name and output prefix
+            Args:
+                @param time_info dictionary containing timing information
+                @returns empty string
+        """
+        return ''
+
     def get_command(self):
         """! Builds the command to run the MET application
            @rtype string
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""
+Program Name: netcdf_util.py
+Contact(s): George McCabe
+Abstract: Read summary statistics from NetCDF files without calling
+ external NCO tools
+History Log:  Initial version
+Usage: Called by SeriesByLeadWrapper
+Parameters: None
+Input Files: NetCDF files
+Output Files: N/A
+"""
+
+import os
+
+import numpy as np
+import netCDF4
+
+'''!@namespace netcdf_util
+@brief Computes the min and max of variables in a NetCDF file in a single
+open of the file. Results are cached by file path and are read again if
+the size or modification time of the file changes.
+@code{.sh}
+Cannot be called directly. These are helper functions
+to be used in other METplus wrappers
+@endcode
+'''
+
+# prefix of series_analysis output variables
+SERIES_CNT_PREFIX = 'series_cnt_'
+
+# min and max of each variable read from a file, keyed by file path
+_STATS_CACHE = {}
+
+def get_variable_min_max(nc_file, prefix=SERIES_CNT_PREFIX):
+    """!Get the min and max values of every variable in a NetCDF file whose
+        name starts with prefix. Missing values (_FillValue) are ignored.
+        Args:
+            @param nc_file path to NetCDF file
+            @param prefix only read variables that start with this string
+            @returns dictionary with variable name as the key and a tuple of
+             (min, max) as the value. Min and max are None if all values are
+             missing.
+    """
+    file_stat = os.stat(nc_file)
+    file_key = (file_stat.st_size, file_stat.st_mtime_ns, prefix)
+    cached = _STATS_CACHE.get(nc_file)
+    if cached is not None and cached[0] == file_key:
+        return cached[1]
+
+    stats = {}
+    with netCDF4.Dataset(nc_file, 'r') as dataset:
+        for name, variable in dataset.variables.items():
+            if not name.startswith(prefix):
+                continue
+
+            values = np.ma.masked_invalid(variable[:])
+            if values.count() == 0:
+                stats[name] = (None, None)
+                continue
+
+            stats[name] = (float(values.min()), float(values.max()))
+
+    _STATS_CACHE[nc_file] = (file_key, stats)
+    return stats
+
+def clear_cache():
+    """!Remove all cached statistics so files will be read again"""
+    _STATS_CACHE.clear()
+
+def format_value(value):
+    """!Format a value the way ncdump writes it, i.e. 12 instead of 12.0"""
+    if value is None:
+        return None
+
+    if float(value).is_integer():
+        return str(int(value))
+
+    return str(value)
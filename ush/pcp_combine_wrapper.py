@@ -15,12 +15,15 @@ Condition codes: 0 for success, 1 for failure
 import metplus_check_python_version
 
 import os
+import time
+import logging
 import met_util as util
 import datetime
 import string_template_substitution as sts
 
 from reformat_gridded_wrapper import ReformatGriddedWrapper
 import time_util
+import accumulation_engine
 
 '''!@namespace PCPCombineWrapper
 @brief Wraps the MET tool pcp_combine to combine or divide
@@ -31,6 +34,17 @@ Cannot be called directly. Must use child classes.
 @endcode
 @todo add main function to be able to run alone via command line
 '''
+
+# logger used while finding input files for all run times before running.
+# Messages are discarded because they are logged again when each time runs
+PLAN_LOGGER = logging.getLogger('pcp_combine_plan')
+PLAN_LOGGER.disabled = True
+
+# directories modified less than this many nanoseconds before they were read
+# are read again the next time, because files added within the timestamp
+# resolution of the file system may not change the modification time
+DIR_MTIME_RESOLUTION_NS = 1000000000
+
 class PCPCombineWrapper(ReformatGriddedWrapper):
     """!Wraps the MET tool pcp_combine to combine or divide
     precipitation accumulations"""
@@ -58,11 +72,35 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
         self.compress = -1
         self.user_command = ''
 
+        # result of util.preprocess_file for each input path that was
+        # searched, keyed by (path, data type). Neighboring valid times
+        # search many of the same files, so they are only checked once
+        self.input_file_cache = {}
+
+        # (path, data type) of input files that were not found for the
+        # current run time. These are cleared for each run time, unlike
+        # files that were found
+        self.missing_inputs = set()
+
+        # modification time and set of file names of each directory that
+        # has been searched, keyed by directory
+        self.dir_listings = {}
+
+        # (path, data type) of files to stage, only set while planning inputs
+        self.planned_inputs = None
+
+        # adds fields in process if PCP_COMBINE_IN_PROCESS is True
+        self.accum_engine = None
+        if self.c_dict['IN_PROCESS']:
+            self.accum_engine = accumulation_engine.AccumulationEngine()
+
     def create_c_dict(self):
         c_dict = super().create_c_dict()
         c_dict['VERBOSITY'] = self.config.getstr('config', 'LOG_PCP_COMBINE_VERBOSITY',
                                                  c_dict['VERBOSITY'])
         c_dict['SKIP_IF_OUTPUT_EXISTS'] = self.config.getbool('config', 'PCP_COMBINE_SKIP_IF_OUTPUT_EXISTS', False)
+        c_dict['PLAN_INPUTS'] = self.config.getbool('config', 'PCP_COMBINE_PLAN_INPUTS', False)
+        c_dict['IN_PROCESS'] = self.config.getbool('config', 'PCP_COMBINE_IN_PROCESS', False)
 
         fcst_run = self.config.getbool('config', 'FCST_PCP_COMBINE_RUN', False)
         obs_run = self.config.getbool('config', 'OBS_PCP_COMBINE_RUN', False)
@@ -200,6 +238,217 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
 
         return (dirr, template)
 
+    def prepare_all_times(self):
+        """!Find input files for all run times first if PCP_COMBINE_PLAN_INPUTS
+            is True. Called by run_all_times before looping over run times"""
+        if self.c_dict['PLAN_INPUTS']:
+            self.plan_inputs()
+
+    def reads_other_run_times(self):
+        """!Every run method can read files from times other than the run
+            time, i.e. ADD and DERIVE look back over the accumulation,
+            SUBTRACT reads two forecast leads, and USER_DEFINED commands can
+            read any file
+            @returns True if FCST or OBS data is processed
+        """
+        return any(self.c_dict.get(f'{data_type}_RUN_METHOD')
+                   for data_type in ('FCST', 'OBS'))
+
+    def run_at_time(self, input_dict):
+        """!Process a run time. Input files that were not found for an
+            earlier run time are searched again because a wrapper that runs
+            before PCPCombine may have created them since"""
+        self.missing_inputs.clear()
+        super().run_at_time(input_dict)
+
+    def plan_inputs(self):
+        """!Find the input files needed by every run time and stage them
+            before any commands are run. Files that are shared by more than
+            one run time are only staged once and files are uncompressed in
+            parallel if STAGING_PREFETCH_THREADS is greater than 1. The
+            results are stored in the input file cache that is used when
+            each run time is processed.
+        """
+        run_times = util.get_run_times(self.config)
+        if not run_times:
+            return
+
+        self.logger.info(f"Finding input files for {len(run_times)} run times")
+        loop_key = 'init' if util.is_loop_by_init(self.config) else 'valid'
+        planned_inputs, _ = self.find_planned_inputs([{loop_key: run_time}
+                                                      for run_time in run_times])
+
+        # stage files for each data type together
+        paths_by_type = {}
+        for path, data_type in planned_inputs:
+            paths_by_type.setdefault(data_type, []).append(path)
+
+        for data_type, paths in paths_by_type.items():
+            results = util.preprocess_files(paths, data_type, self.config)
+            for path, result in zip(paths, results):
+                if result is None:
+                    continue
+                self.input_file_cache[(path, data_type)] = result
+                self.add_to_dir_listing(result)
+
+        self.logger.info(f"Found {len(planned_inputs)} input files")
+
+    def find_planned_inputs(self, input_dicts):
+        """!Process run times without building commands to find the input
+            files that they need. Files are not staged.
+            Args:
+                @param input_dicts list of dictionaries with the init or
+                 valid time of each run time to process
+                @returns tuple of list of (path, data type) of input files
+                 that were found and True if all input files were found or
+                 False if any run time is missing input
+        """
+        clock_time = datetime.datetime.strptime(self.config.getstr('config', 'CLOCK_TIME'),
+                                                '%Y%m%d%H%M%S')
+
+        # discard log messages and errors, they will be reported again
+        # when each run time is processed
+        logger = self.logger
+        errors = self.errors
+        self.logger = PLAN_LOGGER
+        self.planned_inputs = {}
+        try:
+            for input_dict in input_dicts:
+                self.run_at_time(dict(input_dict, now=clock_time))
+            all_found = self.errors == errors
+        finally:
+            planned_inputs = self.planned_inputs
+            self.planned_inputs = None
+            self.logger = logger
+            self.errors = errors
+            self.clear()
+
+        return list(planned_inputs), all_found
+
+    def check_run_time_inputs(self, input_dict):
+        """!Check if the input files of a run time exist, i.e. before running
+            it in stream mode
+            Args:
+                @param input_dict dictionary with init or valid time
+                @returns tuple of True if all input files were found and
+                 list of input file paths that were found
+        """
+        planned_inputs, all_found = self.find_planned_inputs([input_dict])
+        return all_found, [path for path, _ in planned_inputs]
+
+    def get_dir_listing(self, dir_path):
+        """!Get names of files in a directory. The directory is read again
+            if it was modified since it was last read, i.e. by a wrapper
+            that runs before PCPCombine
+            Args:
+                @param dir_path directory to read
+                @returns set of file names, empty if directory does not exist
+        """
+        try:
+            mtime = os.stat(dir_path or '.').st_mtime_ns
+        except OSError:
+            return set()
+
+        cached = self.dir_listings.get(dir_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        read_time = time.time_ns()
+        try:
+            with os.scandir(dir_path or '.') as entries:
+                listing = {entry.name for entry in entries}
+        except OSError:
+            return set()
+
+        # files added within the timestamp resolution of the file system do
+        # not change the modification time of the directory, so only keep
+        # the listing if the directory was not modified right before reading
+        if read_time - mtime > DIR_MTIME_RESOLUTION_NS:
+            self.dir_listings[dir_path] = (mtime, listing)
+
+        return listing
+
+    def add_to_dir_listing(self, path):
+        """!Add file that was created, i.e. a staged file, to the directory
+            listing if the directory has already been read"""
+        if not path:
+            return
+
+        dir_path, filename = os.path.split(path)
+        if dir_path in self.dir_listings:
+            self.dir_listings[dir_path][1].add(filename)
+
+    def input_may_exist(self, path):
+        """!Check directory listings to see if util.preprocess_file could
+            find a file. This is True if the file, a compressed or Gempak
+            version of it, or a staged version of it exists.
+            Args:
+                @param path input file path to check
+                @returns False if the file certainly cannot be found
+        """
+        if os.path.basename(path) in util.PYTHON_EMBEDDING_TYPES:
+            return True
+
+        dir_path, filename = os.path.split(path)
+        candidates = [filename]
+        candidates.extend([filename + ext for ext in util.VALID_EXTENSIONS])
+        if filename.endswith('nc'):
+            candidates.append(filename[:-2] + 'grd')
+
+        listing = self.get_dir_listing(dir_path)
+        if any(candidate in listing for candidate in candidates):
+            return True
+
+        stage_path = self.config.getdir('STAGING_DIR') + path
+        stage_dir, stage_file = os.path.split(stage_path)
+        return stage_file in self.get_dir_listing(stage_dir)
+
+    def find_input_path(self, path, data_type):
+        """!Call util.preprocess_file to find, uncompress, or convert an input
+            file. Files that were found are cached so each path is only
+            checked once. Files that were not found are only remembered
+            until the next run time. Directory listings are used to skip
+            paths that cannot exist.
+            Args:
+                @param path input file path to find
+                @param data_type type of data, i.e. GEMPAK
+                @returns path to file to use or None if it cannot be found
+        """
+        key = (path, data_type)
+        if key in self.missing_inputs:
+            return None
+
+        if key in self.input_file_cache:
+            result = self.input_file_cache[key]
+            # staged files may be removed if STAGING_CACHE_MAX_MB is set
+            if result in util.PYTHON_EMBEDDING_TYPES or os.path.exists(result):
+                return result
+
+        if not self.input_may_exist(path):
+            self.missing_inputs.add(key)
+            return None
+
+        if self.planned_inputs is not None:
+            # while planning, assume file can be used and stage it later
+            self.planned_inputs[key] = True
+            return path
+
+        result = util.preprocess_file(path, data_type, self.config)
+        if result is None:
+            self.missing_inputs.add(key)
+            return None
+
+        self.add_to_dir_listing(result)
+        self.input_file_cache[key] = result
+        return result
+
+    def clear_input_file_cache(self):
+        """!Remove cached input file search results so directories are read
+            again, i.e. if new input data may have arrived"""
+        self.input_file_cache.clear()
+        self.missing_inputs.clear()
+        self.dir_listings.clear()
+
     def getLowestForecastFile(self, valid_time, dtype, template):
         """!Find the lowest forecast hour that corresponds to the
         valid time
@@ -241,9 +490,8 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
 
             self.logger.debug(f"Looking for {search_file}")
 
-            search_file = util.preprocess_file(search_file,
-                                self.c_dict[dtype+'_INPUT_DATATYPE'],
-                                               self.config)
+            search_file = self.find_input_path(search_file,
+                                               self.c_dict[dtype+'_INPUT_DATATYPE'])
 
             if search_file is not None:
                 return search_file, forecast_lead
@@ -274,10 +522,8 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
                                  custom=self.c_dict['CUSTOM_STRING'])
             search_file = os.path.join(self.input_dir,
                                        dSts.do_string_sub())
-            search_file = util.preprocess_file(search_file,
-                                            self.c_dict[data_src+\
-                                              '_INPUT_DATATYPE'],
-                                               self.config)
+            search_file = self.find_input_path(search_file,
+                                               self.c_dict[data_src+'_INPUT_DATATYPE'])
             if search_file is not None:
                 break
 
@@ -377,9 +623,8 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
                                    **time_info).do_string_sub()
         input_path = os.path.join(self.input_dir, input_file)
 
-        return util.preprocess_file(input_path,
-                                    self.c_dict[data_src+'_INPUT_DATATYPE'],
-                                    self.config), lead
+        return self.find_input_path(input_path,
+                                    self.c_dict[data_src+'_INPUT_DATATYPE']), lead
 
     def get_template_accum(self, accum_dict, search_time, lead, data_src):
         # apply string substitution to accum amount
@@ -626,6 +871,10 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
             self.log_error("pcp_combine could not generate command")
             return False
 
+        # only input files are needed while planning
+        if self.planned_inputs is not None:
+            return True
+
         # if output file exists and we want to skip it, warn and continue
         outfile = self.get_output_path()
         if not self.method == "USER_DEFINED" and os.path.exists(outfile) and \
@@ -636,6 +885,11 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
                               .format(outfile))
             return True
 
+        if self.accum_engine is not None:
+            success = self.run_in_process(time_info)
+            if success is not None:
+                return success
+
         # set user environment variables if needed
         self.set_user_environment()
 
@@ -644,6 +898,59 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
 
         return self.build()
 
+    def get_in_process_fields(self):
+        """!Get fields to add with the accumulation engine
+            @returns list of (path, name, level) for each input file or None
+             if the command cannot be handled by the engine
+        """
+        if self.method != 'ADD' or self.field_name or not self.infiles:
+            return None
+
+        keys = []
+        for infile, addon in zip(self.infiles, self.inaddons):
+            field = accumulation_engine.get_field_from_addon(addon)
+            if field is None or not infile.endswith('.nc') or \
+                    util.is_python_script(field[0]) or \
+                    accumulation_engine.get_level_index(field[1]) is None:
+                return None
+            keys.append((infile, field[0], field[1]))
+
+        return keys
+
+    def run_in_process(self, time_info):
+        """!Build accumulation by adding NetCDF fields without running
+            pcp_combine. Only ADD method commands that read named fields from
+            NetCDF files can be handled.
+            Args:
+                @param time_info time dictionary of output
+                @returns True if output was written, False if an error
+                 occurred, or None if pcp_combine must be run instead
+        """
+        keys = self.get_in_process_fields()
+        output_name = next((arg[len('-name '):] for arg in self.args
+                            if arg.startswith('-name ')), None)
+        if keys is None or output_name is None:
+            self.logger.debug("Cannot build accumulation in process, "
+                              "running pcp_combine")
+            return None
+
+        out_path = self.get_output_path()
+        self.logger.info(f"Adding {len(keys)} fields in process to create {out_path}")
+        if self.config.getbool('config', 'DO_NOT_RUN_EXE', False):
+            return True
+
+        reads = self.accum_engine.reads
+        try:
+            data = self.accum_engine.add(keys)
+            self.accum_engine.write_output(out_path, data, keys[0], output_name,
+                                           time_info, time_info['level'])
+        except (OSError, ValueError) as err:
+            self.log_error(f"Could not build accumulation in process: {err}")
+            return False
+
+        self.logger.debug(f"Read {self.accum_engine.reads - reads} new fields")
+        return True
+
     def setup_subtract_method(self, time_info, var_info, data_src):
         """!Setup pcp_combine to subtract two files to build desired accumulation
         Args:
@@ -699,9 +1006,8 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
                                 level=accum,
                                 **time_info)
         file1_expected = os.path.join(in_dir, pcpSts1.do_string_sub())
-        file1 = util.preprocess_file(file1_expected,
-                                     self.c_dict[data_src+'_INPUT_DATATYPE'],
-                                     self.config)
+        file1 = self.find_input_path(file1_expected,
+                                       self.c_dict[data_src+'_INPUT_DATATYPE'])
 
         if file1 is None:
             self.log_error(f'Could not find {data_src} file {file1_expected} using template {in_template}')
@@ -730,9 +1036,8 @@ class PCPCombineWrapper(ReformatGriddedWrapper):
                                 level=accum,
                                 **time_info2)
         file2_expected = os.path.join(in_dir, pcpSts2.do_string_sub())
-        file2 = util.preprocess_file(file2_expected,
-                                     self.c_dict[data_src+'_INPUT_DATATYPE'],
-                                     self.config)
+        file2 = self.find_input_path(file2_expected,
+                                       self.c_dict[data_src+'_INPUT_DATATYPE'])
 
         if file2 is None:
             self.log_error(f'Could not find {data_src} file {file2_expected} using template {in_template}')
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+
+"""
+Program Name: plot_service.py
+Contact(s): George McCabe
+Abstract: Runs plotting scripts inside a persistent worker process instead
+ of starting a new Python interpreter for each script
+History Log:  Initial version
+Usage: Called by MakePlotsWrapper if MAKE_PLOTS_IN_PROCESS is True
+Parameters: None
+Input Files: N/A
+Output Files: N/A
+"""
+
+import os
+import sys
+import runpy
+import logging
+import traceback
+import multiprocessing
+
+'''!@namespace plot_service
+@brief Starts one worker process that imports numpy, pandas, and matplotlib
+once and then runs each plotting script with runpy as if it was called from
+the command line. The environment variables that the wrapper would pass to
+the script are set in the worker before each script is run and restored
+afterwards. Modules imported by the scripts, i.e. plot_util, stay loaded
+between scripts, so .stat files that plot_util already read are not read
+again. Scripts are run one at a time in the order they are submitted,
+because scripts read files written by the scripts run before them.
+@code{.sh}
+Cannot be called directly. These are helper functions
+to be used in other METplus wrappers
+@endcode
+'''
+
+def import_plot_libraries():
+    """!Import the libraries used by the plotting scripts once when the
+        worker process starts. Libraries that are not installed are
+        skipped, so the scripts that need them report the error"""
+    for module_name in ['numpy', 'pandas', 'matplotlib']:
+        try:
+            __import__(module_name)
+        except ImportError:
+            continue
+
+    if 'matplotlib' in sys.modules:
+        sys.modules['matplotlib'].use('agg')
+        import matplotlib.pyplot
+
+def run_plot_job(script_path, env):
+    """!Run a plotting script in the worker process
+        Args:
+            @param script_path path to the plotting script
+            @param env dictionary of environment variables to set
+            @returns tuple of return code (0 for success) and error message
+    """
+    saved_environ = dict(os.environ)
+    saved_path = list(sys.path)
+    log_name = env.get('LOG_METPLUS')
+    saved_handlers = list(logging.getLogger(log_name).handlers)
+
+    os.environ.clear()
+    os.environ.update(env)
+    # scripts import modules from their own directory
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script_path)))
+    try:
+        runpy.run_path(script_path, run_name='__main__')
+        return 0, ''
+    except SystemExit as exit_info:
+        if exit_info.code in (None, 0):
+            return 0, ''
+        code = exit_info.code if isinstance(exit_info.code, int) else 1
+        return code, f"{script_path} exited with {exit_info.code}"
+    except Exception:
+        return 1, traceback.format_exc()
+    finally:
+        if 'matplotlib.pyplot' in sys.modules:
+            sys.modules['matplotlib.pyplot'].close('all')
+
+        # scripts add a log file handler each time they are run
+        script_logger = logging.getLogger(log_name)
+        for handler in list(script_logger.handlers):
+            if handler not in saved_handlers:
+                script_logger.removeHandler(handler)
+                handler.close()
+
+        sys.path[:] = saved_path
+        os.environ.clear()
+        os.environ.update(saved_environ)
+
+def worker_loop(conn):
+    """!Run jobs received from the wrapper until None is received
+        Args:
+            @param conn connection to receive (script path, environment)
+             jobs and send the result of each job
+    """
+    import_plot_libraries()
+    while True:
+        job = conn.recv()
+        if job is None:
+            break
+        conn.send(run_plot_job(*job))
+    conn.close()
+
+class PlotService(object):
+    """!Persistent worker process that runs plotting scripts. The worker is
+        started when the first script is submitted and stopped by close"""
+    def __init__(self, logger):
+        self.logger = logger
+        self.process = None
+        self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def start(self):
+        """!Start the worker process"""
+        self.logger.debug("Starting plotting script worker process")
+        # fork so the worker starts with the modules already imported
+        context = multiprocessing.get_context('fork')
+        self.conn, worker_conn = context.Pipe()
+        self.process = context.Process(target=worker_loop, args=(worker_conn,),
+                                       daemon=True)
+        self.process.start()
+        worker_conn.close()
+
+    def run(self, script_path, env):
+        """!Run a plotting script and wait for it to finish. If the worker
+            process stopped unexpectedly, i.e. it crashed while running the
+            previous script, a new worker is started
+            Args:
+                @param script_path path to the plotting script
+                @param env dictionary of environment variables to set
+                @returns tuple of return code (0 for success) and error
+                 message
+        """
+        if self.process is None or not self.process.is_alive():
+            self.close()
+            self.start()
+
+        try:
+            self.conn.send((script_path, dict(env)))
+            return self.conn.recv()
+        except (EOFError, OSError):
+            self.close()
+            return 1, f"Plotting worker process stopped while running {script_path}"
+
+    def close(self):
+        """!Stop the worker process"""
+        if self.process is None:
+            return
+
+        try:
+            if self.process.is_alive():
+                self.conn.send(None)
+        except OSError:
+            pass
+        self.conn.close()
+        self.process.join(timeout=10)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.process = None
+        self.conn = None
@@ -1,3 +1,7 @@
+import os
+import pickle
+import hashlib
+import collections
 import numpy as np
 import datetime as datetime
 import time
@@ -337,6 +341,167 @@ def get_stat_file_line_type_columns(logger, met_version, line_type):
             ]
     return stat_file_line_type_columns
 
+# .stat files already read by this process, keyed by path, with the
+# least recently used first. Only the most recently used
+# STAT_FILE_CACHE_SIZE files are kept so a long running plotting
+# process does not keep every file it has read in memory
+STAT_FILE_CACHE_SIZE = 16
+stat_file_cache = collections.OrderedDict()
+
+def get_stat_file_cache_key(stat_file, met_version):
+    """! Get information that identifies the contents of a
+         MET .stat file, so a cached copy is only used if the
+         file has not changed
+
+             Args:
+                 stat_file   - string of the path to the .stat file
+                 met_version - string of MET version number
+                               being used to run stat_analysis
+
+             Returns:
+                 cache_key - tuple of the absolute path, size,
+                             modification time, and MET version
+    """
+    file_stat = os.stat(stat_file)
+    return (os.path.abspath(stat_file), file_stat.st_size,
+            file_stat.st_mtime_ns, str(met_version))
+
+def parse_stat_file(logger, met_version, stat_file):
+    """! Read the rows of a MET .stat file into a data frame
+         with the column names of the line type. The standard
+         columns are read as strings and the line type columns
+         are read as floats.
+
+             Args:
+                 met_version - string of MET version number
+                               being used to run stat_analysis
+                 stat_file   - string of the path to the .stat file
+
+             Returns:
+                 stat_file_data - data frame of the .stat file rows
+                                  or None if the file has no rows
+    """
+    stat_file_base_columns = get_stat_file_base_columns(met_version)
+    nbase_columns = len(stat_file_base_columns)
+    try:
+        stat_file_data = pd.read_csv(
+            stat_file, sep=" ", skiprows=1, skipinitialspace=True,
+            header=None, dtype={col: str for col in range(nbase_columns)}
+        )
+    except pd.errors.EmptyDataError:
+        return None
+    if len(stat_file_data) == 0:
+        return None
+    stat_file_data.rename(
+        columns=dict(zip(stat_file_data.columns[:nbase_columns],
+                         stat_file_base_columns)),
+        inplace=True
+    )
+    line_type = stat_file_data['LINE_TYPE'][0]
+    stat_file_line_type_columns = get_stat_file_line_type_columns(
+        logger, met_version, line_type
+    )
+    stat_file_data.rename(
+        columns=dict(zip(stat_file_data.columns[nbase_columns:],
+                         stat_file_line_type_columns)),
+        inplace=True
+    )
+    for column in stat_file_line_type_columns:
+        if column in stat_file_data.columns:
+            stat_file_data[column] = pd.to_numeric(
+                stat_file_data[column], errors='coerce'
+            ).astype(np.float64)
+    return stat_file_data
+
+def read_stat_file(logger, met_version, stat_file, cache_dir=''):
+    """! Read a MET .stat file, using a copy that was already
+         parsed if the file has not changed since. The most
+         recently used parsed files are kept in memory and, if
+         cache_dir is set, written
+         there so other plotting scripts and later runs can
+         load them without reading the text again.
+
+             Args:
+                 met_version - string of MET version number
+                               being used to run stat_analysis
+                 stat_file   - string of the path to the .stat file
+                 cache_dir   - string of the directory to store
+                               parsed files or empty string to
+                               only keep them in memory
+
+             Returns:
+                 stat_file_data - data frame from parse_stat_file
+                                  or None if the file has no rows
+    """
+    cache_key = get_stat_file_cache_key(stat_file, met_version)
+    cached = stat_file_cache.get(cache_key[0])
+    if cached is None or cached[0] != cache_key:
+        cached = None
+        cache_path = None
+        if cache_dir:
+            cache_path = os.path.join(
+                cache_dir,
+                hashlib.sha1(cache_key[0].encode('utf-8')).hexdigest()+'.pkl'
+            )
+            try:
+                with open(cache_path, 'rb') as cache_file:
+                    cached = pickle.load(cache_file)
+            except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+                cached = None
+            if cached is not None and cached[0] != cache_key:
+                cached = None
+        if cached is None:
+            cached = (cache_key,
+                      parse_stat_file(logger, met_version, stat_file))
+            if cache_path:
+                if not os.path.exists(cache_dir):
+                    os.makedirs(cache_dir, exist_ok=True)
+                # write then rename so a partial file is never read
+                tmp_cache_path = cache_path+'.'+str(os.getpid())+'.tmp'
+                with open(tmp_cache_path, 'wb') as cache_file:
+                    pickle.dump(cached, cache_file,
+                                protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_cache_path, cache_path)
+        stat_file_cache[cache_key[0]] = cached
+        while len(stat_file_cache) > STAT_FILE_CACHE_SIZE:
+            stat_file_cache.popitem(last=False)
+    stat_file_cache.move_to_end(cache_key[0])
+    if cached[1] is None:
+        return None
+    # scripts fill in missing values in place, so return a copy
+    return cached[1].copy()
+
+def align_stat_file_dates(stat_file_data, expected_dates, data_index,
+                          columns, date_column='FCST_VALID_BEG'):
+    """! Get the values from the rows of a .stat file for each
+         expected date. If more than one row has the same date,
+         the first row is used.
+
+             Args:
+                 stat_file_data - data frame of the .stat file rows,
+                                  i.e. from read_stat_file
+                 expected_dates - list of date strings in the
+                                  format used in date_column
+                 data_index     - index of the returned data frame,
+                                  with one entry for each expected
+                                  date in the same order
+                 columns        - list of columns to get
+                 date_column    - string of the column to match
+                                  the expected dates to
+
+             Returns:
+                 aligned_data - data frame with the values for
+                                each expected date or NaN for the
+                                dates that are not in the file
+    """
+    aligned_data = (
+        stat_file_data.drop_duplicates(subset=date_column, keep='first')
+        .set_index(date_column)
+        .reindex(index=expected_dates, columns=columns)
+    )
+    return pd.DataFrame(aligned_data.to_numpy(dtype=np.float64),
+                        index=data_index, columns=columns)
+
 def get_clevels(data):
     """! Get contour levels for plotting
   
@@ -406,6 +571,65 @@ def calculate_average(logger, average_method, stat, model_dataframe,
         exit(1)
     return average_array
 
+# largest number of values in each array of resampled data
+# built at once for EMC_MONTE_CARLO confidence intervals
+MONTE_CARLO_CHUNK_VALUES = 10000000
+
+def calculate_monte_carlo_scores(logger, average_method, stat,
+                                 rand_values, columns):
+    """! Calculate the average of the statistic for each set
+         of resampled data used in the Monte Carlo confidence
+         intervals. The statistic is calculated for all sets
+         at once.
+
+             Args:
+                 logger         - logging file
+                 average_method - string of the method to
+                                  use to calculate the
+                                  average
+                 stat           - string of the statistic the
+                                  average is being taken for
+                 rand_values    - 3D array of .stat column values
+                                  [set, day, column]
+                 columns        - list of the .stat column names
+
+             Returns:
+                 scores         - array of the average value
+                                  for each set
+    """
+    nsets, ndays, ncolumns = rand_values.shape
+    if average_method == 'AGGREGATION':
+        rand_data = pd.DataFrame(
+            np.nansum(rand_values, axis=1)/ndays,
+            index=pd.Index(np.arange(nsets), name='model_plot_name'),
+            columns=columns
+        )
+        rand_stat_values, rand_stat_values_array, stat_plot_name = (
+            calculate_stat(logger, rand_data, stat)
+        )
+        scores = rand_stat_values_array[0,:]
+    elif average_method in ['MEAN', 'MEDIAN']:
+        rand_data = pd.DataFrame(
+            rand_values.reshape(nsets*ndays, ncolumns),
+            index=pd.MultiIndex.from_product(
+                [np.arange(nsets), np.arange(ndays)],
+                names=['model_plot_name', 'dates']
+            ),
+            columns=columns
+        )
+        rand_stat_values, rand_stat_values_array, stat_plot_name = (
+            calculate_stat(logger, rand_data, stat)
+        )
+        if average_method == 'MEAN':
+            scores = np.ma.mean(rand_stat_values_array[0,:,:], axis=1)
+        else:
+            scores = np.ma.median(rand_stat_values_array[0,:,:], axis=1)
+    else:
+        logger.error("Invalid entry for MEAN_METHOD, "
+                     +"use MEAN, MEDIAN, or AGGREGATION")
+        exit(1)
+    return np.ma.filled(np.ma.asarray(scores, dtype=np.float64), np.nan)
+
 def calculate_ci(logger, ci_method, modelB_values, modelA_values, total_days,
                  stat, average_method, randx):
     """! Calculate confidence intervals between two sets of data
@@ -445,50 +669,30 @@ def calculate_ci(logger, ci_method, modelB_values, modelA_values, total_days,
         elif ndays < 20:
             intvl = 2.228*modelB_modelA_std/np.sqrt(ndays-1)
     elif ci_method == 'EMC_MONTE_CARLO':
-        ntest, ntests = 1, 10000
-        scores_rand1 = np.empty(ntests)
-        scores_rand2 = np.empty(ntests)
+        ntests, ndays = 10000, total_days
+        columns = modelB_values.columns
+        modelA_array = (
+            modelA_values.reindex(columns=columns).to_numpy(dtype=np.float64)
+        )
+        modelB_array = modelB_values.to_numpy(dtype=np.float64)
+        # build the resampled data for as many tests at once as fit
+        # in MONTE_CARLO_CHUNK_VALUES
+        chunk_size = max(1, MONTE_CARLO_CHUNK_VALUES//(ndays*len(columns)))
         scores_diff = np.empty(ntests)
-        while ntest <= ntests:
-            rand1_data = pd.DataFrame(
-                np.nan, index=modelB_values.index,
-                columns=modelB_values.columns
-            )
-            replace_level= rand1_data.index.get_level_values(0)[0]
-            rand1_data.rename(index={replace_level: 'rand1'}, inplace=True)
-            rand2_data = pd.DataFrame(
-                np.nan, index=modelB_values.index,
-                columns=modelB_values.columns
-            )
-            replace_level= rand2_data.index.get_level_values(0)[0]
-            rand2_data.rename(index={replace_level: 'rand2'}, inplace=True)
-            nday, ndays = 1, total_days
-            while nday <= ndays:
-                if randx[ntest-1,nday-1] - 0.5 >= 0:
-                    rand1_data.iloc[nday-1,:] = modelA_values.iloc[nday-1,:]
-                    rand2_data.iloc[nday-1,:] = modelB_values.iloc[nday-1,:]
-                else:
-                    rand1_data.iloc[nday-1,:] = modelB_values.iloc[nday-1,:]
-                    rand2_data.iloc[nday-1,:] = modelA_values.iloc[nday-1,:]
-                nday+=1
-            rand1_stat_values, rand1_stat_values_array, stat_plot_name = (
-                calculate_stat(logger, rand1_data, stat)
-            )
-            rand2_stat_values, rand2_stat_values_array, stat_plot_name = (
-                calculate_stat(logger, rand2_data, stat)
+        for chunk_beg in range(0, ntests, chunk_size):
+            chunk_end = min(chunk_beg+chunk_size, ntests)
+            use_modelA = (
+                randx[chunk_beg:chunk_end,:ndays] - 0.5 >= 0
+            )[:,:,np.newaxis]
+            rand1_values = np.where(use_modelA, modelA_array, modelB_array)
+            rand2_values = np.where(use_modelA, modelB_array, modelA_array)
+            scores_rand1 = calculate_monte_carlo_scores(
+                logger, average_method, stat, rand1_values, columns
             )
-            rand1_average_array = calculate_average(logger, average_method,
-                                                    stat, rand1_data,
-                                                    rand1_stat_values_array[:,0,:])
-            scores_rand1[ntest-1] = rand1_average_array[0]
-            rand2_average_array = calculate_average(logger, average_method,
-                                                    stat, rand2_data,
-                                                    rand2_stat_values_array[:,0,:])
-            scores_rand2[ntest-1] = rand2_average_array[0]
-            scores_diff[ntest-1] = (
-                rand2_average_array[0] - rand1_average_array[0]
+            scores_rand2 = calculate_monte_carlo_scores(
+                logger, average_method, stat, rand2_values, columns
             )
-            ntest+=1
+            scores_diff[chunk_beg:chunk_end] = scores_rand2 - scores_rand1
         scores_diff_mean = np.sum(scores_diff)/ntests
         scores_diff_var = np.sum((scores_diff-scores_diff_mean)**2) 
         scores_diff_std = np.sqrt(scores_diff_var/(ntests-1))
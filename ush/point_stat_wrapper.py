@@ -131,6 +131,7 @@ class PointStatWrapper(CompareGriddedWrapper):
         self.clear()
 
         time_info = time_util.ti_calculate(input_dict)
+        self.c_dict['CURRENT_TIME_INFO'] = time_info
         var_list = util.parse_var_list(self.config, time_info,
                                        met_tool=self.app_name)
 
@@ -0,0 +1,407 @@
+#!/usr/bin/env python
+
+"""
+Program Name: preflight.py
+Contact(s): George McCabe
+Abstract: Check that the input files for every run time exist before
+ any wrappers are run
+History Log:  Initial version
+Usage: Called by met_util.run_metplus if PREFLIGHT_CHECK is True
+Parameters: None
+Input Files: N/A
+Output Files: preflight input file in LOG_DIR
+"""
+
+import os
+import json
+import glob
+import fnmatch
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import met_util as util
+import time_util
+import resource_usage
+import task_scheduler
+import string_template_substitution as sts
+
+'''!@namespace preflight
+@brief Fills in the input templates of each wrapper for every run time,
+forecast lead, and custom string, then checks if the files exist. Each
+input directory is read once with os.scandir, using a pool of threads,
+instead of checking each file separately. A line is written to a file in
+LOG_DIR for each run time with the files that are missing, and a summary
+is logged. If PREFLIGHT_SKIP_MISSING is True, wrappers skip the run
+times that are missing input instead of reporting errors when they reach
+them. Inputs in the output directory of a wrapper that runs earlier in the
+PROCESS_LIST and writes files that the wrapper reads (see
+task_scheduler.process_feeds) are counted as available, because they are
+created when the earlier wrapper runs. Only inputs found with an exact time
+match are checked. Data types that search for files within a time window
+are not checked.
+@code{.sh}
+Cannot be called directly. These are helper functions
+to be used in other METplus wrappers
+@endcode
+'''
+
+def get_preflight_path(config):
+    """!Get path to file to write input availability
+        Args:
+            @param config METplusConfig object
+            @returns path to file in LOG_DIR
+    """
+    filename = 'preflight_inputs'
+    log_timestamp = config.getstr('config', 'LOG_TIMESTAMP', '')
+    if log_timestamp:
+        filename += f'.{log_timestamp}'
+
+    return os.path.join(config.getdir('LOG_DIR'), f'{filename}.jsonl')
+
+def get_run_time_key(time_info):
+    """!Get key to identify a run time, forecast lead, and custom string"""
+    return (time_info.get('init'), time_info.get('valid'),
+            time_info.get('custom', ''))
+
+def get_checked_data_types(process):
+    """!Get data types of a wrapper that can be checked, i.e. FCST and OBS.
+        Data types must find files with CommandBuilder.find_data using an
+        exact time match.
+        Args:
+            @param process wrapper object
+            @returns list of data types
+    """
+    data_types = []
+    for key, template in process.c_dict.items():
+        if not key.endswith('_INPUT_TEMPLATE') or not template:
+            continue
+
+        data_type = key[:-len('_INPUT_TEMPLATE')]
+        if f'{data_type}_INPUT_DIR' not in process.c_dict:
+            continue
+
+        if process.c_dict.get(f'{data_type}_FILE_WINDOW_BEGIN') != 0 or \
+                process.c_dict.get(f'{data_type}_FILE_WINDOW_END') != 0:
+            continue
+
+        data_types.append(data_type)
+
+    return sorted(data_types)
+
+def get_expected_paths(process, data_type, time_info, var_list):
+    """!Fill in input templates for a data type and run time
+        Args:
+            @param process wrapper object
+            @param data_type type of data, i.e. FCST
+            @param time_info time dictionary
+            @param var_list field information from parse_var_list
+            @returns list of paths to input files, which may include
+             wildcards
+    """
+    data_dir = process.c_dict[f'{data_type}_INPUT_DIR']
+    paths = []
+    for template in process.c_dict[f'{data_type}_INPUT_TEMPLATE'].split(','):
+        template = template.strip()
+
+        # only need to check each field if the template uses the level
+        if 'level' in sts.get_tags(template) and var_list:
+            levels = {process.get_search_level(var_info, data_type)
+                      for var_info in var_list}
+        else:
+            levels = {'0'}
+
+        for level in sorted(levels):
+            filename = sts.StringSub(process.logger,
+                                     template,
+                                     level=(int(level.split('-')[0]) * 3600),
+                                     **time_info).do_string_sub()
+            path = os.path.join(data_dir, filename)
+            if path not in paths:
+                paths.append(path)
+
+    return paths
+
+def read_directories(dir_paths, num_threads):
+    """!Get names of files in each directory, reading directories in parallel
+        Args:
+            @param dir_paths list of directories to read
+            @param num_threads number of threads to use
+            @returns dictionary with directory as the key and set of file
+             names as the value. The set is empty if the directory does not
+             exist
+    """
+    def read_directory(dir_path):
+        try:
+            with os.scandir(dir_path or '.') as entries:
+                return {entry.name for entry in entries}
+        except OSError:
+            return set()
+
+    dir_paths = sorted(set(dir_paths))
+    if num_threads <= 1 or len(dir_paths) <= 1:
+        return {dir_path: read_directory(dir_path) for dir_path in dir_paths}
+
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        return dict(zip(dir_paths, executor.map(read_directory, dir_paths)))
+
+def get_candidate_names(filename):
+    """!Get file names that util.preprocess_file would accept for a file"""
+    names = [filename] + [filename + ext for ext in util.VALID_EXTENSIONS]
+    if filename.endswith('nc'):
+        names.append(filename[:-2] + 'grd')
+    return names
+
+def is_in_listing(path, listings):
+    """!Check if a file (or a compressed version of it) is in the directory
+        listings. Wildcards are only supported in the file name
+        Args:
+            @param path file path, may contain wildcards
+            @param listings dictionary from read_directories
+            @returns True if file was found
+    """
+    dir_path, filename = os.path.split(path)
+    listing = listings.get(dir_path, set())
+    if '*' in filename or '?' in filename:
+        return bool(fnmatch.filter(listing, filename))
+
+    return any(name in listing for name in get_candidate_names(filename))
+
+def find_missing_paths(paths, config, num_threads):
+    """!Check which paths cannot be found in the input directories or the
+        staging directory
+        Args:
+            @param paths list of file paths to check
+            @param config METplusConfig object
+            @param num_threads number of threads to use to read directories
+            @returns set of paths that were not found
+    """
+    check_paths = set()
+    missing = set()
+    for path in paths:
+        if os.path.basename(path) in util.PYTHON_EMBEDDING_TYPES:
+            continue
+
+        # wildcards in directory names are rare, so check them directly
+        if '*' in os.path.dirname(path) or '?' in os.path.dirname(path):
+            if not glob.glob(path):
+                missing.add(path)
+            continue
+
+        check_paths.add(path)
+
+    listings = read_directories([os.path.dirname(path) for path in check_paths],
+                                num_threads)
+    not_found = {path for path in check_paths
+                 if not is_in_listing(path, listings)}
+
+    # files may have already been uncompressed to the staging directory
+    stage_dir = config.getdir('STAGING_DIR')
+    stage_paths = {path: stage_dir + path for path in not_found
+                   if '*' not in path and '?' not in path}
+    stage_listings = read_directories([os.path.dirname(path)
+                                       for path in stage_paths.values()],
+                                      num_threads)
+    for path in not_found:
+        stage_path = stage_paths.get(path)
+        if stage_path is None or \
+                os.path.basename(stage_path) not in \
+                stage_listings.get(os.path.dirname(stage_path), set()):
+            missing.add(path)
+
+    return missing
+
+def get_upstream_output_dirs(processes, index):
+    """!Get output directories of the wrappers that run before a wrapper in
+        the PROCESS_LIST and write files that it reads
+        Args:
+            @param processes list of wrapper objects in PROCESS_LIST order
+            @param index index of the wrapper to check
+            @returns set of directories
+    """
+    out_dirs = set()
+    for upstream in processes[:index]:
+        if not task_scheduler.process_feeds(upstream, processes[index]):
+            continue
+
+        dirs, _ = task_scheduler.get_template_paths(upstream, 'OUTPUT')
+        # directories from templates that contain tags cannot be compared
+        out_dirs.update(out_dir for out_dir in dirs if '{' not in out_dir)
+
+    return out_dirs
+
+def is_upstream_output(path, upstream_dirs):
+    """!Check if a file will be written by a wrapper that runs earlier
+        Args:
+            @param path input file path
+            @param upstream_dirs directories from get_upstream_output_dirs
+            @returns True if the file is in one of the directories
+    """
+    dir_path = os.path.normpath(os.path.dirname(path))
+    return any(task_scheduler.is_subdir(dir_path, out_dir)
+               for out_dir in upstream_dirs)
+
+def get_run_time_inputs(config, process, data_types, run_times=None):
+    """!Get input files needed for every run time, forecast lead, and custom
+        string processed by a wrapper
+        Args:
+            @param config METplusConfig object
+            @param process wrapper object
+            @param data_types list of data types to check
+            @param run_times list of init or valid times to check. If None,
+             all run times from the config are checked
+            @returns list of tuples of time dictionary and a list of the
+             options for each data type. Each option is a list of paths that
+             must all exist, i.e. one option for each observation offset.
+    """
+    if run_times is None:
+        run_times = util.get_run_times(config)
+    if not run_times:
+        return []
+
+    clock_time = datetime.datetime.strptime(config.getstr('config', 'CLOCK_TIME'),
+                                            '%Y%m%d%H%M%S')
+    loop_key = 'init' if util.is_loop_by_init(config) else 'valid'
+    offsets = process.c_dict.get('OFFSETS', [0])
+
+    run_time_inputs = []
+    for run_time in run_times:
+        input_dict = {'now': clock_time, loop_key: run_time}
+        for lead in util.get_lead_sequence(config, input_dict):
+            input_dict['lead'] = lead
+            time_info = time_util.ti_calculate(input_dict)
+            if util.skip_time(time_info, config):
+                continue
+
+            for custom_string in process.c_dict['CUSTOM_LOOP_LIST']:
+                time_info['custom'] = custom_string
+                var_list = util.parse_var_list(config, time_info,
+                                               met_tool=process.app_name)
+                options_by_type = []
+                for data_type in data_types:
+                    # observations may be found at any of the offsets
+                    type_offsets = offsets if data_type.startswith('OBS') else [0]
+                    options = []
+                    for offset in type_offsets:
+                        offset_info = time_info
+                        if offset:
+                            offset_info = time_util.ti_calculate(dict(input_dict,
+                                                                      offset_hours=offset))
+                            offset_info['custom'] = custom_string
+                        options.append(get_expected_paths(process, data_type,
+                                                          offset_info, var_list))
+                    options_by_type.append(options)
+
+                run_time_inputs.append((dict(time_info), options_by_type))
+
+    return run_time_inputs
+
+def check_process_inputs(config, process, num_threads, run_times=None,
+                         upstream_dirs=None):
+    """!Check input files for all run times of a wrapper
+        Args:
+            @param config METplusConfig object
+            @param process wrapper object
+            @param num_threads number of threads to use to read directories
+            @param run_times list of init or valid times to check. If None,
+             all run times from the config are checked
+            @param upstream_dirs directories from get_upstream_output_dirs.
+             Files in these directories are counted as available
+            @returns list of dictionaries, one for each run time, with the
+             time information, True/False if all inputs are available, and
+             the list of missing files
+    """
+    data_types = get_checked_data_types(process)
+    if not data_types:
+        return []
+
+    run_time_inputs = get_run_time_inputs(config, process, data_types,
+                                          run_times)
+    all_paths = {path
+                 for _, options_by_type in run_time_inputs
+                 for options in options_by_type
+                 for paths in options
+                 for path in paths}
+    if upstream_dirs:
+        all_paths = {path for path in all_paths
+                     if not is_upstream_output(path, upstream_dirs)}
+    missing = find_missing_paths(all_paths, config, num_threads)
+
+    records = []
+    for time_info, options_by_type in run_time_inputs:
+        missing_paths = []
+        for options in options_by_type:
+            option_missing = [[path for path in paths if path in missing]
+                              for paths in options]
+            # data type is available if any option has no missing files
+            if not all(option_missing):
+                continue
+            missing_paths.extend(option_missing[0])
+
+        records.append({'time_info': time_info,
+                        'available': not missing_paths,
+                        'missing': missing_paths,
+                        'paths': [path
+                                  for options in options_by_type
+                                  for paths in options
+                                  for path in paths]})
+
+    return records
+
+def run_preflight_check(config, processes):
+    """!Check input files for every wrapper and run time before any wrappers
+        are run if PREFLIGHT_CHECK is True. Writes the availability of each
+        run time to a file in LOG_DIR and logs a summary. If
+        PREFLIGHT_SKIP_MISSING is True, each wrapper is told which run times
+        to skip. Input files written by earlier wrappers are counted as
+        available.
+        Args:
+            @param config METplusConfig object
+            @param processes list of wrapper objects
+    """
+    if not config.getbool('config', 'PREFLIGHT_CHECK', False):
+        return
+
+    num_threads = config.getint('config', 'PREFLIGHT_CHECK_THREADS', 8)
+    skip_missing = config.getbool('config', 'PREFLIGHT_SKIP_MISSING', False)
+    logger = config.logger
+    out_path = get_preflight_path(config)
+
+    logger.info("Checking input files for all run times")
+    with open(out_path, 'w') as file_handle:
+        for index, process in enumerate(processes):
+            process_name = util.get_process_name(process)
+            upstream_dirs = get_upstream_output_dirs(processes, index)
+            if upstream_dirs:
+                logger.info(f"{process_name}: Input files in "
+                            f"{', '.join(sorted(upstream_dirs))} are written "
+                            "by earlier wrappers and are not checked")
+
+            records = check_process_inputs(config, process, num_threads,
+                                           upstream_dirs=upstream_dirs)
+            if not records:
+                continue
+
+            missing_keys = set()
+            for record in records:
+                line = resource_usage.get_command_log_info(process_name,
+                                                           record['time_info'])
+                line['available'] = record['available']
+                line['missing'] = record['missing']
+                file_handle.write(json.dumps(line) + '\n')
+
+                if not record['available']:
+                    missing_keys.add(get_run_time_key(record['time_info']))
+
+            num_available = len(records) - len(missing_keys)
+            logger.info(f"{process_name}: {num_available} of {len(records)} "
+                        "run times have all input files")
+            if missing_keys and skip_missing:
+                logger.warning(f"{process_name}: Skipping {len(missing_keys)} "
+                               f"run times that are missing input. See "
+                               f"{out_path} for the missing files")
+                process.skip_run_times = {
+                    key: 'the pre-flight check found that input files are missing'
+                    for key in missing_keys
+                }
+
+    logger.info(f"Input file availability written to {out_path}")
@@ -697,6 +697,13 @@ class Pipeline(object):
             return -os.WTERMSIG(result)
         else:
             return -128
+    def rusage(self):
+        """!Returns a list of the resource usage (resource.struct_rusage
+        from os.wait4) of each process in the pipeline, or None if the
+        pipeline has not completed."""
+        m=self.__managed
+        if not m: return None
+        return [ m[pid][2] for pid in m ]
 
     def to_string(self):
         """!Calls self.communicate(), and returns the stdout from the
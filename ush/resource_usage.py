@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+
+"""
+Program Name: resource_usage.py
+Contact(s): George McCabe
+Abstract: Record the time and memory used by each command that is run
+History Log:  Initial version
+Usage: Called by CommandRunner and met_util.post_run_cleanup
+Parameters: None
+Input Files: N/A
+Output Files: resource usage file in LOG_DIR
+"""
+
+import os
+import json
+import datetime
+
+import time_util
+
+'''!@namespace resource_usage
+@brief Writes the wall clock time, user and system CPU time, and peak memory
+(maximum resident set size) of each command that is run to a file in LOG_DIR
+with one JSON object per line. Each line is tagged with the wrapper name, run
+time, forecast lead, and field if they are known. Lines are appended with a
+single write so commands run by parallel worker processes can share the file.
+A summary listing the slowest and most memory-hungry commands is logged at
+the end of the run.
+@code{.sh}
+Cannot be called directly. These are helper functions
+to be used in other METplus wrappers
+@endcode
+'''
+
+# number of commands to list in each section of the summary
+SUMMARY_COUNT = 5
+
+def get_resource_usage_path(config):
+    """!Get path to file to write resource usage, or None if
+        LOG_RESOURCE_USAGE is not True
+        Args:
+            @param config METplusConfig object
+            @returns path to resource usage file or None
+    """
+    if not config.getbool('config', 'LOG_RESOURCE_USAGE', False):
+        return None
+
+    filename = 'resource_usage'
+    log_timestamp = config.getstr('config', 'LOG_TIMESTAMP', '')
+    if log_timestamp:
+        filename += f'.{log_timestamp}'
+
+    return os.path.join(config.getdir('LOG_DIR'), f'{filename}.jsonl')
+
+def get_command_log_info(app_name, time_info=None, var_info=None):
+    """!Get information to identify a command in the resource usage file
+        Args:
+            @param app_name name of the wrapper or application
+            @param time_info time dictionary for the command, optional
+            @param var_info field information dictionary from
+             parse_var_list, optional
+            @returns dictionary of information
+    """
+    log_info = {'wrapper': app_name}
+    if time_info:
+        for key in ['init', 'valid']:
+            if isinstance(time_info.get(key), datetime.datetime):
+                log_info[key] = time_info[key].strftime('%Y%m%d%H%M%S')
+
+        if 'lead_string' in time_info:
+            log_info['lead'] = time_info['lead_string']
+        elif 'lead' in time_info:
+            log_info['lead'] = time_util.ti_get_lead_string(time_info['lead'])
+
+        if time_info.get('custom'):
+            log_info['custom'] = time_info['custom']
+
+    if var_info:
+        for data_type in ['fcst', 'obs', 'ens']:
+            name = var_info.get(f'{data_type}_name')
+            if name:
+                level = var_info.get(f'{data_type}_level', '')
+                log_info['field'] = f'{name} {level}'.strip()
+                break
+
+    return log_info
+
+def get_usage_record(the_exe, ret, wall_seconds, rusages, log_info=None):
+    """!Create dictionary of resource usage for a command
+        Args:
+            @param the_exe path to executable that was run
+            @param ret return code of command
+            @param wall_seconds elapsed time in seconds
+            @param rusages list of resource usage objects from os.wait4 for
+             each process that was run
+            @param log_info dictionary of information to identify command
+            @returns dictionary of resource usage
+    """
+    record = dict(log_info) if log_info else {}
+    record['command'] = os.path.basename(the_exe)
+    record['return_code'] = ret
+    record['wall_seconds'] = round(wall_seconds, 3)
+
+    if rusages:
+        record['user_seconds'] = round(sum(usage.ru_utime
+                                           for usage in rusages), 3)
+        record['sys_seconds'] = round(sum(usage.ru_stime
+                                          for usage in rusages), 3)
+        # ru_maxrss is in kilobytes on Linux
+        record['max_rss_kb'] = max(usage.ru_maxrss for usage in rusages)
+
+    return record
+
+def write_resource_usage(path, record):
+    """!Append resource usage for a command to file
+        Args:
+            @param path resource usage file
+            @param record dictionary from get_usage_record
+    """
+    line = json.dumps(record) + '\n'
+    # append with a single write so lines from other processes do not mix
+    file_handle = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o664)
+    try:
+        os.write(file_handle, line.encode('utf-8'))
+    finally:
+        os.close(file_handle)
+
+def read_resource_usage(path):
+    """!Read resource usage file
+        Args:
+            @param path resource usage file
+            @returns list of dictionaries, one for each command
+    """
+    records = []
+    if not os.path.exists(path):
+        return records
+
+    with open(path, 'r') as file_handle:
+        for line in file_handle:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+
+    return records
+
+def format_record(record):
+    """!Get string describing a command from the resource usage file"""
+    description = record.get('wrapper', record.get('command', ''))
+    for key in ['init', 'valid', 'lead', 'custom', 'field']:
+        if key in record:
+            description += f" {key}={record[key]}"
+
+    return description
+
+def log_resource_usage_summary(config):
+    """!Log total time used by each wrapper and the commands that took the
+        most time and memory if LOG_RESOURCE_USAGE is True
+        Args:
+            @param config METplusConfig object
+    """
+    path = get_resource_usage_path(config)
+    if path is None:
+        return
+
+    records = read_resource_usage(path)
+    if not records:
+        return
+
+    logger = config.logger
+    logger.info(f"Resource usage of {len(records)} commands written to {path}")
+
+    totals = {}
+    for record in records:
+        key = record.get('wrapper', record.get('command', ''))
+        total = totals.setdefault(key, [0, 0.0, 0.0])
+        total[0] += 1
+        total[1] += record.get('wall_seconds', 0)
+        total[2] += (record.get('user_seconds', 0) +
+                     record.get('sys_seconds', 0))
+
+    logger.info("Time used by each wrapper:")
+    for key, (count, wall, cpu) in sorted(totals.items(),
+                                          key=lambda item: -item[1][1]):
+        logger.info(f"  {key}: {count} commands, {wall:.1f} seconds wall, "
+                    f"{cpu:.1f} seconds CPU")
+
+    logger.info("Slowest commands:")
+    for record in sorted(records,
+                         key=lambda item: -item.get('wall_seconds', 0))[:SUMMARY_COUNT]:
+        logger.info(f"  {record['wall_seconds']:.1f} seconds: "
+                    f"{format_record(record)}")
+
+    memory_records = [record for record in records if 'max_rss_kb' in record]
+    if memory_records:
+        logger.info("Commands that used the most memory:")
+        for record in sorted(memory_records,
+                             key=lambda item: -item['max_rss_kb'])[:SUMMARY_COUNT]:
+            logger.info(f"  {record['max_rss_kb'] / 1024:.1f} MB: "
+                        f"{format_record(record)}")
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+
+"""
+Program Name: run_manifest.py
+Contact(s): George McCabe
+Abstract: Keeps track of commands that have already run successfully so
+ they can be skipped when METplus is run again
+History Log:  Initial version
+Usage: Called by CommandBuilder.build
+Parameters: None
+Input Files: Input files referenced in each command
+Output Files: manifest files in RUN_MANIFEST_DIR
+"""
+
+import os
+import re
+import json
+import time
+import shlex
+import hashlib
+
+'''!@namespace run_manifest
+@brief Writes a manifest entry for each command that runs successfully. The
+entry is stored in a file named by a hash of the wrapper name, the full
+command, and the environment variables set by the wrapper. It contains the
+state of each input file referenced in the command or in the values of the
+environment variables, i.e. climatology files or masks read through the MET
+config file, and of each output file that was written. Small files, i.e. MET config files and file lists, are
+stored by a hash of their contents. Other files are stored by size and
+modification time. When the same command is built again, it can be skipped
+if the entry exists and all of the inputs and outputs still match.
+@code{.sh}
+Cannot be called directly. These are helper functions
+to be used in other METplus wrappers
+@endcode
+'''
+
+# files smaller than this are compared by content instead of modification time
+SMALL_FILE_BYTES = 1024 * 1024
+
+# characters that separate file paths in environment variable values, i.e.
+# VERIF_MASK="/path/mask1.poly", "/path/mask2.nc"
+ENV_PATH_SEPARATORS = re.compile(r'[\s"\'\[\]{},;=]+')
+
+def get_file_state(path):
+    """!Get information used to tell if a file has changed
+        Args:
+            @param path file to check
+            @returns list of size and hash of contents for small files or
+             size and modification time in nanoseconds for other files, or
+             None if file does not exist
+    """
+    try:
+        file_stat = os.stat(path)
+    except OSError:
+        return None
+
+    if file_stat.st_size <= SMALL_FILE_BYTES:
+        with open(path, 'rb') as file_handle:
+            return [file_stat.st_size,
+                    hashlib.sha1(file_handle.read()).hexdigest()]
+
+    return [file_stat.st_size, file_stat.st_mtime_ns]
+
+def get_input_paths(cmd, exclude=None, env_values=None):
+    """!Get files that are referenced in a command
+        Args:
+            @param cmd command to check
+            @param exclude list of paths to ignore, i.e. output files
+            @param env_values list of environment variable values to also
+             search for file paths
+            @returns list of paths to files that exist
+    """
+    exclude = {os.path.normpath(path) for path in exclude} if exclude else set()
+
+    try:
+        tokens = shlex.split(cmd)[1:]
+    except ValueError:
+        tokens = cmd.split()[1:]
+
+    for value in env_values or []:
+        tokens.extend(ENV_PATH_SEPARATORS.split(value))
+
+    paths = []
+    for token in tokens:
+        if not token.startswith('/') and not token.startswith('.'):
+            continue
+
+        path = os.path.normpath(token)
+        if path in exclude or path in paths or not os.path.isfile(path):
+            continue
+
+        paths.append(path)
+
+    return paths
+
+def get_output_paths(output_path, start_time, file_prefix=None):
+    """!Get files that were written by a command
+        Args:
+            @param output_path output file or directory of the command
+            @param start_time time (seconds since epoch) that command started.
+             If output_path is a directory, files under it that were modified
+             after this time are returned
+            @param file_prefix if set and output_path is a directory, only
+             return files whose names start with this string so that files
+             written by other commands at the same time are not included
+            @returns list of output files
+    """
+    if not output_path:
+        return []
+
+    output_path = os.path.normpath(output_path)
+    if os.path.isfile(output_path):
+        return [output_path]
+
+    if not os.path.isdir(output_path):
+        return []
+
+    # allow for file systems that only store whole seconds
+    min_mtime = int(start_time)
+    outputs = []
+    for dirpath, _, filenames in os.walk(output_path):
+        for filename in sorted(filenames):
+            if file_prefix and not filename.startswith(file_prefix):
+                continue
+
+            path = os.path.join(dirpath, filename)
+            try:
+                if os.stat(path).st_mtime >= min_mtime:
+                    outputs.append(path)
+            except OSError:
+                continue
+
+    return outputs
+
+class ManifestEntry(object):
+    """!Manifest entry for a command. The state of the input files is read
+        when the entry is created, so it should be created right before the
+        command is run."""
+    def __init__(self, manifest_dir, app_name, cmd, env_vars, output_path,
+                 output_file_prefix=None):
+        """!Create entry for command
+            Args:
+                @param manifest_dir directory to write manifest files
+                @param app_name name of application that is run
+                @param cmd full command
+                @param env_vars dictionary of environment variables used by
+                 the command
+                @param output_path output file or directory of the command
+                @param output_file_prefix start of the names of the files
+                 the command writes if output_path is a directory
+        """
+        self.cmd = cmd
+        self.output_path = output_path
+        self.output_file_prefix = output_file_prefix
+        self.start_time = time.time()
+
+        key = json.dumps([app_name, cmd, sorted(env_vars.items())])
+        key_hash = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        self.path = os.path.join(manifest_dir, app_name, f'{key_hash}.json')
+
+        exclude = [output_path] if output_path else []
+        self.inputs = {path: get_file_state(path)
+                       for path in get_input_paths(cmd, exclude,
+                                                   env_vars.values())}
+
+    def is_current(self):
+        """!Check if command has already run with the same inputs and if
+            its outputs have not changed since
+            @returns True if command does not need to be run again
+        """
+        try:
+            with open(self.path, 'r') as file_handle:
+                saved = json.load(file_handle)
+        except (OSError, ValueError):
+            return False
+
+        if saved.get('cmd') != self.cmd or saved.get('inputs') != self.inputs:
+            return False
+
+        outputs = saved.get('outputs')
+        if not outputs:
+            return False
+
+        for path, state in outputs.items():
+            try:
+                file_stat = os.stat(path)
+            except OSError:
+                return False
+
+            if [file_stat.st_size, file_stat.st_mtime_ns] != state:
+                return False
+
+        return True
+
+    def save(self):
+        """!Write entry after command ran successfully. Nothing is written
+            if no output files can be found, because the command could not
+            be checked later
+            @returns True if entry was written, False if not
+        """
+        outputs = {}
+        for path in get_output_paths(self.output_path, self.start_time,
+                                     self.output_file_prefix):
+            file_stat = os.stat(path)
+            outputs[path] = [file_stat.st_size, file_stat.st_mtime_ns]
+
+        if not outputs:
+            return False
+
+        entry_dir = os.path.dirname(self.path)
+        if not os.path.exists(entry_dir):
+            os.makedirs(entry_dir, exist_ok=True)
+
+        # write to temporary file then rename so a partial entry is never read
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as file_handle:
+            json.dump({'cmd': self.cmd,
+                       'inputs': self.inputs,
+                       'outputs': outputs}, file_handle)
+        os.replace(tmp_path, self.path)
+        return True
@@ -38,6 +38,9 @@ class SeriesAnalysisWrapper(CompareGriddedWrapper):
     def create_c_dict(self):
         c_dict = super().create_c_dict()
 
+        # file lists are reused between commands, so run one at a time
+        c_dict['MAX_CONCURRENT_PROCS'] = 1
+
         c_dict['VERBOSITY'] = self.config.getstr('config', 'LOG_SERIES_ANALYSIS_VERBOSITY',
                                                  c_dict['VERBOSITY'])
         c_dict['ALLOW_MULTIPLE_FILES'] = True
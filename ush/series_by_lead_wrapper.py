@@ -7,6 +7,9 @@ import os
 import sys
 import errno
 import glob
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 from regrid_data_plane_wrapper import RegridDataPlaneWrapper
 
@@ -14,7 +17,9 @@ import produtil.setup
 import met_util as util
 import time_util
 import feature_util
+import netcdf_util
 from command_builder import CommandBuilder
+from command_runner import CommandRunner
 import config_metplus
 from tc_stat_wrapper import TCStatWrapper
 from regrid_data_plane_wrapper import RegridDataPlaneWrapper
@@ -55,10 +60,8 @@ class SeriesByLeadWrapper(CommandBuilder):
                                'plot_data_plane')
 
         self.convert_exe = self.config.getexe('CONVERT')
-        self.ncap2_exe = self.config.getexe('NCAP2')
-        self.ncdump_exe = self.config.getexe('NCDUMP')
         self.rm_exe = self.config.getexe("RM")
-        if not self.convert_exe or not self.ncap2_exe or not self.ncdump_exe or not self.rm_exe:
+        if not self.convert_exe or not self.rm_exe:
             self.isOK = False
 
         met_bin_dir = self.config.getdir('MET_BIN_DIR', '')
@@ -207,11 +210,9 @@ class SeriesByLeadWrapper(CommandBuilder):
                               " forecast hours...")
             self.perform_series_for_fhr_groups(tile_dir)
 
-        # Generate plots in NetCDF, png, and Postscript.
-        self.generate_plots(do_fhr_by_range)
-
-        # Create animated gif
-        self.create_animated_gifs(do_fhr_by_range)
+        # Generate plots in NetCDF, png, and Postscript and create each
+        # animated gif as soon as all of its plots have been created
+        self.generate_plots(do_fhr_by_range, create_gifs=True)
 
         self.logger.info("Finished with series analysis by lead")
 
@@ -607,89 +608,17 @@ class SeriesByLeadWrapper(CommandBuilder):
                  None:          If no max value is found.
         """
 
-        # pylint:disable=protected-access
-        # Need to call sys.__getframe() to get the filename and method/func
-        # for logging information.
-
-        # Useful for logging
-        cur_filename = sys._getframe().f_code.co_filename
-        cur_function = sys._getframe().f_code.co_name
-
-        # Determine the series_F<fhr> subdirectory where this netCDF file
-        # resides.
-        if do_fhr_by_range:
-            match = re.match(r'(.*/series_F[0-9]{3})/series_F[0-9]{3}.*nc',
-                             nc_var_file)
-        else:
-            match = re.match(r'(.*/.*/)series_F[0-9]{3}_to_F[0-9]{3}.*nc',
-                             nc_var_file)
-
-        if match:
-            base_nc_dir = match.group(1)
-        else:
-            msg = ("Cannot determine base directory path for " +
-                   "netCDF files... exiting")
-            self.log_error(msg)
-            sys.exit(1)
-
-        # TODO: critical. harden Do we ant to add -O overwrite option to
-        # all ncap2 commands?? If I restart and not delete output
-        # the user is prompted. This will pause any automation.
-
-        # Use NCO utility ncap2 to find the max for the variable and
-        # series_cnt_TOTAL pair.
-        nseries_nc_path = os.path.join(base_nc_dir, 'nseries.nc')
-
-        nco_nseries_cmd_parts = [self.ncap2_exe, ' -O -v -s ', '"',
-                                 'max=max(series_cnt_TOTAL)', '" ',
-                                 nc_var_file, ' ', nseries_nc_path]
-        nco_nseries_cmd = ''.join(nco_nseries_cmd_parts)
-        (ret, nco_nseries_cmd) = self.cmdrunner.run_cmd \
-            (nco_nseries_cmd, env=self.env, ismetcmd=False)
-
-        if ret != 0:
-            self.log_error(f"Command returned a non-zero return code: {nco_nseries_cmd}")
-            self.logger.info("Check the logfile for more information on why it failed")
-
-        # Create an ASCII file with the max value, which can be parsed.
-        nseries_txt_path = os.path.join(base_nc_dir, 'nseries.txt')
-
-        ncdump_max_cmd_parts = [self.ncdump_exe, ' ', nseries_nc_path,
-                                '> ', nseries_txt_path]
-        ncdump_max_cmd = ''.join(ncdump_max_cmd_parts)
-        (ret, ncdump_max_cmd) = self.cmdrunner.run_cmd \
-            (ncdump_max_cmd, env=self.env, ismetcmd=False, run_inshell=True)
-
-        if ret != 0:
-            self.log_error(f"Command returned a non-zero return code: {ncdump_max_cmd}")
-            self.logger.info("Check the logfile for more information on why it failed")
-
-
-        # Look for the max value for this netCDF file.
+        # Read the max series_cnt_TOTAL value directly from the netCDF file.
+        # The min/max of all statistics are read when the file is opened and
+        # cached, so later calls for the same file do not read it again.
         try:
-            with open(nseries_txt_path, 'r') as fmax:
-                for line in fmax:
-                    max_match = re.match(r'\s*max\s*=\s([-+]?\d*\.*\d*)',
-                                         line)
-                    if max_match:
-                        maximum = max_match.group(1)
-
-                        # Clean up any intermediate .nc and .txt files
-                        nseries_list = [self.rm_exe + ' -rf', ' ', base_nc_dir,
-                                        '/nseries.txt']
-                        nseries_cmd = ''.join(nseries_list)
-                        os.system(nseries_cmd)
-
-                        return maximum
-                    else:
-                        # Remove the nseries.nc file, it is no longer needed
-                        if os.path.isfile(nseries_nc_path):
-                            self.logger.debug("REMOVING OLD nc path file")
-                            os.remove(nseries_nc_path)
+            stats = netcdf_util.get_variable_min_max(nc_var_file)
+        except (OSError, RuntimeError) as err:
+            self.log_error(f"Could not read {nc_var_file}: {err}")
+            return None
 
-        except IOError:
-            msg = ("cannot open the max text file")
-            self.log_error(msg)
+        _, maximum = stats.get('series_cnt_TOTAL', (None, None))
+        return netcdf_util.format_value(maximum)
 
     def get_netcdf_min_max(self, do_fhr_by_range, nc_var_files, cur_stat):
         """! Determine the min and max for all lead times for each
@@ -712,139 +641,24 @@ class SeriesByLeadWrapper(CommandBuilder):
                    vmax:  The maximum
 
         """
-        max_temporary_files = []
-        min_temporary_files = []
-
-        # pylint:disable=protected-access
-        # Need to call sys.__getframe() to get the filename and method/func
-        # for logging information.
-        cur_filename = sys._getframe().f_code.co_filename
-        cur_function = sys._getframe().f_code.co_name
-
         # Initialize the threshold values for min and max.
         vmin = 999999.
         vmax = -999999.
 
+        stat_name = 'series_cnt_' + cur_stat
         for cur_nc in nc_var_files:
-            # Determine the series_F<fhr> subdirectory where this
-            # netCDF file resides.
-            if do_fhr_by_range:
-                match = re.match(r'(.*/series_F[0-9]{3})/series_F[0-9]{3}.*nc',
-                                 cur_nc)
-            else:
-                match = re.match(r'(.*/.*)/'
-                                 r'series_F[0-9]{3}_to_F[0-9]{3}.*nc', cur_nc)
-            if match:
-                base_nc_dir = match.group(1)
-                self.logger.debug("base nc dir: " + base_nc_dir)
-            else:
-                msg = ("Cannot determine base directory path " +
-                       "for netCDF files. Exiting...")
-                self.log_error(msg)
-                sys.exit(1)
-
-            # Create file paths for temporary files for min value...
-            min_nc_path = os.path.join(base_nc_dir, 'min.nc')
-            min_txt_path = os.path.join(base_nc_dir, 'min.txt')
-            min_temporary_files.append(min_nc_path)
-            min_temporary_files.append(min_txt_path)
-
-            # Clean up any temporary min files that might have been left over
-            #  from a previous run.
-            util.cleanup_temporary_files(min_temporary_files)
-
-            # Use NCO ncap2 to get the min for the current stat-var pairing.
-            nco_min_cmd_parts = [self.ncap2_exe, ' -O -v -s ', '"',
-                                 'min=min(series_cnt_', cur_stat, ')',
-                                 '" ', cur_nc, ' ', min_nc_path]
-            nco_min_cmd = ''.join(nco_min_cmd_parts)
-            self.logger.debug('nco_min_cmd: ' + nco_min_cmd)
-            (ret, nco_min_cmd) = self.cmdrunner.run_cmd \
-                (nco_min_cmd, env=self.env, ismetcmd=False)
-
-            if ret != 0:
-                self.log_error(f"Command returned a non-zero return code: {nco_min_cmd}")
-                self.logger.info("Check the logfile for more information on why it failed")
-
-            # now set up file paths for the max value...
-            max_nc_path = os.path.join(base_nc_dir, 'max.nc')
-            max_txt_path = os.path.join(base_nc_dir, 'max.txt')
-            max_temporary_files.append(max_nc_path)
-            max_temporary_files.append(max_txt_path)
-
-            # First, remove pre-existing max.txt and max.nc file from any
-            #  previous run.
-            util.cleanup_temporary_files(max_temporary_files)
-
-            # Using NCO ncap2 to perform arithmetic processing to retrieve
-            #  the max from each
-            # netCDF file's stat-var pairing.
-            nco_max_cmd_parts = [self.ncap2_exe, ' -O -v -s ', '"',
-                                 'max=max(series_cnt_', cur_stat, ')',
-                                 '" ', cur_nc, ' ', max_nc_path]
-            nco_max_cmd = ''.join(nco_max_cmd_parts)
-            self.logger.debug('nco_max_cmd: ' + nco_max_cmd)
-            (ret, nco_max_cmd) = self.cmdrunner.run_cmd(nco_max_cmd, env=self.env,
-                                                        ismetcmd=False)
-            if ret != 0:
-                self.log_error(f"Command returned a non-zero return code: {nco_max_cmd}")
-                self.logger.info("Check the logfile for more information on why it failed")
-
-            # Create ASCII files with the min and max values, using the
-            # NCO utility ncdump.
-            # These files can be parsed to determine the vmin and vmax.
-            ncdump_min_cmd_parts = [self.ncdump_exe, ' ', base_nc_dir,
-                                    '/min.nc > ', min_txt_path]
-            ncdump_min_cmd = ''.join(ncdump_min_cmd_parts)
-            (ret, ncdump_min_cmd) = self.cmdrunner.run_cmd \
-                (ncdump_min_cmd, env=self.env, ismetcmd=False, run_inshell=True)
-
-            if ret != 0:
-                self.log_error(f"Command returned a non-zero return code: {ncdump_min_cmd}")
-                self.logger.info("Check the logfile for more information on why it failed")
-
-
-            ncdump_max_cmd_parts = [self.ncdump_exe, ' ', base_nc_dir,
-                                    '/max.nc > ', max_txt_path]
-            ncdump_max_cmd = ''.join(ncdump_max_cmd_parts)
-            (ret, ncdump_max_cmd) = self.cmdrunner.run_cmd \
-                (ncdump_max_cmd, env=self.env, ismetcmd=False, run_inshell=True)
-
-            if ret != 0:
-                self.log_error(f"Command returned a non-zero return code: {ncdump_max_cmd}")
-                self.logger.info("Check the logfile for more information on why it failed")
-
-            # Search for 'min' in the min.txt file.
-            try:
-                with open(min_txt_path, 'r') as fmin:
-                    for line in fmin:
-                        min_match = re.match(r'\s*min\s*=\s([-+]?\d*\.*\d*)',
-                                             line)
-                        if min_match:
-                            cur_min = float(min_match.group(1))
-                            if cur_min < vmin:
-                                vmin = cur_min
-            except IOError:
-                msg = ("cannot open the min text file")
-                self.log_error(msg)
-
-            # Search for 'max' in the max.txt file.
+            # Read the min and max directly from the netCDF file
             try:
-                with open(max_txt_path, 'r') as fmax:
-                    for line in fmax:
-                        max_match = re.match(r'\s*max\s*=\s([-+]?\d*\.*\d*)',
-                                             line)
-                        if max_match:
-                            cur_max = float(max_match.group(1))
-                            if cur_max > vmax:
-                                vmax = cur_max
-            except IOError:
-                msg = ("cannot open the max text file")
-                self.log_error(msg)
+                stats = netcdf_util.get_variable_min_max(cur_nc)
+            except (OSError, RuntimeError) as err:
+                self.log_error(f"Could not read {cur_nc}: {err}")
+                continue
 
-            # Clean up min.nc, min.txt, max.nc and max.txt temporary files.
-            util.cleanup_temporary_files(min_temporary_files)
-            util.cleanup_temporary_files(max_temporary_files)
+            cur_min, cur_max = stats.get(stat_name, (None, None))
+            if cur_min is not None and cur_min < vmin:
+                vmin = cur_min
+            if cur_max is not None and cur_max > vmax:
+                vmax = cur_max
 
         return vmin, vmax
 
@@ -1050,15 +864,20 @@ class SeriesByLeadWrapper(CommandBuilder):
         return file_paths
 
 
-    def generate_plots(self, do_fhr_by_range):
+    def generate_plots(self, do_fhr_by_range, create_gifs=False):
         """! Generate the plots and animation GIFs for the series analysis
-             results.
+             results. The plots for every lead, variable, and statistic are
+             created in parallel using SERIES_ANALYSIS_PLOT_PROCESSES
+             workers.
 
              Args:
                  @param do_fhr_by_range   The boolean flag which indicates
                                        whether series analysis is to be
                                        performed for the entire range of fhrs,
                                        (True), or by groups of fhrs (False).
+                 @param create_gifs    If True, create the animated GIF for
+                                       each variable and statistic as soon as
+                                       all of its plots have been created.
 
              Returns: None
 
@@ -1093,6 +912,8 @@ class SeriesByLeadWrapper(CommandBuilder):
         # Get the name and level to set the NAME and LEVEL
         # environment variables that
         # are needed by the MET series analysis binary.
+        # commands to run for each plot, grouped by variable and statistic
+        plot_jobs = {}
         full_vars_list = feature_util.retrieve_var_name_levels(self.config)
         for cur_var in full_vars_list:
             name, level = cur_var
@@ -1113,6 +934,7 @@ class SeriesByLeadWrapper(CommandBuilder):
                 # Set environment variable required by MET
                 # application Plot_Data_Plane.
                 self.add_env_var('CUR_STAT', cur_stat)
+                stat_jobs = plot_jobs.setdefault((name, level, cur_stat), [])
                 vmin, vmax = self.get_netcdf_min_max(do_fhr_by_range,
                                                      nc_var_list,
                                                      cur_stat)
@@ -1192,32 +1014,22 @@ class SeriesByLeadWrapper(CommandBuilder):
 
                     plot_data_plane_cmd = ''.join(plot_data_plane_parts)
 
-                    # Since this wrapper is not using the CommandBuilder
-                    # to build the cmd, we need to add the met verbosity
-                    # level to the MET cmd created before we run
-                    # the command.
-                    plot_data_plane_cmd =\
-                        self.cmdrunner.insert_metverbosity_opt\
-                        (plot_data_plane_cmd)
-                    (ret, plot_data_plane_cmd) = self.cmdrunner.run_cmd\
-                        (plot_data_plane_cmd, env=self.env, app_name='plot_data_plane')
-
-                    if ret != 0:
-                        self.log_error(f"MET Command returned a non-zero return code: {plot_data_plane_cmd}")
-                        self.logger.info("Check the logfile for more information on why it failed")
-
                     # Create the convert command.
                     convert_parts = [self.convert_exe, ' -rotate 90 ',
                                      ' -background white -flatten ',
                                      ps_file, ' ', png_file]
                     convert_cmd = ''.join(convert_parts)
-                    (ret, convert_cmd) = self.cmdrunner.run_cmd(convert_cmd, env=self.env,
-                                                                ismetcmd=False)
 
-                    if ret != 0:
-                        self.log_error(f"Command returned a non-zero return code: {convert_cmd}")
-                        self.logger.info("Check the logfile for more information on why it failed")
+                    # save a copy of the environment because the values
+                    # change for each variable and statistic
+                    stat_jobs.append((plot_data_plane_cmd, convert_cmd,
+                                      self.env.copy()))
 
+        gif_jobs = {}
+        if create_gifs:
+            gif_jobs = self.get_animated_gif_commands(do_fhr_by_range)
+
+        self.run_plot_jobs(plot_jobs, gif_jobs)
 
     def create_animated_gifs(self, do_fhr_by_range):
         """! Creates the animated GIF files from the .png files created in
@@ -1231,6 +1043,21 @@ class SeriesByLeadWrapper(CommandBuilder):
             Returns:
 
         """
+        self.run_plot_jobs({}, self.get_animated_gif_commands(do_fhr_by_range))
+
+    def get_animated_gif_commands(self, do_fhr_by_range):
+        """! Get the commands to create the animated GIF files from the .png
+             files created in generate_plots().
+
+             Args:
+                  @param do_fhr_by_range:  The boolean flag indicating whether
+                                        series analysis was performed on the
+                                        entire range (True) or on groups of
+                                        forecast hours (False).
+            Returns:
+                  dictionary with (name, level, statistic) as the key and a
+                  tuple of the convert command and environment as the value
+        """
 
         # pylint:disable=protected-access
         # Need to call sys.__getframe() to get the filename and method/func
@@ -1244,6 +1071,8 @@ class SeriesByLeadWrapper(CommandBuilder):
         self.logger.debug(msg)
         util.mkdir_p(animate_dir)
 
+        gif_jobs = {}
+
         # Get the name and level to set the NAME and LEVEL
         # environment variables that
         # are needed by the MET series analysis binary.
@@ -1255,7 +1084,6 @@ class SeriesByLeadWrapper(CommandBuilder):
 
             self.print_all_envs()
 
-            self.logger.info("Creating animated gifs")
             for cur_stat in self.stat_list:
                 if do_fhr_by_range:
                     series_dir = '/series_F*'
@@ -1270,14 +1098,6 @@ class SeriesByLeadWrapper(CommandBuilder):
                     animate_cmd = ''.join(gif_parts)
                     self.logger.debug("animate cmd: {}".format(animate_cmd))
 
-                    (ret, animate_cmd) = self.cmdrunner.run_cmd\
-                        (animate_cmd, env=self.env, ismetcmd=False,
-                         run_inshell=True, log_theoutput=True)
-
-                    if ret != 0:
-                        self.log_error(f"Command returned a non-zero return code: {animate_cmd}")
-                        self.logger.info("Check the logfile for more information on why it failed")
-
                 else:
                     # For series analysis by forecast hour groups, create a
                     # list of the series analysis output for all the forecast
@@ -1302,13 +1122,145 @@ class SeriesByLeadWrapper(CommandBuilder):
                                  cur_stat, '.gif']
 
                     animate_cmd = ''.join(gif_parts)
-                    (ret, animate_cmd) = self.cmdrunner.run_cmd \
-                        (animate_cmd, env=self.env, ismetcmd=False,
-                         run_inshell=True, log_theoutput=True)
 
+                gif_jobs[(name, level, cur_stat)] = (animate_cmd,
+                                                     self.env.copy())
+
+        return gif_jobs
+
+    def run_plot_jobs(self, plot_jobs, gif_jobs):
+        """! Run plot_data_plane and convert for each plot, using
+             SERIES_ANALYSIS_PLOT_PROCESSES workers to run commands at the
+             same time. Each animated GIF is created as soon as all of the
+             plots for its variable and statistic have been created. The
+             output of each job is written to its own log file and appended
+             to the log in the order the jobs were started, and failed
+             commands are reported from the main thread.
+
+             Args:
+                  @param plot_jobs: dictionary with (name, level, statistic)
+                                    as the key and a list of (plot_data_plane
+                                    command, convert command, environment)
+                                    tuples as the value
+                  @param gif_jobs: dictionary with (name, level, statistic)
+                                   as the key and a tuple of the convert
+                                   command and environment as the value
+            Returns:
+                  None
+        """
+        def run_job(cmds, log_file):
+            """!Run commands in order, stopping at the first one that fails.
+                Output is written to log_file so that it is not mixed with the
+                output of other jobs. Errors are reported by the main thread
+                @returns list of (return code, command) for each command run
+            """
+            # use separate command runner for each worker
+            cmdrunner = CommandRunner(self.config, logger=self.logger,
+                                      verbose=self.cmdrunner.verbose)
+            results = []
+            for cmd, env, kwargs in cmds:
+                (ret, cmd) = cmdrunner.run_cmd(cmd, env=env,
+                                               log_file=log_file, **kwargs)
+                results.append((ret, cmd))
+                if ret != 0:
+                    break
+            return results
+
+        # jobs in the order they were submitted and jobs that are running
+        submitted = []
+        pending = {}
+
+        def submit_job(executor, cmds, log_dest, key):
+            """!Start a job, writing its output to a temporary log file that
+                is appended to log_dest after the job finishes"""
+            log_file = None
+            if log_dest:
+                tmp_dir = self.config.getdir('TMP_DIR')
+                util.mkdir_p(tmp_dir)
+                file_handle, log_file = \
+                    tempfile.mkstemp(prefix='series_by_lead_', suffix='.log',
+                                     dir=tmp_dir)
+                os.close(file_handle)
+
+            future = executor.submit(run_job, cmds, log_file)
+            submitted.append((future, log_file, log_dest))
+            pending[future] = key
+
+        def merge_finished_jobs():
+            """!Append output of jobs that have finished to the log and report
+                any commands that failed, in the order the jobs were
+                submitted, stopping at the first job that is still running"""
+            while submitted and submitted[0][0].done():
+                future, log_file, log_dest = submitted.pop(0)
+                if log_file:
+                    with open(log_file, 'r') as job_log_handle, \
+                            open(log_dest, 'a+') as log_file_handle:
+                        shutil.copyfileobj(job_log_handle, log_file_handle)
+                    os.remove(log_file)
+
+                for ret, cmd in future.result():
                     if ret != 0:
-                        self.log_error(f"Command returned a non-zero return code: {animate_cmd}")
-                        self.logger.info("Check the logfile for more information on why it failed")
+                        self.log_error("Command returned a non-zero return "
+                                       f"code: {cmd}")
+                        self.logger.info("Check the logfile for more "
+                                         "information on why it failed")
+
+        plot_log = self.cmdrunner.cmdlog_destination(cmdlog='plot_data_plane.log')
+        gif_log = self.cmdrunner.cmdlog_destination()
+
+        def plot_cmds(plot_data_plane_cmd, convert_cmd, env):
+            """!Create PS plot with plot_data_plane and convert it to PNG"""
+            # Since this wrapper is not using the CommandBuilder
+            # to build the cmd, we need to add the met verbosity
+            # level to the MET cmd created before we run
+            # the command.
+            plot_data_plane_cmd = \
+                self.cmdrunner.insert_metverbosity_opt(plot_data_plane_cmd)
+            return [(plot_data_plane_cmd, env,
+                     {'app_name': 'plot_data_plane'}),
+                    (convert_cmd, env, {'ismetcmd': False})]
+
+        def gif_cmds(animate_cmd, env):
+            """!Create animated GIF from PNG files"""
+            return [(animate_cmd, env, {'ismetcmd': False,
+                                        'run_inshell': True,
+                                        'log_theoutput': True})]
+
+        num_procs = self.config.getint('config',
+                                       'SERIES_ANALYSIS_PLOT_PROCESSES', 1)
+        if gif_jobs:
+            self.logger.info("Creating animated gifs")
+
+        # number of plots remaining before each GIF can be created
+        remaining = {key: len(plot_jobs.get(key, [])) for key in gif_jobs}
+
+        # commands are run by external programs, so threads are sufficient
+        with ThreadPoolExecutor(max_workers=max(num_procs, 1)) as executor:
+            for key, stat_jobs in plot_jobs.items():
+                for plot_job in stat_jobs:
+                    submit_job(executor, plot_cmds(*plot_job), plot_log, key)
+
+            # GIFs that have no plots to wait for can be created now
+            for key, count in remaining.items():
+                if count == 0:
+                    submit_job(executor, gif_cmds(*gif_jobs[key]), gif_log,
+                               None)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = pending.pop(future)
+                    if key not in remaining:
+                        continue
+
+                    remaining[key] -= 1
+                    if remaining[key] == 0:
+                        submit_job(executor, gif_cmds(*gif_jobs[key]),
+                                   gif_log, None)
+
+                merge_finished_jobs()
+
+        merge_finished_jobs()
 
     def apply_series_filters(self, tile_dir, init_times, series_output_dir,
                              filter_opts, staging_dir):
@@ -1369,40 +1321,15 @@ class SeriesByLeadWrapper(CommandBuilder):
                 self.logger.debug(msg)
                 continue
             else:
-                # Now retrieve the files corresponding to these
-                # storm ids that resulted from filtering.
-                sorted_storm_ids = util.get_storm_ids(filter_filename,
-                                                      self.logger)
-
-                # Retrieve the header from filter_filename to be used in
-                # creating the temporary files.
-                with open(filter_filename, 'r') as filter_file:
-                    header = filter_file.readline()
-
-                for cur_storm in sorted_storm_ids:
-                    msg = ("Processing storm: " +
-                           cur_storm + " for file: " + filter_filename)
-                    self.logger.debug(msg)
-                    storm_output_dir = os.path.join(series_output_dir,
-                                                    cur_init, cur_storm)
-                    util.mkdir_p(storm_output_dir)
-
-                    tmp_file = "filter_" + cur_init + "_" + cur_storm
-                    tmp_filename = os.path.join(staging_dir, tmp_file)
-                    storm_match_list = util.grep(cur_storm, filter_filename)
-                    with open(tmp_filename, "w") as tmp_file:
-                        tmp_file.write(header)
-                        for storm_match in storm_match_list:
-                            tmp_file.write(storm_match)
-
-                    # Create the analysis and forecast files based
-                    # on the storms (defined in the tmp_filename created above)
-                    # Store the analysis and forecast files in the
-                    # series_output_dir.
-                    feature_util.retrieve_and_regrid(tmp_filename, cur_init,
-                                                     cur_storm,
-                                                     series_output_dir,
-                                                     self.config)
+                # Split the filter file by storm id in a single pass and
+                # create the analysis and forecast files for each storm.
+                # Store the analysis and forecast files in the
+                # series_output_dir.
+                feature_util.retrieve_and_regrid_storms(filter_filename,
+                                                        cur_init,
+                                                        series_output_dir,
+                                                        staging_dir,
+                                                        self.config)
 
         # Check for any empty files and directories and remove them to avoid
         # any errors or performance degradation when performing
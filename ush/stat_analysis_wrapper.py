@@ -22,9 +22,17 @@ import re
 import subprocess
 import datetime
 import itertools
+from collections import namedtuple
 import string_template_substitution as sts
 from command_builder import CommandBuilder
 
+# settings for one stat_analysis run, created for each combination of the
+# loop list items before any are run. settings is a tuple of (name, value)
+# pairs that are set as environment variables, lookin_dir is the -lookin
+# argument, and output_files is a tuple of the files the job writes
+StatAnalysisJob = namedtuple('StatAnalysisJob',
+                             'settings lookin_dir output_files')
+
 
 class StatAnalysisWrapper(CommandBuilder):
     """! Wrapper to the MET tool stat_analysis which is used to filter 
@@ -132,6 +140,14 @@ class StatAnalysisWrapper(CommandBuilder):
         c_dict['LINE_TYPE_LIST'] = util.getlist(
             self.config.getstr('config', 'LINE_TYPE_LIST', '')
         )
+        # each combination of loop list items is an independent
+        # stat_analysis run, so more than one can run at once
+        c_dict['MAX_CONCURRENT_PROCS'] = (
+            self.config.getint('config', 'STAT_ANALYSIS_MAX_CONCURRENT_PROCS',
+                               self.config.getint('config',
+                                                  'MET_MAX_CONCURRENT_PROCS',
+                                                  1))
+        )
         return c_dict
 
     def list_to_str(self, list_of_values):
@@ -1135,6 +1151,64 @@ class StatAnalysisWrapper(CommandBuilder):
 
         return level_list
 
+    def get_job(self, runtime_settings_dict, output_files):
+        """! Create the settings for one stat_analysis run. A copy of
+             the settings is made, so the dictionary can be changed
+             for the next run.
+
+             Args:
+                 runtime_settings_dict - dictionary of MET config
+                                         variable names and values,
+                                         including -lookin
+                 output_files          - list of files written by
+                                         the job
+
+             Returns:
+                 StatAnalysisJob with the settings of the run
+        """
+        return StatAnalysisJob(tuple(runtime_settings_dict.items()),
+                               runtime_settings_dict['-lookin'],
+                               tuple(output_files))
+
+    def run_jobs(self, job_list):
+        """! Run stat_analysis for each job. If
+             STAT_ANALYSIS_MAX_CONCURRENT_PROCS is greater than 1,
+             jobs are started without waiting for the previous job
+             to finish. The output of each job is added to the log
+             in order when wait_for_commands is called. A job that
+             writes the same file as a job that is still running
+             waits for it to finish.
+
+             Args:
+                 job_list - list of StatAnalysisJob to run
+
+             Returns:
+        """
+        running_output_files = set()
+        for job in job_list:
+            if running_output_files.intersection(job.output_files):
+                self.wait_for_commands()
+                running_output_files.clear()
+            running_output_files.update(job.output_files)
+
+            self.param = self.c_dict['CONFIG_FILE']
+            self.set_lookin_dir(job.lookin_dir)
+            # Set environment variables and run stat_analysis.
+            self.logger.debug("STAT_ANALYSIS RUN SETTINGS....")
+            for name, value in job.settings:
+                self.add_env_var(name, value)
+                self.logger.debug(name+": "+value)
+            cmd = self.get_command()
+            if cmd is None:
+                self.log_error("stat_analysis could not generate command")
+                return
+
+            # send environment variables to logger
+            self.print_all_envs()
+
+            self.build()
+            self.clear()
+
     def run_stat_analysis_job(self, date_beg, date_end, date_type):
         """! This runs stat_analysis over a period of valid
              or initialization dates for a job defined by
@@ -1285,8 +1359,9 @@ class StatAnalysisWrapper(CommandBuilder):
              runtime_setup_dict_names))]
         )
         # Loop over run settings.
+        job_list = []
         for runtime_settings_dict in runtime_settings_dict_list:
-            self.param = self.c_dict['CONFIG_FILE']
+            output_files = []
             # Set up stat_analysis -lookin argument, model and obs information
             # and stat_analysis job.
             job = '-job '+self.c_dict['JOB_NAME']+' '+self.c_dict['JOB_ARGS']
@@ -1358,7 +1433,6 @@ class StatAnalysisWrapper(CommandBuilder):
                     else:
                         out_stat_filename_type = 'user'
             runtime_settings_dict['-lookin'] = lookin_dir
-            self.set_lookin_dir(runtime_settings_dict['-lookin'])
             if '-dump_row' in self.c_dict['JOB_ARGS']:
                 dump_row_filename = (
                     self.get_output_filename('dump_row', 
@@ -1373,6 +1447,7 @@ class StatAnalysisWrapper(CommandBuilder):
                                              dump_row_filename)
                 job = job.replace('[dump_row_file]', dump_row_file)
                 job = job.replace('[dump_row_filename]', dump_row_file)
+                output_files.append(dump_row_file)
                 dump_row_output_dir = dump_row_file.rpartition('/')[0]
                 if not os.path.exists(dump_row_output_dir):
                    util.mkdir_p(dump_row_output_dir)
@@ -1390,6 +1465,7 @@ class StatAnalysisWrapper(CommandBuilder):
                                              out_stat_filename)
                 job = job.replace('[out_stat_file]', out_stat_file)
                 job = job.replace('[out_stat_filename]', out_stat_file)
+                output_files.append(out_stat_file)
                 out_stat_output_dir = out_stat_file.rpartition('/')[0]
                 if not os.path.exists(out_stat_output_dir):
                    util.mkdir_p(out_stat_output_dir)
@@ -1400,21 +1476,9 @@ class StatAnalysisWrapper(CommandBuilder):
                 self.format_valid_init(date_beg, date_end, date_type, 
                                        runtime_settings_dict)
             )
-            # Set environment variables and run stat_analysis.
-            self.logger.debug("STAT_ANALYSIS RUN SETTINGS....")
-            for name, value in runtime_settings_dict.items():
-                self.add_env_var(name, value)
-                self.logger.debug(name+": "+value)
-            cmd = self.get_command()
-            if cmd is None:
-                self.log_error("stat_analysis could not generate command")
-                return
-
-            # send environment variables to logger
-            self.print_all_envs()
-
-            self.build()
-            self.clear()
+            job_list.append(self.get_job(runtime_settings_dict,
+                                         output_files))
+        self.run_jobs(job_list)
 
     def filter_for_plotting(self):
         """! Special case for running stat_analysis over a period of 
@@ -1694,6 +1758,7 @@ class StatAnalysisWrapper(CommandBuilder):
             util.mkdir_p(output_base_dir)
         # Loop through variables and add information
         # to a special variable dictionary
+        job_list = []
         for var_info in var_info_list:
             var_info_formatted_c_dict = copy.deepcopy(formatted_c_dict)
             var_info_formatted_c_dict['FCST_VAR_LIST'] = var_info['fcst_name']
@@ -1798,7 +1863,6 @@ class StatAnalysisWrapper(CommandBuilder):
             )
             # Loop over run settings.
             for runtime_settings_dict in runtime_settings_dict_list:
-                self.param = self.c_dict['CONFIG_FILE']
                 # Set up stat_analysis -lookin argument, model and obs
                 # information and stat_analysis job.
                 job = '-job filter -dump_row '
@@ -1820,7 +1884,6 @@ class StatAnalysisWrapper(CommandBuilder):
                                                  lists_to_group_items,
                                                  runtime_settings_dict)
                 runtime_settings_dict['-lookin'] = lookin_dir
-                self.set_lookin_dir(runtime_settings_dict['-lookin'])
                 dump_row_filename_template = (
                     model_info['dump_row_filename_template']
                 )
@@ -1849,22 +1912,9 @@ class StatAnalysisWrapper(CommandBuilder):
                                            date_type, 
                                            runtime_settings_dict)
                 )
-                # Set environment variables and run stat_analysis.
-                self.logger.debug("STAT_ANALYSIS RUN SETTINGS....")
-                for name, value in runtime_settings_dict.items():
-                    self.add_env_var(name, value)
-                    self.logger.debug(name+": "+value)
-                cmd = self.get_command()
-                if cmd is None:
-                    self.log_error("stat_analysis could not generate "+
-                                      "command")
-                    return
-
-                # send environment variables to logger
-                self.print_all_envs()
-
-                self.build()
-                self.clear()
+                job_list.append(self.get_job(runtime_settings_dict,
+                                             [dump_row_file]))
+        self.run_jobs(job_list)
 
     def run_all_times(self):
         self.c_dict['DATE_TYPE'] = self.config.getstr('config', 'DATE_TYPE')
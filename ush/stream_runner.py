@@ -0,0 +1,388 @@
+#!/usr/bin/env python
+
+"""
+Program Name: stream_runner.py
+Contact(s): George McCabe
+Abstract: Runs the items in the PROCESS_LIST for each run time as soon as
+ their input files arrive
+History Log:  Initial version
+Usage: Called by met_util.run_metplus when STREAM_MODE is True
+Parameters: None
+Input Files: N/A
+Output Files: stream state file
+"""
+
+import os
+import json
+import time
+
+import met_util as util
+import preflight
+from produtil.fileop import check_file
+from task_scheduler import runs_once_per_time
+from compare_gridded_wrapper import CompareGriddedWrapper
+
+'''!@namespace stream_runner
+@brief Polls the input directories of each wrapper every STREAM_POLL_INTERVAL
+seconds and runs a wrapper for a run time once its input files exist and
+have not been modified for STREAM_MIN_FILE_AGE seconds. The input files are
+found using the same checks as the pre-flight check (see preflight.py), so
+each input directory is read once per poll. Wrappers that compare gridded
+data (i.e. GridStat) are run for each forecast lead as soon as its files
+arrive. Other wrappers are run once all of the input files for the run time
+have arrived. Wrappers whose inputs cannot be found from their input
+templates, i.e. PCPCombine, check their own inputs with
+check_run_time_inputs. Wrappers that cannot check their inputs at all are
+run right away. A wrapper runs for a run time only after the wrappers before
+it in the PROCESS_LIST have finished that run time. Wrappers that process
+all times at once (i.e. StatAnalysis) run after everything before them has
+finished and their inputs for all run times have arrived.
+The run times and forecast leads that have finished are written to
+STREAM_STATE_FILE after each step, so if METplus is stopped and started
+again it continues where it left off. Inputs are found by polling instead
+of file system events so it works on shared file systems.
+@code{.sh}
+Cannot be called directly. These are helper functions
+to be used in other METplus wrappers
+@endcode
+'''
+
+# key used in the state file for wrappers that process all times at once
+ALL_TIMES = 'ALL'
+
+def get_time_string(time_value):
+    """!Get string to store a time in the state file, or an empty string if
+        time is not set"""
+    return time_value.strftime('%Y%m%d%H%M%S') if time_value else ''
+
+def get_key_string(key):
+    """!Get string to store a run time key from preflight.get_run_time_key
+        in the state file"""
+    init, valid, custom = key
+    return f'{get_time_string(init)}_{get_time_string(valid)}_{custom}'
+
+def get_state_names(processes):
+    """!Get name of each wrapper to use in the state file. A number is added
+        if a wrapper appears in the PROCESS_LIST more than once"""
+    names = []
+    for process in processes:
+        name = util.get_process_name(process)
+        if name in names:
+            name = f'{name}_{names.count(name) + 1}'
+        names.append(name)
+    return names
+
+class StreamState(object):
+    """!Run times and forecast leads that each wrapper has finished"""
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        self.completed = {}
+        self.read()
+
+    def read(self):
+        """!Read state file if it exists"""
+        try:
+            with open(self.path, 'r') as file_handle:
+                saved = json.load(file_handle)
+        except (OSError, ValueError):
+            return
+
+        self.done = {name: set(values)
+                     for name, values in saved.get('done', {}).items()}
+        self.completed = {name: set(values)
+                          for name, values in saved.get('completed', {}).items()}
+
+    def save(self):
+        """!Write state file. A temporary file is written then renamed so a
+            partial file is never read if METplus is stopped while writing"""
+        state_dir = os.path.dirname(self.path)
+        if state_dir and not os.path.exists(state_dir):
+            os.makedirs(state_dir, exist_ok=True)
+
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as file_handle:
+            json.dump({'done': {name: sorted(values)
+                                for name, values in self.done.items()},
+                       'completed': {name: sorted(values)
+                                     for name, values in self.completed.items()},
+                       }, file_handle)
+        os.replace(tmp_path, self.path)
+
+    def is_done(self, name, run_time):
+        """!Check if a wrapper has finished a run time
+            Args:
+                @param name wrapper name from get_state_names
+                @param run_time init or valid time or None for wrappers that
+                 process all times at once
+                @returns True if finished
+        """
+        time_string = get_time_string(run_time) or ALL_TIMES
+        return time_string in self.done.get(name, set())
+
+    def set_done(self, name, run_time):
+        """!Mark a run time (or all times if run_time is None) as finished"""
+        time_string = get_time_string(run_time) or ALL_TIMES
+        self.done.setdefault(name, set()).add(time_string)
+
+    def is_completed(self, name, key):
+        """!Check if a wrapper has finished a forecast lead and custom string
+            of a run time
+            Args:
+                @param name wrapper name from get_state_names
+                @param key tuple from preflight.get_run_time_key
+                @returns True if finished
+        """
+        return get_key_string(key) in self.completed.get(name, set())
+
+    def set_completed(self, name, key):
+        """!Mark a forecast lead and custom string of a run time as finished"""
+        self.completed.setdefault(name, set()).add(get_key_string(key))
+
+def get_state_path(config):
+    """!Get path to file that stores the progress of stream mode"""
+    return config.getstr('config', 'STREAM_STATE_FILE',
+                         os.path.join(config.getdir('OUTPUT_BASE'),
+                                      'stream_state.json'))
+
+def is_file_settled(path, min_age):
+    """!Check if a file that was found has not been modified recently, so
+        it is not still being written. Files that were found using wildcards
+        or in the staging directory are not checked
+        Args:
+            @param path file path from preflight.check_process_inputs
+            @param min_age number of seconds since the file was last modified
+            @returns True if file is old enough or could not be checked
+    """
+    if min_age <= 0:
+        return True
+
+    dir_path, filename = os.path.split(path)
+    for name in preflight.get_candidate_names(filename):
+        candidate = os.path.join(dir_path, name)
+        if os.path.exists(candidate):
+            return check_file(candidate, min_size=0, min_mtime_age=min_age)
+
+    return True
+
+def is_ready(record, min_age):
+    """!Check if all input files of a record from
+        preflight.check_process_inputs have arrived"""
+    if not record['available']:
+        return False
+
+    return all(is_file_settled(path, min_age) for path in record['paths']
+               if '*' not in path and '?' not in path)
+
+def previous_done(state, processes, names, index, run_time, run_times):
+    """!Check if the wrappers before a wrapper in the PROCESS_LIST have
+        finished a run time
+        Args:
+            @param state StreamState object
+            @param processes list of wrapper objects
+            @param names list of names from get_state_names
+            @param index index of the wrapper to check
+            @param run_time init or valid time, or None to check that all
+             run times have finished
+            @param run_times list of all run times
+            @returns True if all previous wrappers are finished
+    """
+    check_times = run_times if run_time is None else [run_time]
+    for process, name in zip(processes[:index], names[:index]):
+        if not runs_once_per_time(process):
+            if not state.is_done(name, None):
+                return False
+            continue
+
+        if not all(state.is_done(name, check_time)
+                   for check_time in check_times):
+            return False
+
+    return True
+
+def wrapper_inputs_ready(config, process, run_time, min_age):
+    """!Check if the input files of a run time exist using the wrapper's
+        check_run_time_inputs, for wrappers whose inputs cannot be checked
+        with the pre-flight check, i.e. PCPCombine
+        Args:
+            @param config METplusConfig object
+            @param process wrapper object
+            @param run_time init or valid time to check
+            @param min_age minimum number of seconds since input files were
+             modified
+            @returns True if all inputs have arrived or the wrapper cannot
+             check its inputs, False if not
+    """
+    loop_key = 'init' if util.is_loop_by_init(config) else 'valid'
+    found = process.check_run_time_inputs({loop_key: run_time})
+    if found is None:
+        return True
+
+    all_found, paths = found
+    return all_found and all(is_file_settled(path, min_age) for path in paths
+                             if '*' not in path and '?' not in path)
+
+def run_stream_step(config, process, name, run_time, state, records,
+                    min_age):
+    """!Run a wrapper for the forecast leads of a run time that are ready.
+        Wrappers that compare gridded data skip the leads that are not
+        ready or were already processed. Other wrappers are only run once
+        all leads are ready. If the pre-flight check cannot check the inputs
+        of the wrapper, the wrapper checks them itself.
+        Args:
+            @param config METplusConfig object
+            @param process wrapper object
+            @param name wrapper name from get_state_names
+            @param run_time init or valid time to process
+            @param state StreamState object
+            @param records list of records from
+             preflight.check_process_inputs for the run time
+            @param min_age minimum number of seconds since input files were
+             modified
+            @returns True if the wrapper was run, False if nothing was ready
+    """
+    skip_run_times = {}
+    ready_keys = []
+    for record in records:
+        key = preflight.get_run_time_key(record['time_info'])
+        if state.is_completed(name, key):
+            skip_run_times[key] = 'it was already processed'
+        elif is_ready(record, min_age):
+            ready_keys.append(key)
+        else:
+            skip_run_times[key] = 'input files have not arrived yet'
+
+    if records and not ready_keys:
+        return False
+
+    partial = isinstance(process, CompareGriddedWrapper)
+    if not partial and len(ready_keys) != len(records):
+        return False
+
+    # directory listings cached by the wrapper may be out of date
+    if hasattr(process, 'clear_input_file_cache'):
+        process.clear_input_file_cache()
+
+    if not records and not wrapper_inputs_ready(config, process, run_time,
+                                                min_age):
+        return False
+
+    if partial:
+        process.skip_run_times = skip_run_times
+
+    util.log_run_time(config, run_time)
+    try:
+        util.run_process_at_time(config, process, run_time)
+    finally:
+        process.skip_run_times = {}
+
+    # leads that had errors are not run again, the same as other loop orders
+    for key in ready_keys:
+        state.set_completed(name, key)
+
+    if all(state.is_completed(name, preflight.get_run_time_key(record['time_info']))
+           for record in records):
+        state.set_done(name, run_time)
+
+    state.save()
+    return True
+
+def poll_once(config, processes, names, run_times, state):
+    """!Check for input files and run each wrapper for the run times that
+        are ready
+        Args:
+            @param config METplusConfig object
+            @param processes list of wrapper objects
+            @param names list of names from get_state_names
+            @param run_times list of all run times
+            @param state StreamState object
+            @returns True if any wrapper was run
+    """
+    num_threads = config.getint('config', 'PREFLIGHT_CHECK_THREADS', 8)
+    min_age = config.getint('config', 'STREAM_MIN_FILE_AGE', 0)
+    loop_key = 'init' if util.is_loop_by_init(config) else 'valid'
+
+    progress = False
+    for index, (process, name) in enumerate(zip(processes, names)):
+        if not runs_once_per_time(process):
+            if state.is_done(name, None) or \
+                    not previous_done(state, processes, names, index, None,
+                                      run_times):
+                continue
+
+            # wait until the inputs for all run times have arrived
+            records = preflight.check_process_inputs(config, process,
+                                                     num_threads, run_times)
+            if not all(is_ready(record, min_age) for record in records):
+                continue
+
+            with config.lookup_owner(name):
+                process.run_all_times()
+                process.wait_for_commands()
+                util.release_staged_files(config)
+            state.set_done(name, None)
+            state.save()
+            progress = True
+            continue
+
+        pending = [run_time for run_time in run_times
+                   if not state.is_done(name, run_time) and
+                   previous_done(state, processes, names, index, run_time,
+                                 run_times)]
+        if not pending:
+            continue
+
+        records_by_time = {run_time: [] for run_time in pending}
+        for record in preflight.check_process_inputs(config, process,
+                                                     num_threads, pending):
+            records_by_time[record['time_info'][loop_key]].append(record)
+
+        for run_time in pending:
+            if run_stream_step(config, process, name, run_time, state,
+                               records_by_time[run_time], min_age):
+                progress = True
+
+    return progress
+
+def run_stream(config, processes):
+    """!Run wrappers for each run time as input files arrive until all run
+        times have been processed or no input has arrived for
+        STREAM_IDLE_TIMEOUT seconds
+        Args:
+            @param config METplusConfig object
+            @param processes list of wrapper objects
+            @returns True if all run times were processed, False if not
+    """
+    run_times = util.get_run_times(config)
+    if run_times is None:
+        return False
+
+    poll_interval = config.getint('config', 'STREAM_POLL_INTERVAL', 60)
+    idle_timeout = config.getint('config', 'STREAM_IDLE_TIMEOUT', 0)
+    logger = config.logger
+
+    names = get_state_names(processes)
+    state_path = get_state_path(config)
+    state = StreamState(state_path)
+    logger.info(f"Running in stream mode. Progress is saved in {state_path}")
+
+    last_progress = time.time()
+    while True:
+        if poll_once(config, processes, names, run_times, state):
+            last_progress = time.time()
+
+        if all(state.is_done(name, run_time)
+               for process, name in zip(processes, names)
+               for run_time in (run_times if runs_once_per_time(process)
+                                else [None])):
+            logger.info("Stream mode finished processing all run times")
+            return True
+
+        if idle_timeout and time.time() - last_progress >= idle_timeout:
+            logger.error("No input files arrived for "
+                         f"{idle_timeout} seconds. Run again to continue "
+                         "processing the remaining run times")
+            return False
+
+        logger.debug(f"Waiting {poll_interval} seconds for input files")
+        time.sleep(poll_interval)
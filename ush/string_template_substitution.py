@@ -16,6 +16,7 @@ Condition codes: Varies
 
 import re
 import datetime
+from functools import lru_cache
 from dateutil.relativedelta import relativedelta
 
 import time_util
@@ -213,6 +214,66 @@ def add_to_dict(match, match_dict, full_str, new_len):
     # item was added or already existed in match dictionary
     return True
 
+class TemplateTag(object):
+    """!Pre-parsed template tag, i.e. {init?fmt=%Y%m%d?shift=-1H}
+        Args:
+            @param text full tag text including curly braces
+            @param split_string contents of tag split by FORMATTING_DELIMITER
+    """
+    def __init__(self, text, split_string):
+        self.text = text
+        self.split_string = split_string
+        # identifier, i.e. init, valid, lead
+        self.key = split_string[0]
+
+        # last shift or truncate item in tag is used if there are multiple
+        self.shift_item = None
+        self.truncate_item = None
+        for split_item in split_string:
+            if split_item.startswith(SHIFT_STRING):
+                self.shift_item = split_item
+            if split_item.startswith(TRUNCATE_STRING):
+                self.truncate_item = split_item
+
+        # indices of format items to process
+        self.format_indices = [idx for idx, split_item in enumerate(split_string)
+                               if split_item.startswith(FORMAT_STRING)]
+
+class CompiledTemplate(object):
+    """!Template parsed into a list of literal strings and TemplateTag objects
+        so that it can be filled in many times without parsing it again. Use
+        compile_template to get a cached instance.
+        Args:
+            @param tmpl template string
+    """
+    def __init__(self, tmpl):
+        self.tmpl = tmpl
+        self.segments = []
+        self.tags = []
+        last_end = 0
+        for match in re.finditer(r'\{(.+?)\}', tmpl):
+            if match.start() > last_end:
+                self.segments.append(tmpl[last_end:match.start()])
+
+            tag = TemplateTag(match.group(0),
+                              tuple(match.group(1).split(FORMATTING_DELIMITER)))
+            self.segments.append(tag)
+            self.tags.append(tag)
+            last_end = match.end()
+
+        if last_end < len(tmpl):
+            self.segments.append(tmpl[last_end:])
+
+@lru_cache(maxsize=None)
+def compile_template(tmpl):
+    """!Get CompiledTemplate for template string, parsing it only the first
+        time that the template is seen
+        Args:
+            @param tmpl template string
+            @returns CompiledTemplate object
+    """
+    return CompiledTemplate(tmpl)
+
 class StringSub(object):
     """
     log - log object
@@ -388,99 +449,304 @@ class StringSub(object):
 
         """
 
-        # The . matches any single character except newline, and the
-        # following + matches 1 or more occurrence of preceding expression.
-        # The ? after the .+ makes it a lazy match so that it stops
-        # after the first "}" instead of continuing to match as many
-        # characters as possible
-
-        # findall searches through the string and finds all non-overlapping
-        # matches and returns the group
-        # match_list is a list with the contents being the data between the
-        # curly braces
-        match_list = re.findall(r'\{(.+?)\}', self.tmpl)
-
-        # finditer gets the start and end indices
-        # Iterate over each match to get the starting and ending indices
-        matches = re.finditer(r'\{(.+?)\}', self.tmpl)
-        match_start_end_list = []
-        for match in matches:
-            match_start_end_list.append((match.start(), match.end()))
-
-        if len(match_list) == 0:
-            return self.tmpl
+        self.tmpl = self.render()
+        return self.tmpl
 
-        if len(match_list) != len(match_start_end_list):
-            # Log and exit
-            self.logger.error("match_list and match_start_end_list should " +
-                              "have the same length for template: " +
-                              self.tmpl)
-            exit(1)
+    def render(self):
+        """!Fill in template using values in kwargs dictionary without
+            modifying tmpl. See do_string_sub for details.
+            @returns filled in template
+        """
+        compiled = compile_template(self.tmpl)
+        if not compiled.tags:
+            return self.tmpl
 
         # A dictionary that will contain the string to replace (key)
         # and the string to replace it with (value)
         replacement_dict = {}
 
-        # Search for the FORMATTING_DELIMITER within the first string
-        for match in match_list:
-
-            string_to_replace = TEMPLATE_IDENTIFIER_BEGIN + match + \
-                                TEMPLATE_IDENTIFIER_END
-            split_string = match.split(FORMATTING_DELIMITER)
-
-            # valid, init, lead, etc.
-            # print split_string[0]
-            # value e.g. 2016012606, 3
-
+        for tag in compiled.tags:
             # split_string[0] holds the key (e.g. "init", "valid", etc)
-            if split_string[0] not in self.kwargs.keys():
+            if tag.key not in self.kwargs.keys():
                 # Log and exit
-                self.logger.error("The key " + split_string[0] +
+                self.logger.error("The key " + tag.key +
                                   " was not passed to StringSub " +
                                   " for template: " + self.tmpl)
                 exit(1)
 
             # if shift is set, get that value before handling formatting
-            for split_item in split_string:
-                if split_item.startswith(SHIFT_STRING):
-                    self.shift_seconds = self.get_seconds_from_template(split_item)
+            if tag.shift_item is not None:
+                self.shift_seconds = self.get_seconds_from_template(tag.shift_item)
 
             # if truncate is set, get that value before handling formatting
-            for split_item in split_string:
-                if split_item.startswith(TRUNCATE_STRING):
-                    self.truncate_seconds = self.get_seconds_from_template(split_item)
+            if tag.truncate_item is not None:
+                self.truncate_seconds = self.get_seconds_from_template(tag.truncate_item)
 
             # format times appropriately and add to replacement_dict
-            formatted = False
-            for idx, split_item in enumerate(split_string):
-                if split_item.startswith(FORMAT_STRING):
-                    replacement_dict[string_to_replace] = \
-                        self.handle_format_delimiter(split_string, idx)
-                    formatted = True
+            for idx in tag.format_indices:
+                replacement_dict[tag.text] = \
+                    self.handle_format_delimiter(tag.split_string, idx)
 
             # No formatting or length is requested
-            if not formatted:
-                # Add back the template identifiers to the matched
-                # string to replace and add the key, value pair to the
-                # dictionary
-                value = self.kwargs.get(split_string[0], None)
+            if not tag.format_indices:
+                value = self.kwargs.get(tag.key, None)
                 if isinstance(value, int):
                     value = f"{value}S"
-                replacement_dict[string_to_replace] = value
-
+                replacement_dict[tag.text] = value
 
             # reset shift seconds so it doesn't apply to next match
             self.shift_seconds = 0
             self.truncate_seconds = 0
 
-        # Replace regex with properly formatted information
-        self.tmpl = multiple_replace(replacement_dict, self.tmpl)
-        return self.tmpl
+        # Replace tags with properly formatted information
+        return ''.join(segment if isinstance(segment, str)
+                       else replacement_dict[segment.text]
+                       for segment in compiled.segments)
+
+def get_time_info_from_match_dict(match_dict, valid_shift=0):
+    """!Combine information extracted from a filename into time information
+        Args:
+            @param match_dict dictionary of extracted information. Key is made up
+                   of the identifier and the format tag, i.e. init+H or valid+M.
+                   Value is the extracted information, i.e. 19870201
+            @param valid_shift number of seconds to subtract from valid time
+            @returns dictionary of time information from time_util.ti_calculate
+    """
+    # combine common items and get datetime
+    output_dict = {}
+
+    valid = {}
+    init = {}
+    da_init = {}
+    lead = {}
+    offset = 0
+
+    valid['Y'] = -1
+    valid['y'] = -1
+    valid['m'] = -1
+    valid['d'] = -1
+    valid['j'] = -1
+    valid['H'] = 0
+    valid['M'] = 0
+    valid['b'] = -1
+
+    init['Y'] = -1
+    init['y'] = -1
+    init['m'] = -1
+    init['d'] = -1
+    init['j'] = -1
+    init['H'] = 0
+    init['M'] = 0
+    init['b'] = -1
+
+    da_init['Y'] = -1
+    da_init['y'] = -1
+    da_init['m'] = -1
+    da_init['d'] = -1
+    da_init['j'] = -1
+    da_init['H'] = 0
+    da_init['M'] = 0
+    da_init['b'] = -1
+
+    lead['H'] = 0
+    lead['M'] = 0
+    lead['S'] = 0
+
+    for key, value in match_dict.items():
+        if key.startswith(VALID_STRING):
+            valid[key.split('+')[1]] = int(value)
+
+    set_output_dict_from_time_info(valid, output_dict, 'valid')
+
+    # shift valid time if applicable
+    if valid_shift != 0:
+        output_dict['valid'] -= datetime.timedelta(seconds=valid_shift)
+
+    for key, value in match_dict.items():
+        if key.startswith(INIT_STRING):
+            init[key.split('+')[1]] = int(value)
+
+    set_output_dict_from_time_info(init, output_dict, 'init')
+
+    for key, value in match_dict.items():
+        if key.startswith(DA_INIT_STRING):
+            da_init[key.split('+')[1]] = int(value)
+
+    set_output_dict_from_time_info(da_init, output_dict, 'da_init')
+
+    for key, value in match_dict.items():
+        if key.startswith(LEAD_STRING):
+            lead[key.split('+')[1]] = int(value)
+
+    lead_seconds = lead['H'] * 3600 + lead['M'] * 60 + lead['S']
+    output_dict['lead'] = lead_seconds
+
+    for key, value in match_dict.items():
+        if key.startswith(OFFSET_STRING):
+            offset = int(value)
+
+    output_dict['offset_hours'] = offset
+
+    time_info = time_util.ti_calculate(output_dict)
+    return time_info
+
+def get_extract_format_pattern(fmt, identifier, groups):
+    """!Get regular expression that matches the values described by the
+        format items of a template tag, following the same rules as
+        StringExtract.get_fmt_info
+        Args:
+            @param fmt formatting values from template tag, i.e. %Y%m%d
+            @param identifier tag name, i.e. 'init' or 'lead'
+            @param groups list to append (group name, match dictionary key)
+             tuples to for each group added to the pattern
+            @returns regular expression string or None if a format item
+             cannot be handled
+    """
+    pattern = ''
+    for match in re.findall('%[^%]+', fmt):
+        group_name = f'g{len(groups)}'
+        extra_len = 0
+
+        # exact match, i.e. %Y
+        if match in LENGTH_DICT.keys():
+            key = identifier + '+' + match[1:]
+            # lead and level read all digits that are found without
+            # backtracking, so use a lookahead to emulate an atomic group
+            if match == '%H' and identifier == 'lead' or \
+               identifier == 'level':
+                group = rf'(?=(?P<{group_name}>\d+))(?P={group_name})'
+            else:
+                group = rf'(?P<{group_name}>\d{{{LENGTH_DICT[match]}}})'
+        # if match starts with key, find new length, i.e. %Y: or %HH
+        elif match[0:2] in LENGTH_DICT.keys():
+            match_char = match[1]
+            match_len = re.match('%([' + match_char + ']+)(.*)', match)
+            key = identifier + '+' + match_char
+            new_len = len(match_len.group(1))
+            if new_len <= 1:
+                new_len = LENGTH_DICT[match[0:2]]
+            group = rf'(?P<{group_name}>\d{{{new_len}}})'
+            # characters after the format item are skipped without checking
+            extra_len = len(match_len.group(2))
+        else:
+            # match %2H or %.2H
+            match_len = re.match(r'%\.*(\d+)(\D)$', match)
+            if not match_len:
+                return None
+            key = identifier + '+' + match_len.group(2)[0]
+            group = rf'(?P<{group_name}>\d{{{int(match_len.group(1))}}})'
+
+        groups.append((group_name, key))
+        pattern += group
+        if extra_len:
+            pattern += f'.{{{extra_len}}}'
+
+    return pattern
+
+class ExtractTemplate(object):
+    """!Template compiled into a regular expression with a named group for
+        each format item so that time information can be extracted from
+        many filenames without walking through the template each time. Use
+        compile_extract_template to get a cached instance. Like
+        StringExtract.parse_template, the filename must match the start of
+        the template, but may contain extra text at the end.
+        Args:
+            @param template filename template
+            @raises ValueError if the template contains items that can only be
+             handled by StringExtract.parse_template
+    """
+    def __init__(self, template):
+        self.template = template
+        self.valid_shift = 0
+        # list of (group name, match dictionary key) in template order
+        self.groups = []
+
+        pattern = ''
+        i = 0
+        while i < len(template):
+            if template[i] != TEMPLATE_IDENTIFIER_BEGIN:
+                pattern += re.escape(template[i])
+                i += 1
+                continue
+
+            end_i = template.find(TEMPLATE_IDENTIFIER_END, i)
+            if end_i == -1:
+                raise ValueError(f'Unterminated tag in template {template}')
+
+            sections = template[i+1:end_i].split('?')
+            identifier = sections[0]
+            has_format = False
+            for section in sections[1:]:
+                items = section.split('=')
+                if items[0] == FORMAT_STRING:
+                    if len(items) < 2:
+                        raise ValueError(f'Invalid format in template {template}')
+                    fmt_pattern = get_extract_format_pattern(items[1],
+                                                             identifier,
+                                                             self.groups)
+                    if fmt_pattern is None:
+                        raise ValueError(f'Invalid format in template {template}')
+                    pattern += fmt_pattern
+                    has_format = True
+
+                if items[0] == SHIFT_STRING:
+                    # shift errors are reported by parse_template
+                    if identifier != VALID_STRING:
+                        raise ValueError(f'Invalid shift in template {template}')
+
+                    shift = int(time_util.get_seconds_from_string(items[1],
+                                                                  default_unit='S'))
+                    if self.valid_shift != 0 and shift != self.valid_shift:
+                        raise ValueError(f'Multiple shifts in template {template}')
+                    self.valid_shift = shift
+
+            if not has_format:
+                raise ValueError(f'Tag without format in template {template}')
+
+            i = end_i + 1
+
+        self.regex = re.compile(pattern, re.DOTALL)
+
+    def extract(self, full_str):
+        """!Get time information from filename
+            Args:
+                @param full_str filename to parse
+                @returns dictionary of time information or None if the
+                 filename does not match the template
+        """
+        match = self.regex.match(full_str)
+        if not match:
+            return None
+
+        # values that are found more than once must be consistent
+        match_dict = {}
+        for group_name, key in self.groups:
+            value = match.group(group_name)
+            if key not in match_dict:
+                match_dict[key] = value
+            elif match_dict[key].zfill(len(value)) != value:
+                return None
+
+        return get_time_info_from_match_dict(match_dict, self.valid_shift)
+
+@lru_cache(maxsize=None)
+def compile_extract_template(template):
+    """!Get ExtractTemplate for a template, compiling it the first time that
+        the template is seen
+        Args:
+            @param template filename template
+            @returns ExtractTemplate object or None if the template must be
+             parsed with StringExtract.parse_template
+    """
+    try:
+        return ExtractTemplate(template)
+    except ValueError:
+        return None
 
 class StringExtract(object):
     """!Class to pull out timing and other information from a filename based on
         the filename template"""
-    def __init__(self, log, temp, fstr):
+    def __init__(self, log, temp, fstr=None):
         self.logger = log
         self.template = temp
         self.full_str = fstr
@@ -555,6 +821,31 @@ class StringExtract(object):
 
     def parse_template(self):
         """!Use template and filename to pull out information"""
+        compiled = compile_extract_template(self.template)
+        if compiled is None:
+            return self.parse_template_by_character()
+
+        return compiled.extract(self.full_str)
+
+    def extract_many(self, paths):
+        """!Use template to pull out information from many filenames,
+            compiling the template only once
+            Args:
+                @param paths list of filenames to parse
+                @returns list containing a dictionary of time information or
+                 None for each filename
+        """
+        compiled = compile_extract_template(self.template)
+        if compiled is not None:
+            return [compiled.extract(path) for path in paths]
+
+        return [StringExtract(self.logger, self.template, path).parse_template_by_character()
+                for path in paths]
+
+    def parse_template_by_character(self):
+        """!Use template and filename to pull out information by stepping
+            through the template one character at a time. Used for
+            templates that cannot be compiled into a regular expression"""
         template_len = len(self.template)
         i = 0
         str_i = 0
@@ -634,80 +925,4 @@ class StringExtract(object):
         if between_template != between_filename:
             return None
 
-        # combine common items and get datetime
-        output_dict = {}
-
-        valid = {}
-        init = {}
-        da_init = {}
-        lead = {}
-        offset = 0
-
-        valid['Y'] = -1
-        valid['y'] = -1
-        valid['m'] = -1
-        valid['d'] = -1
-        valid['j'] = -1
-        valid['H'] = 0
-        valid['M'] = 0
-        valid['b'] = -1
-
-        init['Y'] = -1
-        init['y'] = -1
-        init['m'] = -1
-        init['d'] = -1
-        init['j'] = -1
-        init['H'] = 0
-        init['M'] = 0
-        init['b'] = -1
-
-        da_init['Y'] = -1
-        da_init['y'] = -1
-        da_init['m'] = -1
-        da_init['d'] = -1
-        da_init['j'] = -1
-        da_init['H'] = 0
-        da_init['M'] = 0
-        da_init['b'] = -1
-
-        lead['H'] = 0
-        lead['M'] = 0
-        lead['S'] = 0
-
-        for key, value in match_dict.items():
-            if key.startswith(VALID_STRING):
-                valid[key.split('+')[1]] = int(value)
-
-        set_output_dict_from_time_info(valid, output_dict, 'valid')
-
-        # shift valid time if applicable
-        if valid_shift != 0:
-            output_dict['valid'] -= datetime.timedelta(seconds=valid_shift)
-
-        for key, value in match_dict.items():
-            if key.startswith(INIT_STRING):
-                init[key.split('+')[1]] = int(value)
-
-        set_output_dict_from_time_info(init, output_dict, 'init')
-
-        for key, value in match_dict.items():
-            if key.startswith(DA_INIT_STRING):
-                da_init[key.split('+')[1]] = int(value)
-
-        set_output_dict_from_time_info(da_init, output_dict, 'da_init')
-
-        for key, value in match_dict.items():
-            if key.startswith(LEAD_STRING):
-                lead[key.split('+')[1]] = int(value)
-
-        lead_seconds = lead['H'] * 3600 + lead['M'] * 60 + lead['S']
-        output_dict['lead'] = lead_seconds
-
-        for key, value in match_dict.items():
-            if key.startswith(OFFSET_STRING):
-                offset = int(value)
-
-        output_dict['offset_hours'] = offset
-
-        time_info = time_util.ti_calculate(output_dict)
-        return time_info
+        return get_time_info_from_match_dict(match_dict, valid_shift)
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+
+"""
+Program Name: task_scheduler.py
+Contact(s): George McCabe
+Abstract: Runs the items in the PROCESS_LIST as a graph of dependent tasks
+History Log:  Initial version
+Usage: Called by met_util.run_metplus when LOOP_ORDER = tasks
+Parameters: None
+Input Files: N/A
+Output Files: N/A
+"""
+
+import os
+import queue
+import multiprocessing
+
+import met_util as util
+from command_builder import CommandBuilder
+
+'''!@namespace task_scheduler
+@brief Builds a graph of (process, run time, custom string) tasks from the
+PROCESS_LIST and runs each task as soon as the tasks it depends on have
+finished. A task depends on a task from an earlier process in the
+PROCESS_LIST at the same run time if the output of the earlier process is
+read as input by the later process. If the later process can read input
+from other run times, i.e. it uses a file window, offsets, or a PCPCombine
+lookback, each of its tasks depends on the earlier process's tasks at
+every run time instead. Processes that handle the entire time
+range at once (i.e. SeriesAnalysis, StatAnalysis) run as a single task that
+waits for all earlier tasks and blocks all later tasks.
+'''
+
+class Task(object):
+    """!Single unit of work: a wrapper run for one run time and custom string,
+        or a wrapper that runs over all times at once if run_time is None"""
+    def __init__(self, task_id, process_index, run_time=None, custom=None):
+        self.task_id = task_id
+        self.process_index = process_index
+        self.run_time = run_time
+        self.custom = custom
+        self.depends_on = set()
+
+    def get_name(self, processes):
+        process_name = processes[self.process_index].__class__.__name__.replace('Wrapper', '')
+        if self.run_time is None:
+            return f"{process_name} for all times"
+
+        name = f"{process_name} at {self.run_time.strftime('%Y%m%d%H%M')}"
+        if self.custom:
+            name += f" ({self.custom})"
+        return name
+
+def runs_once_per_time(process):
+    """!Return True if the wrapper uses the default run_all_times that calls
+        run_at_time for each run time, False if it handles all times itself"""
+    return type(process).run_all_times is CommandBuilder.run_all_times
+
+def get_template_paths(process, direction):
+    """!Get the directories and full path templates that a wrapper reads
+        from or writes to by looking for *<direction>_TEMPLATE and
+        *<direction>_DIR items in the wrapper's c_dict
+        Args:
+            @param process wrapper object
+            @param direction either INPUT or OUTPUT
+            @returns set of directories and set of path templates
+    """
+    dirs = set()
+    paths = set()
+    for key, value in process.c_dict.items():
+        if not key.endswith(f'{direction}_TEMPLATE') or not value:
+            continue
+
+        data_dir = process.c_dict.get(key.replace('_TEMPLATE', '_DIR'), '')
+        if not isinstance(data_dir, str):
+            data_dir = ''
+
+        if isinstance(value, list):
+            templates = value
+        else:
+            templates = [template.strip() for template in value.split(',')]
+
+        for template in templates:
+            full_path = os.path.normpath(os.path.join(data_dir, template))
+            paths.add(full_path)
+            dirs.add(os.path.dirname(full_path))
+
+    # include directories that are set without a template
+    for key, value in process.c_dict.items():
+        if key.endswith(f'{direction}_DIR') and value and isinstance(value, str):
+            dirs.add(os.path.normpath(value))
+
+    return dirs, paths
+
+def is_subdir(sub_dir, parent_dir):
+    """!Return True if sub_dir is the same as or is under parent_dir"""
+    try:
+        return os.path.commonpath([sub_dir, parent_dir]) == parent_dir
+    except ValueError:
+        return False
+
+def process_feeds(upstream, downstream):
+    """!Return True if output from upstream wrapper is read by downstream wrapper
+        Args:
+            @param upstream wrapper object that runs first
+            @param downstream wrapper object that runs later
+    """
+    out_dirs, out_paths = get_template_paths(upstream, 'OUTPUT')
+    in_dirs, in_paths = get_template_paths(downstream, 'INPUT')
+
+    if out_paths & in_paths:
+        return True
+
+    # if a directory that is written to contains or is contained by a
+    # directory that is read, assume they are related
+    for out_dir in out_dirs:
+        for in_dir in in_dirs:
+            if is_subdir(in_dir, out_dir) or is_subdir(out_dir, in_dir):
+                return True
+
+    return False
+
+def build_task_graph(processes, run_times):
+    """!Create list of tasks for all processes, run times, and custom
+        strings, setting which tasks each task depends on
+        Args:
+            @param processes list of wrapper objects in PROCESS_LIST order
+            @param run_times list of init or valid times to process
+            @returns list of Task objects
+    """
+    tasks = []
+    # list of tasks for each process, indexed by process index then run time
+    process_tasks = []
+    for index, process in enumerate(processes):
+        tasks_by_time = {}
+        if not runs_once_per_time(process):
+            task = Task(len(tasks), index)
+            tasks.append(task)
+            tasks_by_time[None] = [task]
+        else:
+            for run_time in run_times:
+                tasks_by_time[run_time] = []
+                for custom in process.c_dict.get('CUSTOM_LOOP_LIST', ['']):
+                    task = Task(len(tasks), index, run_time, custom)
+                    tasks.append(task)
+                    tasks_by_time[run_time].append(task)
+
+        process_tasks.append(tasks_by_time)
+
+    for down_index, downstream in enumerate(processes):
+        for up_index in range(down_index):
+            upstream = processes[up_index]
+            up_tasks = process_tasks[up_index]
+            down_tasks = process_tasks[down_index]
+
+            # processes that run over all times wait for everything before
+            # them and block everything after them
+            if None in up_tasks or None in down_tasks:
+                all_up_ids = [task.task_id
+                              for time_tasks in up_tasks.values()
+                              for task in time_tasks]
+                for time_tasks in down_tasks.values():
+                    for task in time_tasks:
+                        task.depends_on.update(all_up_ids)
+                continue
+
+            if not process_feeds(upstream, downstream):
+                continue
+
+            # input may come from any time that the upstream process wrote
+            if downstream.reads_other_run_times():
+                all_up_ids = [task.task_id
+                              for time_tasks in up_tasks.values()
+                              for task in time_tasks]
+                for time_tasks in down_tasks.values():
+                    for task in time_tasks:
+                        task.depends_on.update(all_up_ids)
+                continue
+
+            for run_time, time_tasks in down_tasks.items():
+                up_ids = [task.task_id for task in up_tasks[run_time]]
+                for task in time_tasks:
+                    task.depends_on.update(up_ids)
+
+    return tasks
+
+def run_task(config, processes, task):
+    """!Run a single task and return the number of errors that occurred"""
+    process = processes[task.process_index]
+    errors_before = process.errors
+    custom_loop_list = process.c_dict.get('CUSTOM_LOOP_LIST')
+    config.logger.info(f"Running task: {task.get_name(processes)}")
+    try:
+        if task.run_time is None:
+            with config.lookup_owner(util.get_process_name(process)):
+                process.run_all_times()
+                process.wait_for_commands()
+                util.release_staged_files(config)
+        else:
+            # only process the custom string for this task
+            process.c_dict['CUSTOM_LOOP_LIST'] = [task.custom]
+            util.run_process_at_time(config, process, task.run_time)
+    except (Exception, SystemExit):
+        config.logger.exception(f"Task failed: {task.get_name(processes)}")
+        process.errors += 1
+    finally:
+        process.c_dict['CUSTOM_LOOP_LIST'] = custom_loop_list
+
+    return process.errors - errors_before
+
+# config, wrapper objects, and tasks inherited by forked worker processes
+_TASK_STATE = None
+
+def _run_task_worker(task_id):
+    """!Run a task inside a worker process using the worker's own copy of
+        the wrapper objects
+        Args:
+            @param task_id index of the task to run
+            @returns tuple of task ID and number of errors that occurred
+    """
+    config, processes, tasks = _TASK_STATE
+    return task_id, run_task(config, processes, tasks[task_id])
+
+def run_tasks(config, processes):
+    """!Build task graph and run tasks whose dependencies have completed,
+        using RUN_PARALLEL_TASKS worker processes. The number of errors from
+        each task are added to the errors value of the corresponding wrapper
+        object so that they are reported by run_metplus.
+        Args:
+            @param config METplusConfig object
+            @param processes list of wrapper objects in PROCESS_LIST order
+            @returns True if all tasks were run, False if the task graph could
+             not be created
+    """
+    global _TASK_STATE
+
+    run_times = util.get_run_times(config)
+    if run_times is None:
+        return False
+
+    tasks = build_task_graph(processes, run_times)
+
+    num_workers = config.getint('config', 'RUN_PARALLEL_TASKS', 1)
+    config.logger.info(f"Running {len(tasks)} tasks using {max(num_workers, 1)} "
+                       "parallel processes")
+
+    remaining = {task.task_id: set(task.depends_on) for task in tasks}
+    dependents = {task.task_id: [] for task in tasks}
+    for task in tasks:
+        for dep_id in task.depends_on:
+            dependents[dep_id].append(task.task_id)
+
+    ready = [task_id for task_id, deps in remaining.items() if not deps]
+
+    def complete(task_id):
+        """!Mark task as finished and add tasks it released to ready list"""
+        for dep_id in dependents[task_id]:
+            remaining[dep_id].discard(task_id)
+            if not remaining[dep_id]:
+                ready.append(dep_id)
+
+    # run tasks in this process in dependency order if not running in parallel
+    if num_workers <= 1:
+        while ready:
+            task_id = ready.pop(0)
+            run_task(config, processes, tasks[task_id])
+            complete(task_id)
+        return True
+
+    _TASK_STATE = (config, processes, tasks)
+    done_queue = queue.Queue()
+    try:
+        # fork so each worker gets a copy of the wrappers without pickling
+        context = multiprocessing.get_context('fork')
+        with context.Pool(processes=num_workers) as pool:
+            num_running = 0
+            while ready or num_running:
+                while ready:
+                    task_id = ready.pop(0)
+                    # count an error if the worker could not run the task
+                    pool.apply_async(_run_task_worker, (task_id,),
+                                     callback=done_queue.put,
+                                     error_callback=lambda _, task_id=task_id:
+                                     done_queue.put((task_id, 1)))
+                    num_running += 1
+
+                task_id, num_errors = done_queue.get()
+                num_running -= 1
+                processes[tasks[task_id].process_index].errors += num_errors
+                complete(task_id)
+    finally:
+        _TASK_STATE = None
+
+    return True